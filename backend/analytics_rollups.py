@@ -0,0 +1,206 @@
+"""
+Pre-aggregated analytics for the SQLite backend
+Triggers keep per-day/brand/model rollups and counters current as rows are written
+
+Backfill or repair from existing rows with:
+    python analytics_rollups.py [path/to/lz_custom.db]
+"""
+
+import heapq
+import sqlite3
+import sys
+
+ROLLUP_TABLES = [
+    # One row per day, brand and model; prospects are counted under model_used ''
+    '''
+    CREATE TABLE IF NOT EXISTS analytics_daily (
+        day TEXT NOT NULL,
+        domain_brand TEXT NOT NULL DEFAULT '',
+        model_used TEXT NOT NULL DEFAULT '',
+        prospects INTEGER NOT NULL DEFAULT 0,
+        chats INTEGER NOT NULL DEFAULT 0,
+        response_time_sum REAL NOT NULL DEFAULT 0,
+        response_time_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, domain_brand, model_used)
+    )
+    ''',
+    # Running totals: ('prospects', ''), ('prospect_status', <status>), ('chats', ''), ('sessions', '')
+    '''
+    CREATE TABLE IF NOT EXISTS analytics_counters (
+        metric TEXT NOT NULL,
+        dimension TEXT NOT NULL DEFAULT '',
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (metric, dimension)
+    )
+    '''
+]
+
+BUMP_COUNTER = '''
+    INSERT INTO analytics_counters (metric, dimension, value) VALUES ({metric}, {dimension}, {delta})
+    ON CONFLICT (metric, dimension) DO UPDATE SET value = value + excluded.value;
+'''
+
+ROLLUP_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_chat_conversations_rollup
+    AFTER INSERT ON chat_conversations
+    BEGIN
+        INSERT INTO analytics_daily (day, domain_brand, model_used, chats, response_time_sum, response_time_count)
+        VALUES (date(NEW.created_at), COALESCE(NEW.domain_brand, ''), NEW.model_used, 1,
+                COALESCE(NEW.response_time, 0), NEW.response_time IS NOT NULL)
+        ON CONFLICT (day, domain_brand, model_used) DO UPDATE SET
+            chats = chats + 1,
+            response_time_sum = response_time_sum + excluded.response_time_sum,
+            response_time_count = response_time_count + excluded.response_time_count;
+        {BUMP_COUNTER.format(metric="'chats'", dimension="''", delta=1)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_chat_sessions_rollup
+    AFTER INSERT ON chat_sessions
+    BEGIN
+        {BUMP_COUNTER.format(metric="'sessions'", dimension="''", delta=1)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_prospects_rollup
+    AFTER INSERT ON prospects
+    BEGIN
+        INSERT INTO analytics_daily (day, domain_brand, model_used, prospects)
+        VALUES (date(NEW.created_at), COALESCE(NEW.domain_brand, ''), '', 1)
+        ON CONFLICT (day, domain_brand, model_used) DO UPDATE SET prospects = prospects + 1;
+        {BUMP_COUNTER.format(metric="'prospects'", dimension="''", delta=1)}
+        {BUMP_COUNTER.format(metric="'prospect_status'", dimension="COALESCE(NEW.status, '')", delta=1)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_prospects_status_rollup
+    AFTER UPDATE OF status ON prospects
+    WHEN COALESCE(OLD.status, '') != COALESCE(NEW.status, '')
+    BEGIN
+        {BUMP_COUNTER.format(metric="'prospect_status'", dimension="COALESCE(OLD.status, '')", delta=-1)}
+        {BUMP_COUNTER.format(metric="'prospect_status'", dimension="COALESCE(NEW.status, '')", delta=1)}
+    END
+    '''
+]
+
+
+def create_rollups(cursor):
+    """Create the rollup tables and the triggers that maintain them"""
+    for statement in ROLLUP_TABLES + ROLLUP_TRIGGERS:
+        cursor.execute(statement)
+
+
+def rebuild_rollups(cursor):
+    """Recompute every rollup from the base tables"""
+    cursor.execute('DELETE FROM analytics_daily')
+    cursor.execute('DELETE FROM analytics_counters')
+
+    cursor.execute('''
+        INSERT INTO analytics_daily (day, domain_brand, model_used, chats, response_time_sum, response_time_count)
+        SELECT date(created_at), COALESCE(domain_brand, ''), model_used, COUNT(*),
+               COALESCE(SUM(response_time), 0), COUNT(response_time)
+        FROM chat_conversations
+        GROUP BY 1, 2, 3
+    ''')
+    cursor.execute('''
+        INSERT INTO analytics_daily (day, domain_brand, model_used, prospects)
+        SELECT date(created_at), COALESCE(domain_brand, ''), '', COUNT(*)
+        FROM prospects
+        WHERE true
+        GROUP BY 1, 2
+        ON CONFLICT (day, domain_brand, model_used) DO UPDATE SET prospects = excluded.prospects
+    ''')
+
+    cursor.execute('''
+        INSERT INTO analytics_counters (metric, dimension, value)
+        SELECT 'chats', '', COUNT(*) FROM chat_conversations
+        UNION ALL SELECT 'sessions', '', COUNT(*) FROM chat_sessions
+        UNION ALL SELECT 'prospects', '', COUNT(*) FROM prospects
+        UNION ALL SELECT 'prospect_status', COALESCE(status, ''), COUNT(*) FROM prospects GROUP BY 2
+    ''')
+
+
+def read_dashboard(conn: sqlite3.Connection) -> dict:
+    """Dashboard payload from the rollups (independent of base table size)"""
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT metric, dimension, value FROM analytics_counters')
+    counters = {(metric, dimension): value for metric, dimension, value in cursor.fetchall()}
+
+    cursor.execute('''
+        SELECT COALESCE(SUM(prospects), 0), COALESCE(SUM(chats), 0)
+        FROM analytics_daily
+        WHERE day >= date('now', '-7 days')
+    ''')
+    prospects_this_week, chats_this_week = cursor.fetchone()
+
+    cursor.execute('''
+        SELECT model_used, SUM(chats) AS usage_count,
+               SUM(response_time_sum) / NULLIF(SUM(response_time_count), 0)
+        FROM analytics_daily
+        WHERE model_used != ''
+        GROUP BY model_used
+        ORDER BY usage_count DESC
+    ''')
+    model_usage = [{
+        "model": row[0],
+        "count": row[1],
+        "avg_response_time": round(row[2], 2) if row[2] is not None else None
+    } for row in cursor.fetchall()]
+
+    cursor.execute('''
+        SELECT domain_brand, SUM(prospects), SUM(chats)
+        FROM analytics_daily
+        GROUP BY domain_brand
+        ORDER BY domain_brand
+    ''')
+    brands = [{"brand": row[0] or None, "prospects": row[1], "chats": row[2]} for row in cursor.fetchall()]
+
+    # Newest ten of each table via the created_at indexes, merged newest first
+    cursor.execute('SELECT name, created_at FROM prospects ORDER BY created_at DESC LIMIT 10')
+    recent_prospects = [{"type": "prospect", "title": row[0], "created_at": row[1]} for row in cursor.fetchall()]
+    cursor.execute('''
+        SELECT SUBSTR(user_message, 1, 50) || '...', created_at
+        FROM chat_conversations ORDER BY created_at DESC LIMIT 10
+    ''')
+    recent_chats = [{"type": "chat", "title": row[0], "created_at": row[1]} for row in cursor.fetchall()]
+    recent_activity = list(heapq.merge(
+        recent_prospects, recent_chats,
+        key=lambda item: item["created_at"] or "",
+        reverse=True
+    ))[:10]
+
+    return {
+        "prospects": {
+            "total": counters.get(("prospects", ""), 0),
+            "this_week": prospects_this_week,
+            "new": counters.get(("prospect_status", "new"), 0)
+        },
+        "chats": {
+            "total": counters.get(("chats", ""), 0),
+            "this_week": chats_this_week,
+            "unique_sessions": counters.get(("sessions", ""), 0)
+        },
+        "model_usage": model_usage,
+        "brands": brands,
+        "recent_activity": recent_activity
+    }
+
+
+if __name__ == "__main__":
+    from sqlite_migrations import migrate
+
+    path = sys.argv[1] if len(sys.argv) > 1 else 'lz_custom.db'
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    rebuild_rollups(cursor)
+    conn.commit()
+    totals = dict(((metric, dimension), value) for metric, dimension, value
+                  in cursor.execute('SELECT metric, dimension, value FROM analytics_counters'))
+    print(f"✅ Rebuilt analytics rollups for {path}: "
+          f"{totals.get(('prospects', ''), 0)} prospects, {totals.get(('chats', ''), 0)} chats, "
+          f"{totals.get(('sessions', ''), 0)} sessions")
+    conn.close()
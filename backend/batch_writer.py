@@ -0,0 +1,128 @@
+"""
+Write-behind batching for log rows
+Rows are queued from the request path and flushed in batches by a background task
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+class BatchWriter:
+    """Bounded write-behind queue.
+
+    ``submit`` enqueues a row under a key (a table, or a schema/table pair) and
+    returns immediately. A background task flushes when ``max_batch`` rows are
+    waiting or ``flush_interval`` seconds have passed, calling
+    ``flush_fn(key, rows)`` once per key. When ``max_pending`` rows are already
+    queued a submit waits up to ``max_wait`` seconds for room (counted as
+    delayed) and is then dropped (counted as dropped).
+    """
+
+    def __init__(self, flush_fn: Callable[[Hashable, List[Any]], Awaitable[None]], name: str = "batch",
+                 max_batch: int = None, flush_interval: float = None, max_pending: int = None,
+                 max_wait: float = None):
+        self.flush_fn = flush_fn
+        self.name = name
+        self.max_batch = max_batch or int(os.environ.get('LOG_BATCH_SIZE', '200'))
+        self.flush_interval = flush_interval or float(os.environ.get('LOG_FLUSH_INTERVAL', '1.0'))
+        self.max_pending = max_pending or int(os.environ.get('LOG_MAX_PENDING', '10000'))
+        self.max_wait = max_wait if max_wait is not None else float(os.environ.get('LOG_MAX_WAIT', '0.05'))
+        self._queue: asyncio.Queue = None
+        self._task = None
+        self._stopping = False
+
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "failed": 0,
+            "dropped": 0,
+            "delayed": 0,
+            "max_lag": 0.0
+        }
+
+    def start(self):
+        """Start the background flush task"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued and stop the flush task"""
+        if self._task is None:
+            return
+        self._stopping = True
+        await self._task
+        self._task = None
+
+    async def submit(self, key: Hashable, row: Any) -> bool:
+        """Queue a row for writing; False if it had to be dropped"""
+        if self._queue is None or self._stopping:
+            # Not running (startup failed or shutting down): write straight through
+            await self._write({key: [row]}, time.time())
+            return True
+
+        self.stats["submitted"] += 1
+        item = (key, row, time.time())
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.stats["delayed"] += 1
+
+        try:
+            await asyncio.wait_for(self._queue.put(item), timeout=self.max_wait)
+            return True
+        except asyncio.TimeoutError:
+            self.stats["dropped"] += 1
+            if self.stats["dropped"] % 100 == 1:
+                print(f"⚠️  {self.name} writer backlog full ({self.max_pending} rows), "
+                      f"{self.stats['dropped']} rows dropped so far")
+            return False
+
+    def get_stats(self) -> Dict:
+        """Queue depth and write counters"""
+        return {
+            **self.stats,
+            "max_lag": round(self.stats["max_lag"], 3),
+            "pending": self._queue.qsize() if self._queue else 0
+        }
+
+    async def _run(self):
+        while not (self._stopping and self._queue.empty()):
+            batch = await self._collect()
+            if batch:
+                grouped: Dict[Hashable, List[Any]] = {}
+                for key, row, _ in batch:
+                    grouped.setdefault(key, []).append(row)
+                await self._write(grouped, min(queued_at for _, _, queued_at in batch))
+
+    async def _collect(self) -> List[tuple]:
+        """Wait for rows until the batch is full or the flush interval passes"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        batch = []
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, grouped: Dict[Hashable, List[Any]], oldest: float):
+        for key, rows in grouped.items():
+            try:
+                await self.flush_fn(key, rows)
+                self.stats["written"] += len(rows)
+                self.stats["batches"] += 1
+            except Exception as e:
+                self.stats["failed"] += len(rows)
+                print(f"⚠️  {self.name} writer failed to flush {len(rows)} rows to {key}: {e}")
+        self.stats["max_lag"] = max(self.stats["max_lag"], time.time() - oldest)
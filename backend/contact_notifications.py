@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Phone notification job queue for contact requests
+
+/api/contact stores the contact and its callback/text jobs in one SQLite
+transaction (emails go through email_outbox like prospect notifications).
+Worker processes claim jobs per channel and deliver them through Twilio; each
+channel gets its own number of workers, so a slow provider only holds up its
+own channel. Failed jobs are retried with exponential backoff up to
+NOTIFY_MAX_ATTEMPTS.
+
+main.py starts the workers with the app; to run them separately set
+NOTIFY_WORKERS_IN_APP=0 and run:
+    python contact_notifications.py --db /path/to/lz_custom.db
+Only one process per database runs workers (an exclusive lock on
+<db>.notify.lock), so CHANNEL_LIMITS holds however many uvicorn workers
+start: the first to take the lock starts the workers, the others skip. If
+that process exits, the workers stop with it until the next start.
+Add --fake (or NOTIFY_FAKE_PROVIDERS=1) to log instead of calling Twilio;
+NOTIFY_FAKE_LATENCY and NOTIFY_FAKE_FAILURE_RATE shape the fake provider for
+offline load tests.
+"""
+
+import argparse
+import fcntl
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import sqlite3
+import time
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ('sms', 'call')
+
+# Worker processes per channel
+CHANNEL_LIMITS = {
+    'sms': int(os.environ.get('NOTIFY_SMS_WORKERS', '2')),
+    'call': int(os.environ.get('NOTIFY_CALL_WORKERS', '1'))
+}
+
+MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', '5'))
+BACKOFF_BASE = float(os.environ.get('NOTIFY_BACKOFF_BASE', '15'))
+POLL_INTERVAL = float(os.environ.get('NOTIFY_POLL_INTERVAL', '1'))
+# A claimed job whose worker died is picked up again after this many seconds
+LEASE_SECONDS = float(os.environ.get('NOTIFY_LEASE_SECONDS', '120'))
+
+PROVIDER_CONFIG = {
+    'twilio_account_sid': os.environ.get('TWILIO_ACCOUNT_SID', 'your_account_sid'),
+    'twilio_auth_token': os.environ.get('TWILIO_AUTH_TOKEN', 'your_auth_token'),
+    'twilio_phone_number': os.environ.get('TWILIO_PHONE_NUMBER', '+1234567890')
+}
+
+
+def fake_providers_enabled():
+    return os.environ.get('NOTIFY_FAKE_PROVIDERS', '').lower() in ('1', 'true', 'yes')
+
+
+# Queue storage
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def init_queue(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS notification_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            contact_id INTEGER,
+            channel TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at REAL NOT NULL,
+            locked_until REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_notification_jobs_due
+        ON notification_jobs (channel, status, next_attempt_at)
+    ''')
+
+
+def enqueue(conn, contact_id, channel, recipient, **payload):
+    """Queue a notification; runs inside the caller's transaction"""
+    if channel not in CHANNELS:
+        raise ValueError(f"Unknown notification channel: {channel}")
+    conn.execute('''
+        INSERT INTO notification_jobs (contact_id, channel, recipient, payload, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (contact_id, channel, recipient, json.dumps(payload), time.time()))
+
+
+def claim(conn, channel):
+    """Take the next due job for a channel, or None"""
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute('''
+            SELECT id, contact_id, recipient, payload, attempts
+            FROM notification_jobs
+            WHERE channel = ? AND (
+                (status = 'pending' AND next_attempt_at <= ?)
+                OR (status = 'running' AND locked_until < ?)
+            )
+            ORDER BY next_attempt_at, id
+            LIMIT 1
+        ''', (channel, now, now)).fetchone()
+        if row:
+            conn.execute('''
+                UPDATE notification_jobs
+                SET status = 'running', attempts = attempts + 1, locked_until = ?
+                WHERE id = ?
+            ''', (now + LEASE_SECONDS, row[0]))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    if not row:
+        return None
+    return {
+        'id': row[0],
+        'contact_id': row[1],
+        'channel': channel,
+        'recipient': row[2],
+        'payload': json.loads(row[3]),
+        'attempts': row[4] + 1
+    }
+
+
+def complete(conn, job):
+    conn.execute('''
+        UPDATE notification_jobs
+        SET status = 'sent', last_error = NULL, locked_until = NULL, finished_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', (job['id'],))
+
+
+def fail(conn, job, error):
+    """Schedule a retry, or mark the job failed after MAX_ATTEMPTS"""
+    if job['attempts'] >= MAX_ATTEMPTS:
+        conn.execute('''
+            UPDATE notification_jobs
+            SET status = 'failed', last_error = ?, locked_until = NULL, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (error, job['id']))
+        logger.error(f"{job['channel']} notification {job['id']} failed permanently: {error}")
+        return
+    delay = BACKOFF_BASE * 2 ** (job['attempts'] - 1) * random.uniform(0.8, 1.2)
+    conn.execute('''
+        UPDATE notification_jobs
+        SET status = 'pending', last_error = ?, locked_until = NULL, next_attempt_at = ?
+        WHERE id = ?
+    ''', (error, time.time() + delay, job['id']))
+    logger.warning(f"{job['channel']} notification {job['id']} failed (attempt {job['attempts']}), "
+                   f"retrying in {delay:.0f}s: {error}")
+
+
+def queue_stats(conn):
+    """Job counts by channel and status"""
+    stats = {channel: {} for channel in CHANNELS}
+    for channel, status, count in conn.execute(
+            'SELECT channel, status, COUNT(*) FROM notification_jobs GROUP BY channel, status'):
+        stats.setdefault(channel, {})[status] = count
+    return stats
+
+
+# Providers
+
+class LiveProvider:
+    """Twilio delivery; one instance per worker process"""
+
+    def __init__(self, config):
+        self.config = config
+        self._twilio = None
+
+    def sms(self, to_phone, body):
+        message = self._twilio_client().messages.create(
+            body=body,
+            from_=self.config['twilio_phone_number'],
+            to=to_phone
+        )
+        logger.info(f"SMS sent successfully to {to_phone}: {message.sid}")
+
+    def call(self, to_phone, message):
+        call = self._twilio_client().calls.create(
+            # The message carries visitor input (name, project type); escape it so it stays text
+            twiml=f'<Response><Say>{escape(message)}</Say></Response>',
+            to=to_phone,
+            from_=self.config['twilio_phone_number']
+        )
+        logger.info(f"Call initiated successfully to {to_phone}: {call.sid}")
+
+    def _twilio_client(self):
+        if self._twilio is None:
+            from twilio.rest import Client
+            self._twilio = Client(self.config['twilio_account_sid'], self.config['twilio_auth_token'])
+        return self._twilio
+
+
+class FakeProvider:
+    """Logs deliveries with configurable latency and failure rate"""
+
+    def __init__(self, latency=None, failure_rate=None):
+        self.latency = latency if latency is not None else float(os.environ.get('NOTIFY_FAKE_LATENCY', '0.2'))
+        self.failure_rate = (failure_rate if failure_rate is not None
+                             else float(os.environ.get('NOTIFY_FAKE_FAILURE_RATE', '0')))
+
+    def sms(self, to_phone, body):
+        self._deliver('sms', to_phone, body[:40])
+
+    def call(self, to_phone, message):
+        self._deliver('call', to_phone, message[:40])
+
+    def _deliver(self, channel, recipient, summary):
+        time.sleep(random.uniform(0.5, 1.5) * self.latency)
+        if random.random() < self.failure_rate:
+            raise RuntimeError(f"fake {channel} provider failure")
+        logger.info(f"[fake] {channel} to {recipient}: {summary}")
+
+
+def deliver(provider, job):
+    payload = job['payload']
+    if job['channel'] == 'sms':
+        provider.sms(job['recipient'], payload['body'])
+    else:
+        provider.call(job['recipient'], payload['message'])
+
+
+# Workers
+
+def run_worker(db_path, channel, fake=False):
+    """Deliver jobs for one channel until terminated"""
+    logging.basicConfig(level=logging.INFO)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    provider = FakeProvider() if fake else LiveProvider(PROVIDER_CONFIG)
+    conn = connect(db_path)
+    try:
+        while True:
+            job = claim(conn, channel)
+            if job is None:
+                time.sleep(POLL_INTERVAL)
+                continue
+            try:
+                deliver(provider, job)
+                complete(conn, job)
+            except Exception as e:
+                fail(conn, job, str(e))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+# Held while this process runs the workers for a database
+_worker_lock = None
+
+
+def acquire_worker_lock(db_path):
+    """Take the per-database worker lock without blocking; False if another process holds it"""
+    global _worker_lock
+    if _worker_lock is not None:
+        return True
+    lock_file = open(f'{db_path}.notify.lock', 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False
+    _worker_lock = lock_file
+    return True
+
+
+def release_worker_lock():
+    global _worker_lock
+    if _worker_lock is not None:
+        _worker_lock.close()
+        _worker_lock = None
+
+
+def start_workers(db_path, fake=False, limits=None):
+    """Start CHANNEL_LIMITS worker processes per channel; returns the processes.
+
+    Returns no processes if another process already runs the workers for this
+    database.
+    """
+    if not acquire_worker_lock(db_path):
+        logger.info(f"Notification workers for {db_path} already run in another process")
+        return []
+
+    conn = connect(db_path)
+    init_queue(conn)
+    conn.close()
+
+    # Spawned, not forked: the web process has database and executor threads
+    context = multiprocessing.get_context('spawn')
+    processes = []
+    for channel, count in (limits or CHANNEL_LIMITS).items():
+        for n in range(count):
+            process = context.Process(
+                target=run_worker, args=(db_path, channel, fake),
+                name=f'notify-{channel}-{n}', daemon=True
+            )
+            process.start()
+            processes.append(process)
+    logger.info(f"Started {len(processes)} notification workers "
+                f"({', '.join(f'{c}={n}' for c, n in (limits or CHANNEL_LIMITS).items())}"
+                f"{', fake providers' if fake else ''})")
+    return processes
+
+
+def stop_workers(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(timeout=10)
+    release_worker_lock()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Contact notification workers')
+    parser.add_argument('--db', default=os.environ.get('SQLITE_PATH', 'lz_custom.db'),
+                        help='SQLite database (default: $SQLITE_PATH or lz_custom.db)')
+    parser.add_argument('--fake', action='store_true', default=fake_providers_enabled(),
+                        help='log instead of sending (offline load tests)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    processes = start_workers(args.db, fake=args.fake)
+    if not processes:
+        raise SystemExit(f'Notification workers for {args.db} already run in another process')
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop_workers(processes)
+
+
+if __name__ == '__main__':
+    main()
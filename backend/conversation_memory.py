@@ -0,0 +1,88 @@
+"""
+Conversation memory for chat sessions
+Per-session history fed back to the model within a per-tier token budget
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+class InMemoryHistoryStore:
+    """LRU of recent turns per session for single-process deployments"""
+
+    def __init__(self, max_sessions: int = 1000, max_turns: int = 20, ttl: int = 3600):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, Tuple[float, List[Dict]]]" = OrderedDict()
+
+    async def get_history(self, session_id: str) -> List[Dict]:
+        """Turns for a session, oldest first"""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return []
+        updated_at, turns = entry
+        if updated_at + self.ttl < time.time():
+            del self._sessions[session_id]
+            return []
+        self._sessions.move_to_end(session_id)
+        return list(turns)
+
+    async def append_history(self, session_id: str, turn: Dict):
+        """Add a question/answer turn to a session"""
+        _, turns = self._sessions.get(session_id, (0, []))
+        turns = (turns + [turn])[-self.max_turns:]
+        self._sessions[session_id] = (time.time(), turns)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+class ConversationMemory:
+    """Select the history that fits a tier's token budget.
+
+    ``store`` is anything with ``get_history``/``append_history`` coroutines:
+    ``InMemoryHistoryStore`` or the enterprise Redis ``SessionManager``.
+    Recent turns are kept verbatim, newest first, until the budget is spent;
+    older questions are folded into a one-line summary when room is left.
+    """
+
+    SUMMARY_QUESTION_CHARS = 80
+
+    def __init__(self, store):
+        self.store = store
+
+    async def get_context(self, session_id: str, token_budget: int) -> List[Dict]:
+        """Turns to feed back to the model, oldest first"""
+        if not session_id or token_budget <= 0:
+            return []
+
+        turns = await self.store.get_history(session_id)
+        selected = []
+        used = 0
+        for turn in reversed(turns):
+            cost = estimate_tokens(turn["question"]) + estimate_tokens(turn["answer"])
+            if used + cost > token_budget:
+                break
+            selected.insert(0, turn)
+            used += cost
+
+        older = turns[:len(turns) - len(selected)]
+        if older:
+            topics = "; ".join(turn["question"][:self.SUMMARY_QUESTION_CHARS] for turn in older)
+            summary = f"Earlier in this conversation the customer asked about: {topics}"
+            if used + estimate_tokens(summary) <= token_budget:
+                selected.insert(0, {"summary": summary})
+
+        return selected
+
+    async def remember(self, session_id: str, question: str, answer: str):
+        """Store a completed turn"""
+        if session_id:
+            await self.store.append_history(session_id, {"question": question, "answer": answer})
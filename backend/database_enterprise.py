@@ -8,9 +8,26 @@ from qdrant_client.async_qdrant_client import AsyncQdrantClient
 from contextlib import asynccontextmanager
 import os
 import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
 import logging
 import asyncio
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from inference_metrics import OLLAMA_METRIC_FIELDS
+from batch_writer import BatchWriter
+from email_outbox import OutboxMessage
+from pagination import PRIORITY_SCORES, clamp_page_size, decode_cursor, priority_score, split_page
+from schema_statements import SchemaStatements
+
+try:
+    import orjson
+except ImportError:  # optional: faster cache serialization
+    orjson = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -70,7 +87,8 @@ class DatabaseManager:
                 password=self.pg_password,
                 min_size=5,
                 max_size=20,
-                command_timeout=60
+                command_timeout=60,
+                statement_cache_size=DomainBasedRepository.statements.cache_size
             )
             logger.info("✅ PostgreSQL connection pool created")
         except Exception as e:
@@ -160,40 +178,50 @@ class DomainBasedRepository:
         "lodexinc": "lodex_inc"
     }
     
+    # Shared by all repositories: rendered SQL and per-schema execution counts
+    statements = SchemaStatements(DOMAIN_SCHEMAS)
+    
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
     
     def get_schema_for_domain(self, domain_brand: str) -> str:
         """Get PostgreSQL schema name for domain"""
-        return self.DOMAIN_SCHEMAS.get(domain_brand, "lz_custom")
+        return self.statements.schema_for(domain_brand)
+    
+    def render_query(self, query: str, domain_brand: str = "giorgiy") -> str:
+        """SQL for a ``{schema}`` query in the domain's schema"""
+        return self.statements.render(query, self.get_schema_for_domain(domain_brand))
+    
+    @classmethod
+    async def validate_schemas(cls, db_manager: DatabaseManager):
+        """Check that every schema in DOMAIN_SCHEMAS is a valid name and exists"""
+        async with db_manager.get_postgres_connection() as conn:
+            await cls.statements.validate(conn)
     
     async def execute_query(self, query: str, params: tuple = None, domain_brand: str = "giorgiy"):
         """Execute PostgreSQL query with domain-specific schema"""
-        schema = self.get_schema_for_domain(domain_brand)
-        formatted_query = query.replace("{schema}", schema)
+        sql = self.render_query(query, domain_brand)
         
         async with self.db.get_postgres_connection() as conn:
-            if params:
-                return await conn.fetch(formatted_query, *params)
-            else:
-                return await conn.fetch(formatted_query)
+            return await conn.fetch(sql, *(params or ()))
     
     async def execute_command(self, query: str, params: tuple = None, domain_brand: str = "giorgiy"):
         """Execute PostgreSQL command (INSERT, UPDATE, DELETE) with domain-specific schema"""
-        schema = self.get_schema_for_domain(domain_brand)
-        formatted_query = query.replace("{schema}", schema)
+        sql = self.render_query(query, domain_brand)
         
         async with self.db.get_postgres_connection() as conn:
-            if params:
-                return await conn.execute(formatted_query, *params)
-            else:
-                return await conn.execute(formatted_query)
+            return await conn.execute(sql, *(params or ()))
 
 class ProspectsRepository(DomainBasedRepository):
     """Repository for prospects/leads data"""
     
-    async def create_prospect(self, prospect_data: Dict[str, Any], domain_brand: str = "giorgiy") -> str:
-        """Create new prospect in domain-specific schema"""
+    async def create_prospect(self, prospect_data: Dict[str, Any], domain_brand: str = "giorgiy",
+                              notifications: List[OutboxMessage] = None) -> str:
+        """Create new prospect in domain-specific schema.
+
+        ``notifications`` are queued in shared.email_outbox in the same
+        transaction, so they exist if and only if the prospect does.
+        """
         query = """
             INSERT INTO {schema}.prospects (
                 name, email, phone, project_type, budget_range, timeline,
@@ -220,27 +248,57 @@ class ProspectsRepository(DomainBasedRepository):
             prospect_data.get('priority', 'normal')
         )
         
-        result = await self.execute_query(query, params, domain_brand)
-        return str(result[0]['id']) if result else None
-    
-    async def get_prospects(self, domain_brand: str = "giorgiy", limit: int = 100) -> List[Dict]:
-        """Get prospects for specific domain"""
-        query = """
+        sql = self.render_query(query, domain_brand)
+        async with self.db.get_postgres_connection() as conn:
+            async with conn.transaction():
+                prospect_id = await conn.fetchval(sql, *params)
+                if notifications:
+                    await EmailOutboxRepository.enqueue_in(conn, notifications)
+        return str(prospect_id) if prospect_id else None
+    
+    async def get_prospects(self, domain_brand: str = "giorgiy", limit: int = 100, cursor: str = None,
+                            status: str = None, priority: str = None, created_from: datetime = None,
+                            created_to: datetime = None) -> Tuple[List[Dict], Optional[str]]:
+        """Get one keyset page of prospects for a domain and the cursor for the next page.
+
+        Ordered by priority_score, created_at and id, all descending, so the
+        cursor condition is a single row comparison served by the keyset index.
+        Raises InvalidCursorError for a malformed cursor.
+        """
+        limit = clamp_page_size(limit)
+        conditions, params = [], []
+        if status:
+            params.append(status)
+            conditions.append(f"status = ${len(params)}")
+        if priority:
+            params.append(PRIORITY_SCORES.get(priority, -1))
+            conditions.append(f"priority_score = ${len(params)}")
+        if created_from:
+            params.append(created_from)
+            conditions.append(f"created_at >= ${len(params)}")
+        if created_to:
+            params.append(created_to)
+            conditions.append(f"created_at < ${len(params)}")
+        if cursor:
+            params.extend(decode_cursor(cursor, 3, types=(int, datetime.fromisoformat, uuid.UUID)))
+            conditions.append(f"(priority_score, created_at, id) < (${len(params) - 2}, ${len(params) - 1}, ${len(params)}::uuid)")
+        params.append(limit + 1)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        query = f"""
             SELECT id, name, email, phone, project_type, budget_range, 
                    timeline, created_at, status, priority
-            FROM {schema}.prospects 
-            ORDER BY 
-                CASE priority 
-                    WHEN 'high' THEN 1 
-                    WHEN 'normal' THEN 2 
-                    WHEN 'low' THEN 3 
-                END,
-                created_at DESC
-            LIMIT $1
+            FROM {{schema}}.prospects 
+            {where}
+            ORDER BY priority_score DESC, created_at DESC, id DESC
+            LIMIT ${len(params)}
         """
         
-        results = await self.execute_query(query, (limit,), domain_brand)
-        return [dict(row) for row in results]
+        results = await self.execute_query(query, tuple(params), domain_brand)
+        return split_page(
+            [dict(row) for row in results], limit,
+            lambda row: (priority_score(row["priority"]), row["created_at"], row["id"])
+        )
     
     async def get_prospect_by_id(self, prospect_id: str, domain_brand: str = "giorgiy") -> Optional[Dict]:
         """Get specific prospect by ID"""
@@ -248,28 +306,35 @@ class ProspectsRepository(DomainBasedRepository):
         results = await self.execute_query(query, (prospect_id,), domain_brand)
         return dict(results[0]) if results else None
     
-    async def update_prospect_status(self, prospect_id: str, status: str, notes: str = "", domain_brand: str = "giorgiy"):
-        """Update prospect status and notes"""
+    async def update_prospect_status(self, prospect_id: str, status: str, notes: str = "", domain_brand: str = "giorgiy") -> bool:
+        """Update prospect status and notes; False if there is no such prospect"""
         query = """
             UPDATE {schema}.prospects 
             SET status = $1, notes = $2, updated_at = CURRENT_TIMESTAMP
             WHERE id = $3
         """
-        await self.execute_command(query, (status, notes, prospect_id), domain_brand)
+        result = await self.execute_command(query, (status, notes, prospect_id), domain_brand)
+        # Command tag is "UPDATE <rows>"
+        return result.split()[-1] != "0"
 
 class ChatRepository(DomainBasedRepository):
     """Repository for chat conversations"""
     
+    CONVERSATION_COLUMNS = [
+        "session_id", "user_message", "ai_response", "model_used", "tier",
+        "response_time", "success", "error_message", "user_ip", "user_agent",
+        "time_to_first_token", "requested_tier", *OLLAMA_METRIC_FIELDS
+    ]
+    
+    def __init__(self, db_manager: DatabaseManager):
+        super().__init__(db_manager)
+        # Conversations are written behind the request with COPY, batched per schema
+        self.writer = BatchWriter(self._copy_conversations, name="chat log")
+    
     async def log_conversation(self, conversation_data: Dict[str, Any], domain_brand: str = "giorgiy"):
-        """Log chat conversation in domain-specific schema"""
-        query = """
-            INSERT INTO {schema}.chat_conversations (
-                session_id, user_message, ai_response, model_used, tier,
-                response_time, success, error_message, user_ip, user_agent
-            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-        """
-        
-        params = (
+        """Queue a chat conversation for the domain-specific schema"""
+        metrics = conversation_data.get('metrics') or {}
+        record = (
             conversation_data['session_id'],
             conversation_data['user_message'],
             conversation_data['ai_response'],
@@ -279,60 +344,283 @@ class ChatRepository(DomainBasedRepository):
             conversation_data['success'],
             conversation_data.get('error_message'),
             conversation_data.get('user_ip'),
-            conversation_data.get('user_agent')
+            conversation_data.get('user_agent'),
+            conversation_data.get('time_to_first_token'),
+            conversation_data.get('requested_tier'),
+            *(metrics.get(field) for field in OLLAMA_METRIC_FIELDS)
         )
         
-        await self.execute_command(query, params, domain_brand)
+        await self.writer.submit(self.get_schema_for_domain(domain_brand), record)
+    
+    async def _copy_conversations(self, schema: str, records: List[tuple]):
+        """Bulk-insert queued conversations into one schema"""
+        async with self.db.get_postgres_connection() as conn:
+            await conn.copy_records_to_table(
+                "chat_conversations",
+                schema_name=schema,
+                columns=self.CONVERSATION_COLUMNS,
+                records=records
+            )
     
-    async def get_conversations(self, domain_brand: str = "giorgiy", session_id: str = None, limit: int = 50) -> List[Dict]:
-        """Get chat conversations for domain"""
+    async def get_conversations(self, domain_brand: str = "giorgiy", session_id: str = None, limit: int = 50,
+                                cursor: str = None, created_from: datetime = None,
+                                created_to: datetime = None) -> Tuple[List[Dict], Optional[str]]:
+        """Get one keyset page of chat conversations (newest first) and the next cursor"""
+        limit = clamp_page_size(limit)
+        conditions, params = [], []
         if session_id:
-            query = """
-                SELECT * FROM {schema}.chat_conversations
-                WHERE session_id = $1
-                ORDER BY created_at DESC
-                LIMIT $2
-            """
-            params = (session_id, limit)
-        else:
-            query = """
-                SELECT * FROM {schema}.chat_conversations
-                ORDER BY created_at DESC
-                LIMIT $1
-            """
-            params = (limit,)
+            params.append(session_id)
+            conditions.append(f"session_id = ${len(params)}")
+        if created_from:
+            params.append(created_from)
+            conditions.append(f"created_at >= ${len(params)}")
+        if created_to:
+            params.append(created_to)
+            conditions.append(f"created_at < ${len(params)}")
+        if cursor:
+            params.extend(decode_cursor(cursor, 2, types=(datetime.fromisoformat, uuid.UUID)))
+            conditions.append(f"(created_at, id) < (${len(params) - 1}, ${len(params)}::uuid)")
+        params.append(limit + 1)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        query = f"""
+            SELECT * FROM {{schema}}.chat_conversations
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ${len(params)}
+        """
+        
+        results = await self.execute_query(query, tuple(params), domain_brand)
+        return split_page([dict(row) for row in results], limit, lambda row: (row["created_at"], row["id"]))
+
+class AnalyticsRepository(DomainBasedRepository):
+    """Cross-brand reporting over every brand schema"""
+    
+    async def get_overview(self, created_from: datetime = None, created_to: datetime = None) -> Dict[str, Dict]:
+        """Per-brand prospect and chat metrics in one query.
+
+        Rows from every brand schema are combined with UNION ALL and
+        aggregated with GROUP BY; latency percentiles cover successful
+        replies only. The range is created_from inclusive, created_to
+        exclusive.
+        """
+        conditions, params = [], []
+        if created_from:
+            params.append(created_from)
+            conditions.append(f"created_at >= ${len(params)}")
+        if created_to:
+            params.append(created_to)
+            conditions.append(f"created_at < ${len(params)}")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        def union(columns: str, table: str) -> str:
+            return "\n                UNION ALL\n".join(
+                f"                SELECT '{brand}' AS domain_brand, {columns} FROM {schema}.{table} {where}"
+                for brand, schema in self.DOMAIN_SCHEMAS.items()
+            )
         
-        results = await self.execute_query(query, params, domain_brand)
+        query = f"""
+            WITH prospects AS (
+{union("status, priority", "prospects")}
+            ), conversations AS (
+{union("session_id, success, response_time, time_to_first_token", "chat_conversations")}
+            ), prospect_stats AS (
+                SELECT domain_brand,
+                       COUNT(*) AS prospects_count,
+                       COUNT(*) FILTER (WHERE status = 'won') AS won_count,
+                       COUNT(*) FILTER (WHERE priority = 'high') AS high_priority_count
+                FROM prospects
+                GROUP BY domain_brand
+            ), status_stats AS (
+                SELECT domain_brand, jsonb_object_agg(status, count) AS by_status
+                FROM (
+                    SELECT domain_brand, COALESCE(status, 'new') AS status, COUNT(*) AS count
+                    FROM prospects
+                    GROUP BY 1, 2
+                ) counts
+                GROUP BY domain_brand
+            ), chat_stats AS (
+                SELECT domain_brand,
+                       COUNT(*) AS conversations_count,
+                       COUNT(DISTINCT session_id) AS sessions_count,
+                       COUNT(*) FILTER (WHERE success) AS successful_count,
+                       percentile_cont(ARRAY[0.5, 0.95]) WITHIN GROUP (ORDER BY response_time::float8)
+                           FILTER (WHERE success) AS response_time_pct,
+                       percentile_cont(ARRAY[0.5, 0.95]) WITHIN GROUP (ORDER BY time_to_first_token::float8)
+                           FILTER (WHERE success) AS time_to_first_token_pct
+                FROM conversations
+                GROUP BY domain_brand
+            )
+            SELECT *
+            FROM prospect_stats
+            FULL JOIN status_stats USING (domain_brand)
+            FULL JOIN chat_stats USING (domain_brand)
+        """
+        
+        rows = {row["domain_brand"]: row for row in await self.execute_query(query, tuple(params))}
+        overview = {}
+        for brand in self.DOMAIN_SCHEMAS:
+            row = rows.get(brand) or {}
+            prospects_count = row.get("prospects_count") or 0
+            conversations_count = row.get("conversations_count") or 0
+            response_time = row.get("response_time_pct") or [None, None]
+            first_token = row.get("time_to_first_token_pct") or [None, None]
+            overview[brand] = {
+                "prospects_count": prospects_count,
+                "prospects_by_status": json.loads(row["by_status"]) if row.get("by_status") else {},
+                "high_priority_count": row.get("high_priority_count") or 0,
+                "conversion_rate": round((row.get("won_count") or 0) / prospects_count, 4) if prospects_count else None,
+                "conversations_count": conversations_count,
+                "sessions_count": row.get("sessions_count") or 0,
+                "chat_success_rate": round(row["successful_count"] / conversations_count, 4) if conversations_count else None,
+                "response_time_p50": response_time[0],
+                "response_time_p95": response_time[1],
+                "time_to_first_token_p50": first_token[0],
+                "time_to_first_token_p95": first_token[1]
+            }
+        return overview
+
+class EmailOutboxRepository(DomainBasedRepository):
+    """shared.email_outbox storage for email_outbox.OutboxSender"""
+    
+    @staticmethod
+    async def enqueue_in(conn, messages: List[OutboxMessage]):
+        """Insert messages on an open connection (inside the caller's transaction)"""
+        await conn.executemany("""
+            INSERT INTO shared.email_outbox (to_email, subject, body, is_html, kind, domain)
+            VALUES ($1, $2, $3, $4, $5, $6)
+        """, [(m.to_email, m.subject, m.body, m.is_html, m.kind, m.domain_brand) for m in messages])
+    
+    async def enqueue(self, messages: List[OutboxMessage]):
+        async with self.db.get_postgres_connection() as conn:
+            await self.enqueue_in(conn, messages)
+    
+    async def release_stale(self):
+        """Return messages left 'sending' by a stopped worker to the queue"""
+        # Rows still locked by other live workers are claimed again only after they finish
+        await self.execute_command("""
+            UPDATE shared.email_outbox SET status = 'pending'
+            WHERE status = 'sending' AND next_attempt_at < CURRENT_TIMESTAMP - INTERVAL '10 minutes'
+        """)
+    
+    async def claim(self, limit: int) -> List[Dict]:
+        """Mark up to ``limit`` due messages as sending and return them.
+
+        SKIP LOCKED lets several backend workers drain the outbox without
+        claiming the same message twice.
+        """
+        results = await self.execute_query("""
+            UPDATE shared.email_outbox
+            SET status = 'sending', attempts = attempts + 1, next_attempt_at = CURRENT_TIMESTAMP
+            WHERE id IN (
+                SELECT id FROM shared.email_outbox
+                WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+                ORDER BY next_attempt_at, id
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, to_email, subject, body, is_html, attempts
+        """, (limit,))
         return [dict(row) for row in results]
+    
+    async def record_results(self, sent: List[int], retries: List[Tuple[int, str, float]],
+                             failures: List[Tuple[int, str]]):
+        """Store the outcome of a delivery batch"""
+        async with self.db.get_postgres_connection() as conn:
+            async with conn.transaction():
+                if sent:
+                    await conn.execute("""
+                        UPDATE shared.email_outbox
+                        SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL
+                        WHERE id = ANY($1::bigint[])
+                    """, sent)
+                if retries:
+                    await conn.executemany("""
+                        UPDATE shared.email_outbox
+                        SET status = 'pending', last_error = $1,
+                            next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => $2)
+                        WHERE id = $3
+                    """, [(error, delay, message_id) for message_id, error, delay in retries])
+                if failures:
+                    await conn.executemany("""
+                        UPDATE shared.email_outbox SET status = 'failed', last_error = $1 WHERE id = $2
+                    """, [(error, message_id) for message_id, error in failures])
+    
+    async def status_counts(self) -> Dict[str, int]:
+        results = await self.execute_query("SELECT status, COUNT(*) AS count FROM shared.email_outbox GROUP BY status")
+        return {row["status"]: row["count"] for row in results}
 
 class SessionManager:
-    """Redis-based session management"""
+    """Redis-based session management.
+
+    ``touch_session`` creates a session or, if it already exists, only
+    refreshes its TTL, and counts new messages, in one Lua round trip; the
+    chat endpoints call it once per message, after the reply. The ``shared.sessions`` row in
+    PostgreSQL is written behind the request by ``mirror``, one batched
+    upsert per flush.
+    """
+    
+    # Refresh an existing session, or create it, then count messages:
+    # ARGV = ttl, messages, field, value, ...
+    TOUCH_SESSION = """
+        local created = 0
+        if redis.call('EXPIRE', KEYS[1], ARGV[1]) == 0 then
+            redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+            redis.call('EXPIRE', KEYS[1], ARGV[1])
+            created = 1
+        end
+        if tonumber(ARGV[2]) > 0 then
+            redis.call('HINCRBY', KEYS[1], 'message_count', ARGV[2])
+        end
+        return created
+    """
     
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
         self.redis = db_manager.get_redis()
-    
-    async def create_session(self, session_id: str, domain_brand: str, user_data: Dict = None, ttl: int = 3600):
-        """Create new session in Redis"""
+        self._touch = self.redis.register_script(self.TOUCH_SESSION)
+        self.mirror = BatchWriter(self._upsert_sessions, name="session mirror")
+        self.stats = {"created": 0, "refreshed": 0}
+    
+    async def touch_session(self, session_id: str, domain_brand: str, user_data: Dict = None, ttl: int = 3600,
+                            messages: int = 0) -> bool:
+        """Create a session, or refresh the TTL of an existing one, and add ``messages``
+        to its message count; True if it was created"""
         session_data = {
             "domain_brand": domain_brand,
-            "created_at": str(asyncio.get_event_loop().time()),
+            "created_at": str(time.time()),
             "message_count": 0,
             **(user_data or {})
         }
+        args = [ttl, messages]
+        for field, value in session_data.items():
+            # Redis rejects None; store missing values as empty strings
+            args.extend((field, "" if value is None else value))
+        created = bool(await self._touch(keys=[f"session:{session_id}"], args=args))
+        self.stats["created" if created else "refreshed"] += 1
         
-        await self.redis.hset(f"session:{session_id}", mapping=session_data)
-        await self.redis.expire(f"session:{session_id}", ttl)
-        
-        # Also log in PostgreSQL shared.sessions table
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        await self.mirror.submit("shared.sessions", (session_id, domain_brand, expires_at))
+        return created
+    
+    async def create_session(self, session_id: str, domain_brand: str, user_data: Dict = None, ttl: int = 3600):
+        """Create new session in Redis (refreshes an existing one)"""
+        return await self.touch_session(session_id, domain_brand, user_data, ttl)
+    
+    async def _upsert_sessions(self, table: str, rows: List[tuple]):
+        """Mirror queued sessions into shared.sessions, latest expiry per session"""
+        latest = {row[0]: row for row in rows}
         async with self.db.get_postgres_connection() as conn:
-            await conn.execute("""
+            await conn.executemany("""
                 INSERT INTO shared.sessions (session_token, domain, expires_at)
-                VALUES ($1, $2, NOW() + INTERVAL '%s seconds')
+                VALUES ($1, $2, $3)
                 ON CONFLICT (session_token) DO UPDATE SET
                     domain = EXCLUDED.domain,
-                    expires_at = EXCLUDED.expires_at
-            """ % ttl, session_id, domain_brand)
+                    expires_at = GREATEST(shared.sessions.expires_at, EXCLUDED.expires_at)
+            """, list(latest.values()))
+    
+    def get_stats(self) -> Dict:
+        return {**self.stats, "mirror": self.mirror.get_stats()}
     
     async def get_session(self, session_id: str) -> Optional[Dict]:
         """Get session data from Redis"""
@@ -343,39 +631,236 @@ class SessionManager:
         """Update session data"""
         await self.redis.hset(f"session:{session_id}", mapping=updates)
     
-    async def increment_message_count(self, session_id: str):
-        """Increment message count for session"""
-        await self.redis.hincrby(f"session:{session_id}", "message_count", 1)
+    async def increment_message_count(self, session_id: str, ttl: int = 3600):
+        """Increment message count for session and keep it alive, in one round trip"""
+        key = f"session:{session_id}"
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hincrby(key, "message_count", 1)
+            pipe.expire(key, ttl)
+            await pipe.execute()
     
     async def delete_session(self, session_id: str):
         """Delete session"""
-        await self.redis.delete(f"session:{session_id}")
+        await self.redis.delete(f"session:{session_id}", f"session:{session_id}:history")
+
+    async def get_history(self, session_id: str) -> List[Dict]:
+        """Get recent conversation turns for a session, oldest first"""
+        turns = await self.redis.lrange(f"session:{session_id}:history", 0, -1)
+        return [json.loads(turn) for turn in turns]
+
+    async def append_history(self, session_id: str, turn: Dict, max_turns: int = 20, ttl: int = 3600):
+        """Append a conversation turn, keeping only the most recent ones"""
+        key = f"session:{session_id}:history"
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, json.dumps(turn))
+            pipe.ltrim(key, -max_turns, -1)
+            pipe.expire(key, ttl)
+            await pipe.execute()
 
 class CacheManager:
-    """Redis-based caching for API responses"""
-    
-    def __init__(self, db_manager: DatabaseManager):
+    """Two-level cache for API responses: an in-process LRU (L1) in front of Redis (L2).
+
+    Per-brand entries are versioned: each brand has a generation counter
+    (``cachegen:{brand}``) that is part of every key cached for it, so
+    invalidating a brand is a single INCR and superseded entries simply
+    expire by TTL.
+
+    ``get_or_compute_for_domain`` adds stampede protection: concurrent misses
+    in one process share a single computation, and entries are refreshed
+    early with a probability that rises as they near expiry (XFetch), so
+    processes do not all recompute when a key expires. L1 entries live for
+    ``l1_ttl`` seconds; a write in another process can be served stale from
+    L1 for at most that long.
+    """
+    
+    GENERATION_KEY = "cachegen:{domain_brand}"
+    
+    # Read a brand's generation and the entry cached under it in one round trip
+    GET_VERSIONED = """
+        local generation = redis.call('GET', KEYS[1]) or '0'
+        -- A nil would truncate the table; false comes back as None
+        return {generation, redis.call('GET', ARGV[1] .. ':g' .. generation) or false}
+    """
+    
+    def __init__(self, db_manager: DatabaseManager, l1_size: int = None, l1_ttl: float = None,
+                 serializer: str = None, early_refresh_beta: float = 1.0):
         self.redis = db_manager.get_redis()
+        self._get_versioned = self.redis.register_script(self.GET_VERSIONED)
+        
+        self.l1_size = l1_size if l1_size is not None else int(os.getenv("CACHE_L1_SIZE", "256"))
+        self.l1_ttl = l1_ttl if l1_ttl is not None else float(os.getenv("CACHE_L1_TTL", "5"))
+        # (brand, key) -> (expires_at, local generation, value)
+        self._l1: "OrderedDict[Tuple[str, str], Tuple[float, int, Any]]" = OrderedDict()
+        # Bumped by invalidate_domain so this process drops its L1 entries for a brand at once
+        self._l1_generations: Dict[str, int] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.early_refresh_beta = early_refresh_beta
+        
+        serializer = serializer or os.getenv("CACHE_SERIALIZER", "json")
+        self.serializer = "orjson" if serializer == "orjson" and orjson is not None else "json"
+        self.stats: Dict[str, Dict[str, float]] = {}
+    
+    def dumps(self, value: Any):
+        if self.serializer == "orjson":
+            return orjson.dumps(value, default=str)
+        return json.dumps(value, default=str)
+    
+    def loads(self, payload):
+        return orjson.loads(payload) if self.serializer == "orjson" else json.loads(payload)
     
     async def get(self, key: str) -> Optional[Any]:
         """Get cached value"""
         value = await self.redis.get(key)
-        return json.loads(value) if value else None
+        return self.loads(value) if value else None
     
     async def set(self, key: str, value: Any, ttl: int = 300):
         """Set cached value with TTL"""
-        await self.redis.setex(key, ttl, json.dumps(value, default=str))
+        await self.redis.setex(key, ttl, self.dumps(value))
     
     async def delete(self, key: str):
         """Delete cached value"""
         await self.redis.delete(key)
     
+    async def get_for_domain(self, domain_brand: str, key: str) -> Tuple[Optional[Any], int]:
+        """Get a brand-scoped value from Redis and the brand's current generation.
+
+        Pass the generation back to ``set_for_domain`` so a value computed
+        before an invalidation is never stored under the newer generation.
+        """
+        entry, generation = await self._get_entry(domain_brand, key)
+        return (entry["value"] if entry else None), generation
+    
+    async def set_for_domain(self, domain_brand: str, key: str, generation: int, value: Any, ttl: int = 300):
+        """Cache a brand-scoped value under the generation it was read at"""
+        await self.redis.setex(f"{key}:g{generation}", ttl, self._entry(value, ttl))
+    
+    async def get_or_compute_for_domain(self, domain_brand: str, key: str, compute: Callable[[], Awaitable[Any]],
+                                        ttl: int = 300) -> Tuple[Any, bool]:
+        """Cached brand-scoped value, computing and storing it on a miss.
+
+        Returns (value, cached). Values are returned as they decode from the
+        cache (e.g. timestamps as strings) whether or not they were cached.
+        """
+        started = time.perf_counter()
+        l1_key = (domain_brand, key)
+        
+        value = self._l1_get(l1_key)
+        if value is not None:
+            self._record(key, "l1_hits", started)
+            return value, True
+        
+        # One Redis lookup and recompute per key per process at a time. The load runs in
+        # its own task, so a caller that goes away (e.g. client disconnect) does not
+        # cancel it for the others
+        task = self._inflight.get(l1_key)
+        if task is not None:
+            value, cached = await asyncio.shield(task)
+            self._record(key, "coalesced", started)
+            return value, cached
+        
+        task = asyncio.ensure_future(self._load(domain_brand, key, compute, ttl, started))
+        self._inflight[l1_key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(l1_key, None))
+        # Retrieve the exception even if every waiter went away
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+    
+    async def invalidate_domain(self, domain_brand: str) -> int:
+        """Invalidate everything cached for a brand (O(1)); returns the new generation"""
+        self._l1_generations[domain_brand] = self._l1_generations.get(domain_brand, 0) + 1
+        return await self.redis.incr(self.GENERATION_KEY.format(domain_brand=domain_brand))
+    
     async def clear_domain_cache(self, domain_brand: str):
         """Clear all cache for specific domain"""
-        pattern = f"*:{domain_brand}:*"
-        keys = await self.redis.keys(pattern)
-        if keys:
-            await self.redis.delete(*keys)
+        await self.invalidate_domain(domain_brand)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit ratio and lookup latency per key family (the part of the key before the first ':')"""
+        families = {}
+        for family, stats in self.stats.items():
+            lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"] + stats["coalesced"]
+            families[family] = {
+                **{name: int(stats[name]) for name in ("l1_hits", "l2_hits", "misses", "coalesced", "early_refreshes")},
+                "hit_ratio": round((stats["l1_hits"] + stats["l2_hits"]) / lookups, 3) if lookups else 0.0,
+                "avg_ms": round(stats["total_time"] / lookups * 1000, 3) if lookups else 0.0,
+                "max_ms": round(stats["max_time"] * 1000, 3)
+            }
+        return {
+            "serializer": self.serializer,
+            "l1": {"entries": len(self._l1), "max_entries": self.l1_size, "ttl": self.l1_ttl},
+            "keys": families
+        }
+    
+    async def _load(self, domain_brand: str, key: str, compute, ttl: int, started: float) -> Tuple[Any, bool]:
+        """L2 lookup with early refresh, else compute and store in both levels"""
+        l1_generation = self._l1_generations.get(domain_brand, 0)
+        entry, generation = await self._get_entry(domain_brand, key)
+        if entry is not None and not self._refresh_early(entry):
+            self._l1_set((domain_brand, key), l1_generation, entry["value"])
+            self._record(key, "l2_hits", started)
+            return entry["value"], True
+        
+        if entry is not None:
+            self._record(key, "early_refreshes")
+        computed_at = time.perf_counter()
+        value = await compute()
+        delta = time.perf_counter() - computed_at
+        
+        payload = self._entry(value, ttl, delta)
+        await self.redis.setex(f"{key}:g{generation}", ttl, payload)
+        value = self.loads(payload)["value"]
+        self._l1_set((domain_brand, key), l1_generation, value)
+        self._record(key, "misses", started)
+        return value, False
+    
+    async def _get_entry(self, domain_brand: str, key: str) -> Tuple[Optional[Dict], int]:
+        generation, payload = await self._get_versioned(
+            keys=[self.GENERATION_KEY.format(domain_brand=domain_brand)],
+            args=[key]
+        )
+        entry = self.loads(payload) if payload else None
+        if not (isinstance(entry, dict) and "value" in entry and "expires_at" in entry):
+            entry = None
+        return entry, int(generation)
+    
+    def _entry(self, value: Any, ttl: int, delta: float = 0.0):
+        """Serialized L2 entry: the value plus its expiry and compute time (for XFetch)"""
+        return self.dumps({"value": value, "expires_at": time.time() + ttl, "delta": delta})
+    
+    def _refresh_early(self, entry: Dict) -> bool:
+        """XFetch: recompute before expiry with probability growing as expiry nears"""
+        delta = entry.get("delta", 0)
+        return time.time() - delta * self.early_refresh_beta * math.log(1.0 - random.random()) >= entry["expires_at"]
+    
+    def _l1_get(self, l1_key: Tuple[str, str]) -> Optional[Any]:
+        entry = self._l1.get(l1_key)
+        if entry is None:
+            return None
+        expires_at, generation, value = entry
+        if expires_at <= time.monotonic() or generation != self._l1_generations.get(l1_key[0], 0):
+            del self._l1[l1_key]
+            return None
+        self._l1.move_to_end(l1_key)
+        return value
+    
+    def _l1_set(self, l1_key: Tuple[str, str], generation: int, value: Any):
+        if self.l1_size <= 0 or generation != self._l1_generations.get(l1_key[0], 0):
+            return
+        self._l1[l1_key] = (time.monotonic() + self.l1_ttl, generation, value)
+        self._l1.move_to_end(l1_key)
+        while len(self._l1) > self.l1_size:
+            self._l1.popitem(last=False)
+    
+    def _record(self, key: str, counter: str, started: float = None):
+        stats = self.stats.setdefault(key.split(":", 1)[0], {
+            "l1_hits": 0, "l2_hits": 0, "misses": 0, "coalesced": 0, "early_refreshes": 0,
+            "total_time": 0.0, "max_time": 0.0
+        })
+        stats[counter] += 1
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            stats["total_time"] += elapsed
+            stats["max_time"] = max(stats["max_time"], elapsed)
 
 # Global database manager instance
 db_manager = DatabaseManager()
\ No newline at end of file
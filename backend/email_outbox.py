@@ -0,0 +1,303 @@
+"""
+Durable email outbox
+Messages are stored alongside the write that triggers them and delivered by a
+background sender over pooled, authenticated SMTP connections
+"""
+
+import asyncio
+import os
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, List, Optional, Tuple
+
+# Rejections that will not succeed on retry
+PERMANENT_SMTP_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPNotSupportedError
+)
+
+
+@dataclass
+class OutboxMessage:
+    to_email: str
+    subject: str
+    body: str
+    is_html: bool = True
+    kind: Optional[str] = None
+    domain_brand: Optional[str] = None
+
+
+class SMTPConnectionPool:
+    """Authenticated SMTP connections reused across messages.
+
+    Used from the sender's worker threads. Idle connections are checked with
+    NOOP before reuse and closed after ``idle_timeout`` seconds.
+    """
+
+    def __init__(self, config: Dict, size: int = None, idle_timeout: float = None, timeout: float = None):
+        self.config = config
+        self.size = size or int(os.environ.get('SMTP_POOL_SIZE', '2'))
+        self.idle_timeout = idle_timeout or float(os.environ.get('SMTP_IDLE_TIMEOUT', '60'))
+        self.timeout = timeout or float(os.environ.get('SMTP_TIMEOUT', '30'))
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._lock = threading.Lock()
+        self.stats = {"connects": 0, "reuses": 0, "discarded": 0}
+
+    def acquire(self) -> smtplib.SMTP:
+        """Get a live connection, reusing an idle one when possible"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            if time.time() - last_used < self.idle_timeout:
+                try:
+                    server.noop()
+                    self.stats["reuses"] += 1
+                    return server
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self._close(server)
+        return self._connect()
+
+    def release(self, server: smtplib.SMTP, healthy: bool = True):
+        """Return a connection; broken ones are closed"""
+        if healthy:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append((server, time.time()))
+                    return
+        self._close(server)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.config["smtp_server"], self.config["smtp_port"], timeout=self.timeout)
+        if self.config.get("smtp_password"):
+            server.starttls()
+            server.login(self.config["smtp_username"], self.config["smtp_password"])
+        self.stats["connects"] += 1
+        return server
+
+    def _close(self, server: smtplib.SMTP):
+        self.stats["discarded"] += 1
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+
+class SQLiteOutboxStore:
+    """email_outbox table in the SQLite backend (created by sqlite_migrations)"""
+
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def enqueue_in(conn, messages: List[OutboxMessage]):
+        """Insert messages using an open writer connection (same transaction as the caller)"""
+        conn.executemany('''
+            INSERT INTO email_outbox (to_email, subject, body, is_html, kind, domain_brand)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(m.to_email, m.subject, m.body, m.is_html, m.kind, m.domain_brand) for m in messages])
+
+    async def enqueue(self, messages: List[OutboxMessage]):
+        await self.db.write(self.enqueue_in, messages)
+
+    async def release_stale(self):
+        """Return messages left 'sending' by a stopped process to the queue"""
+        # Claims held by other live workers sharing the database are younger than the 10 minute lease
+        await self.db.execute('''
+            UPDATE email_outbox SET status = 'pending'
+            WHERE status = 'sending' AND next_attempt_at < datetime('now', '-10 minutes')
+        ''')
+
+    async def claim(self, limit: int) -> List[Dict]:
+        """Mark up to ``limit`` due messages as sending and return them"""
+        def claim(conn):
+            rows = conn.execute('''
+                SELECT id, to_email, subject, body, is_html, attempts
+                FROM email_outbox
+                WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+                ORDER BY next_attempt_at, id
+                LIMIT ?
+            ''', (limit,)).fetchall()
+            conn.executemany('''
+                UPDATE email_outbox
+                SET status = 'sending', attempts = attempts + 1, next_attempt_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', [(row[0],) for row in rows])
+            return [{
+                "id": row[0], "to_email": row[1], "subject": row[2], "body": row[3],
+                "is_html": bool(row[4]), "attempts": row[5] + 1
+            } for row in rows]
+        return await self.db.write(claim)
+
+    async def record_results(self, sent: List[int], retries: List[Tuple[int, str, float]],
+                             failures: List[Tuple[int, str]]):
+        """Store the outcome of a delivery batch"""
+        def record(conn):
+            conn.executemany('''
+                UPDATE email_outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL
+                WHERE id = ?
+            ''', [(message_id,) for message_id in sent])
+            conn.executemany('''
+                UPDATE email_outbox
+                SET status = 'pending', last_error = ?,
+                    next_attempt_at = datetime('now', '+' || CAST(? AS INTEGER) || ' seconds')
+                WHERE id = ?
+            ''', [(error, delay, message_id) for message_id, error, delay in retries])
+            conn.executemany('''
+                UPDATE email_outbox SET status = 'failed', last_error = ? WHERE id = ?
+            ''', [(error, message_id) for message_id, error in failures])
+        await self.db.write(record)
+
+    async def status_counts(self) -> Dict[str, int]:
+        rows = await self.db.fetch_all('SELECT status, COUNT(*) AS count FROM email_outbox GROUP BY status')
+        return {row["status"]: row["count"] for row in rows}
+
+
+class OutboxSender:
+    """Background delivery of outbox messages.
+
+    Claims up to ``batch_size`` due messages, sends them over one pooled SMTP
+    connection in a worker thread and records each outcome. Transient failures
+    are retried with exponential backoff (``backoff_base`` * 2^attempt, with
+    jitter) until ``max_attempts``; permanent rejections fail immediately.
+    """
+
+    def __init__(self, store, smtp_pool: SMTPConnectionPool, from_email: str, batch_size: int = None,
+                 poll_interval: float = None, max_attempts: int = None, backoff_base: float = None):
+        self.store = store
+        self.smtp_pool = smtp_pool
+        self.from_email = from_email
+        self.batch_size = batch_size or int(os.environ.get('EMAIL_BATCH_SIZE', '20'))
+        self.poll_interval = poll_interval or float(os.environ.get('EMAIL_POLL_INTERVAL', '5'))
+        self.max_attempts = max_attempts or int(os.environ.get('EMAIL_MAX_ATTEMPTS', '6'))
+        self.backoff_base = backoff_base or float(os.environ.get('EMAIL_BACKOFF_BASE', '30'))
+        self._executor = ThreadPoolExecutor(max_workers=smtp_pool.size, thread_name_prefix='smtp-sender')
+        self._wake: asyncio.Event = None
+        self._task = None
+        self._stopping = False
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "batches": 0}
+
+    def start(self):
+        """Start the delivery loop"""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Finish the current batch and stop"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        self.smtp_pool.close_all()
+
+    def wake(self):
+        """Deliver newly queued messages without waiting for the next poll"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "outbox": await self.store.status_counts(),
+            "smtp": dict(self.smtp_pool.stats)
+        }
+
+    async def _run(self):
+        await self.store.release_stale()
+        while not self._stopping:
+            try:
+                claimed = await self.process_batch()
+            except Exception as e:
+                print(f"⚠️  Email outbox delivery failed: {e}")
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    async def process_batch(self) -> int:
+        """Deliver one batch of due messages; returns how many were claimed"""
+        messages = await self.store.claim(self.batch_size)
+        if not messages:
+            return 0
+
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self._executor, self._deliver, messages)
+
+        sent, retries, failures = [], [], []
+        for message, error, permanent in results:
+            if error is None:
+                sent.append(message["id"])
+            elif permanent or message["attempts"] >= self.max_attempts:
+                failures.append((message["id"], error))
+                print(f"❌ Email to {message['to_email']} failed permanently: {error}")
+            else:
+                retries.append((message["id"], error, self._backoff(message["attempts"])))
+
+        await self.store.record_results(sent, retries, failures)
+        self.stats["sent"] += len(sent)
+        self.stats["retried"] += len(retries)
+        self.stats["failed"] += len(failures)
+        self.stats["batches"] += 1
+        return len(messages)
+
+    def _deliver(self, messages: List[Dict]) -> List[Tuple[Dict, Optional[str], bool]]:
+        """Send a batch on one connection (runs in a worker thread)"""
+        results = []
+        server = None
+        for message in messages:
+            try:
+                if server is None:
+                    server = self.smtp_pool.acquire()
+                server.send_message(self._compose(message))
+                results.append((message, None, False))
+            except Exception as e:
+                permanent = self._is_permanent(e)
+                results.append((message, str(e), permanent))
+                if not permanent and server is not None:
+                    # The connection may be broken; reconnect for the next message
+                    self.smtp_pool.release(server, healthy=False)
+                    server = None
+        if server is not None:
+            self.smtp_pool.release(server)
+        return results
+
+    def _compose(self, message: Dict) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg['From'] = self.from_email
+        msg['To'] = message["to_email"]
+        msg['Subject'] = message["subject"]
+        msg.attach(MIMEText(message["body"], 'html' if message["is_html"] else 'plain'))
+        return msg
+
+    @staticmethod
+    def _is_permanent(error: Exception) -> bool:
+        if isinstance(error, PERMANENT_SMTP_ERRORS):
+            return True
+        return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_base * 2 ** (attempts - 1), 3600)
+        return delay * random.uniform(0.8, 1.2)
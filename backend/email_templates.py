@@ -0,0 +1,117 @@
+"""
+Per-brand email templates
+Jinja2 templates compiled once at startup and rendered with HTML autoescaping
+
+Templates live in EMAIL_TEMPLATE_DIR (default: templates/email next to this file),
+two per kind: ``<kind>.subject.txt`` and ``<kind>.html``. A brand overrides either
+by placing a file of the same name in ``<brand>/``, e.g. ``bravoohio/owner_notification.html``.
+Set EMAIL_TEMPLATE_RELOAD=1 to pick up edited templates without a restart.
+"""
+
+import os
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, Template, select_autoescape
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+
+# Message kinds, matching OutboxMessage.kind
+TEMPLATE_KINDS = ("owner_notification", "prospect_autoreply", "contact_notification")
+
+
+class EmailTemplates:
+    """Compiled subject/body templates for every brand and kind.
+
+    ``render`` looks up the precompiled pair for (brand, kind); with
+    ``auto_reload`` it goes through the Jinja2 environment instead, which
+    recompiles a template when its file changes. Render times are kept per
+    kind.
+    """
+
+    def __init__(self, domain_configs: Dict[str, Dict], default_brand: str = "giorgiy",
+                 template_dir: str = None, auto_reload: bool = None):
+        self.domain_configs = domain_configs
+        self.default_brand = default_brand
+        self.template_dir = template_dir or os.environ.get('EMAIL_TEMPLATE_DIR', DEFAULT_TEMPLATE_DIR)
+        if auto_reload is None:
+            auto_reload = os.environ.get('EMAIL_TEMPLATE_RELOAD', '').lower() in ('1', 'true', 'yes')
+        self.auto_reload = auto_reload
+        self.env = Environment(
+            loader=FileSystemLoader(self.template_dir),
+            autoescape=select_autoescape(enabled_extensions=('html',), default_for_string=False),
+            undefined=StrictUndefined,
+            auto_reload=auto_reload,
+            cache_size=-1
+        )
+        self._compiled: Dict[Tuple[str, str], Tuple[Template, Template]] = {}
+        self.stats: Dict[str, Dict] = {}
+
+    def load(self) -> int:
+        """Compile every brand/kind pair; returns the number of pairs"""
+        compiled = {}
+        for brand in self.domain_configs:
+            for kind in TEMPLATE_KINDS:
+                compiled[(brand, kind)] = self._select(brand, kind)
+        self._compiled = compiled
+        return len(compiled)
+
+    def render(self, kind: str, domain_brand: str, **context) -> Tuple[str, str]:
+        """Render (subject, body) for a brand; unknown brands use the default brand"""
+        if domain_brand not in self.domain_configs:
+            domain_brand = self.default_brand
+        started = time.perf_counter()
+
+        if self.auto_reload or (domain_brand, kind) not in self._compiled:
+            subject_template, body_template = self._select(domain_brand, kind)
+        else:
+            subject_template, body_template = self._compiled[(domain_brand, kind)]
+        context = {
+            "brand": self.domain_configs[domain_brand],
+            "domain_brand": domain_brand,
+            "now": datetime.now(),
+            **context
+        }
+        # Header values must stay on one line
+        subject = " ".join(subject_template.render(context).split())
+        body = body_template.render(context)
+
+        self._record(kind, time.perf_counter() - started)
+        return subject, body
+
+    def render_prospect_emails(self, prospect_data: Dict, domain_brand: str) -> Tuple[Tuple[str, str], Tuple[str, str]]:
+        """(owner subject, body) and (auto-reply subject, body) for a new prospect"""
+        return (
+            self.render("owner_notification", domain_brand, prospect=prospect_data),
+            self.render("prospect_autoreply", domain_brand, prospect=prospect_data)
+        )
+
+    def get_stats(self) -> Dict:
+        """Per-kind render counts and timings (milliseconds)"""
+        return {
+            "template_dir": self.template_dir,
+            "auto_reload": self.auto_reload,
+            "compiled": len(self._compiled),
+            "renders": {
+                kind: {
+                    "count": stats["count"],
+                    "avg_ms": round(stats["total"] / stats["count"] * 1000, 3),
+                    "max_ms": round(stats["max"] * 1000, 3)
+                }
+                for kind, stats in self.stats.items()
+            }
+        }
+
+    def _select(self, brand: str, kind: str) -> Tuple[Template, Template]:
+        """Brand override if present, else the shared template"""
+        return (
+            self.env.select_template([f"{brand}/{kind}.subject.txt", f"{kind}.subject.txt"]),
+            self.env.select_template([f"{brand}/{kind}.html", f"{kind}.html"])
+        )
+
+    def _record(self, kind: str, elapsed: float):
+        stats = self.stats.setdefault(kind, {"count": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
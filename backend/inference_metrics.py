@@ -0,0 +1,61 @@
+"""
+Inference metrics aggregation
+Per-model token throughput from Ollama's response timing fields
+"""
+
+from typing import Dict
+
+# Fields Ollama returns with every completed generation (durations in nanoseconds)
+OLLAMA_METRIC_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration"
+)
+
+NANOSECONDS = 1_000_000_000
+
+
+def extract_metrics(data: Dict) -> Dict:
+    """Pick Ollama's timing and token-count fields out of a response"""
+    return {field: data[field] for field in OLLAMA_METRIC_FIELDS if data.get(field) is not None}
+
+
+class InferenceMetrics:
+    """Running totals of Ollama metrics per model"""
+
+    def __init__(self):
+        self.models: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model_name: str, metrics: Dict):
+        """Add one generation's metrics to the model's totals"""
+        if not metrics:
+            return
+        totals = self.models.setdefault(model_name, {"generations": 0, **{field: 0 for field in OLLAMA_METRIC_FIELDS}})
+        totals["generations"] += 1
+        for field in OLLAMA_METRIC_FIELDS:
+            totals[field] += metrics.get(field, 0)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Throughput and average timings per model"""
+        stats = {}
+        for model_name, totals in self.models.items():
+            generations = totals["generations"]
+            stats[model_name] = {
+                "generations": generations,
+                "eval_tokens_per_sec": self._rate(totals["eval_count"], totals["eval_duration"]),
+                "prompt_tokens_per_sec": self._rate(totals["prompt_eval_count"], totals["prompt_eval_duration"]),
+                "avg_prompt_tokens": round(totals["prompt_eval_count"] / generations, 1),
+                "avg_eval_tokens": round(totals["eval_count"] / generations, 1),
+                "avg_load_seconds": round(totals["load_duration"] / generations / NANOSECONDS, 3),
+                "avg_total_seconds": round(totals["total_duration"] / generations / NANOSECONDS, 3)
+            }
+        return stats
+
+    @staticmethod
+    def _rate(tokens: int, duration_ns: int) -> float:
+        if not duration_ns:
+            return 0.0
+        return round(tokens / (duration_ns / NANOSECONDS), 2)
@@ -0,0 +1,136 @@
+"""
+Per-model admission control for Ollama inference
+Bounded concurrency, bounded wait queue and a maximum queue-wait budget
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class QueueFullError(Exception):
+    """Raised when a model's wait queue is already full"""
+
+
+class QueueTimeoutError(Exception):
+    """Raised when a request waited longer than the queue-wait budget"""
+
+
+class ModelQueue:
+    """Concurrency limiter with a bounded wait queue for one model"""
+
+    def __init__(self, model_name: str, max_concurrency: int, max_queue: int, max_wait: float):
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.in_flight = 0
+        self.waiting = 0
+        # Recent generation latencies (seconds) for load-aware routing
+        self.latencies = deque(maxlen=200)
+        self.stats = {
+            "admitted": 0,
+            "rejected_full": 0,
+            "rejected_timeout": 0,
+            "total_wait": 0.0,
+            "max_wait_seen": 0.0
+        }
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold an inference slot; yields the seconds spent waiting in queue"""
+        start_time = time.time()
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.stats["rejected_full"] += 1
+                raise QueueFullError(f"{self.model_name} queue full ({self.waiting} waiting)")
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                self.stats["rejected_timeout"] += 1
+                raise QueueTimeoutError(f"{self.model_name} queue wait exceeded {self.max_wait}s")
+            finally:
+                self.waiting -= 1
+        else:
+            # A slot is free, so this does not suspend
+            await self._semaphore.acquire()
+
+        wait_time = time.time() - start_time
+        self.stats["admitted"] += 1
+        self.stats["total_wait"] += wait_time
+        self.stats["max_wait_seen"] = max(self.stats["max_wait_seen"], wait_time)
+
+        self.in_flight += 1
+        try:
+            yield wait_time
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def record_latency(self, seconds: float):
+        """Record how long a generation held its slot"""
+        self.latencies.append(seconds)
+
+    def p95_latency(self) -> float:
+        """95th percentile of recent generation latencies (0 when unknown)"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def is_saturated(self, queue_threshold: int) -> bool:
+        """All slots busy and either the queue or the expected wait is too long"""
+        if self.in_flight < self.max_concurrency:
+            return False
+        expected_wait = self.p95_latency() * (self.waiting + 1) / self.max_concurrency
+        return self.waiting >= queue_threshold or expected_wait > self.max_wait
+
+    def get_stats(self) -> Dict:
+        """Queue depth and wait time for this model"""
+        admitted = self.stats["admitted"]
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": admitted,
+            "rejected_full": self.stats["rejected_full"],
+            "rejected_timeout": self.stats["rejected_timeout"],
+            "avg_wait": round(self.stats["total_wait"] / admitted, 3) if admitted else 0.0,
+            "max_wait": round(self.stats["max_wait_seen"], 3),
+            "p95_latency": round(self.p95_latency(), 3)
+        }
+
+
+class InferenceLimiter:
+    """One ModelQueue per Ollama model, created on first use"""
+
+    def __init__(self):
+        self.queues: Dict[str, ModelQueue] = {}
+
+    def get_queue(self, config) -> ModelQueue:
+        """Get the queue for a ModelConfig"""
+        queue = self.queues.get(config.model_name)
+        if queue is None:
+            queue = ModelQueue(
+                config.model_name,
+                config.max_concurrency,
+                config.max_queue,
+                config.max_queue_wait
+            )
+            self.queues[config.model_name] = queue
+        return queue
+
+    def slot(self, config):
+        """Hold an inference slot for the config's model"""
+        return self.get_queue(config).slot()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Per-model queue statistics"""
+        return {model: queue.get_stats() for model, queue in self.queues.items()}
@@ -55,6 +55,7 @@ CREATE TABLE IF NOT EXISTS lz_custom.prospects (
     material_type VARCHAR(50),
     square_footage INTEGER,
     priority VARCHAR(20) DEFAULT 'normal',
+    priority_score SMALLINT GENERATED ALWAYS AS (CASE priority WHEN 'high' THEN 3 WHEN 'normal' THEN 2 WHEN 'low' THEN 1 ELSE 0 END) STORED,
     status VARCHAR(20) DEFAULT 'new',
     notes TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -77,6 +78,7 @@ CREATE TABLE IF NOT EXISTS gs_consulting.prospects (
     current_challenges TEXT,
     goals TEXT,
     priority VARCHAR(20) DEFAULT 'normal',
+    priority_score SMALLINT GENERATED ALWAYS AS (CASE priority WHEN 'high' THEN 3 WHEN 'normal' THEN 2 WHEN 'low' THEN 1 ELSE 0 END) STORED,
     status VARCHAR(20) DEFAULT 'new',
     notes TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -99,6 +101,7 @@ CREATE TABLE IF NOT EXISTS bravo_ohio.prospects (
     growth_stage VARCHAR(30),
     key_challenges TEXT,
     priority VARCHAR(20) DEFAULT 'normal',
+    priority_score SMALLINT GENERATED ALWAYS AS (CASE priority WHEN 'high' THEN 3 WHEN 'normal' THEN 2 WHEN 'low' THEN 1 ELSE 0 END) STORED,
     status VARCHAR(20) DEFAULT 'new',
     notes TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -122,6 +125,7 @@ CREATE TABLE IF NOT EXISTS lodex_inc.prospects (
     revenue_range VARCHAR(30),
     strategic_goals TEXT,
     priority VARCHAR(20) DEFAULT 'normal',
+    priority_score SMALLINT GENERATED ALWAYS AS (CASE priority WHEN 'high' THEN 3 WHEN 'normal' THEN 2 WHEN 'low' THEN 1 ELSE 0 END) STORED,
     status VARCHAR(20) DEFAULT 'new',
     notes TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -141,6 +145,14 @@ CREATE TABLE IF NOT EXISTS lz_custom.chat_conversations (
     error_message TEXT,
     user_ip INET,
     user_agent TEXT,
+    time_to_first_token DECIMAL(6,2),
+    requested_tier VARCHAR(20),
+    total_duration BIGINT,
+    load_duration BIGINT,
+    prompt_eval_count INTEGER,
+    prompt_eval_duration BIGINT,
+    eval_count INTEGER,
+    eval_duration BIGINT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -156,6 +168,14 @@ CREATE TABLE IF NOT EXISTS gs_consulting.chat_conversations (
     error_message TEXT,
     user_ip INET,
     user_agent TEXT,
+    time_to_first_token DECIMAL(6,2),
+    requested_tier VARCHAR(20),
+    total_duration BIGINT,
+    load_duration BIGINT,
+    prompt_eval_count INTEGER,
+    prompt_eval_duration BIGINT,
+    eval_count INTEGER,
+    eval_duration BIGINT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -171,6 +191,14 @@ CREATE TABLE IF NOT EXISTS bravo_ohio.chat_conversations (
     error_message TEXT,
     user_ip INET,
     user_agent TEXT,
+    time_to_first_token DECIMAL(6,2),
+    requested_tier VARCHAR(20),
+    total_duration BIGINT,
+    load_duration BIGINT,
+    prompt_eval_count INTEGER,
+    prompt_eval_duration BIGINT,
+    eval_count INTEGER,
+    eval_duration BIGINT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -186,9 +214,55 @@ CREATE TABLE IF NOT EXISTS lodex_inc.chat_conversations (
     error_message TEXT,
     user_ip INET,
     user_agent TEXT,
+    time_to_first_token DECIMAL(6,2),
+    requested_tier VARCHAR(20),
+    total_duration BIGINT,
+    load_duration BIGINT,
+    prompt_eval_count INTEGER,
+    prompt_eval_duration BIGINT,
+    eval_count INTEGER,
+    eval_duration BIGINT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Columns added after the initial release (no-ops on fresh databases)
+ALTER TABLE lz_custom.chat_conversations ADD COLUMN IF NOT EXISTS time_to_first_token DECIMAL(6,2);
+ALTER TABLE lz_custom.chat_conversations ADD COLUMN IF NOT EXISTS requested_tier VARCHAR(20);
+ALTER TABLE lz_custom.chat_conversations ADD COLUMN IF NOT EXISTS total_duration BIGINT;
+ALTER TABLE lz_custom.chat_conversations ADD COLUMN IF NOT EXISTS load_duration BIGINT;
+ALTER TABLE lz_custom.chat_conversations ADD COLUMN IF NOT EXISTS prompt_eval_count INTEGER;
+ALTER TABLE lz_custom.chat_conversations ADD COLUMN IF NOT EXISTS prompt_eval_duration BIGINT;
+ALTER TABLE lz_custom.chat_conversations ADD COLUMN IF NOT EXISTS eval_count INTEGER;
+ALTER TABLE lz_custom.chat_conversations ADD COLUMN IF NOT EXISTS eval_duration BIGINT;
+ALTER TABLE gs_consulting.chat_conversations ADD COLUMN IF NOT EXISTS time_to_first_token DECIMAL(6,2);
+ALTER TABLE gs_consulting.chat_conversations ADD COLUMN IF NOT EXISTS requested_tier VARCHAR(20);
+ALTER TABLE gs_consulting.chat_conversations ADD COLUMN IF NOT EXISTS total_duration BIGINT;
+ALTER TABLE gs_consulting.chat_conversations ADD COLUMN IF NOT EXISTS load_duration BIGINT;
+ALTER TABLE gs_consulting.chat_conversations ADD COLUMN IF NOT EXISTS prompt_eval_count INTEGER;
+ALTER TABLE gs_consulting.chat_conversations ADD COLUMN IF NOT EXISTS prompt_eval_duration BIGINT;
+ALTER TABLE gs_consulting.chat_conversations ADD COLUMN IF NOT EXISTS eval_count INTEGER;
+ALTER TABLE gs_consulting.chat_conversations ADD COLUMN IF NOT EXISTS eval_duration BIGINT;
+ALTER TABLE bravo_ohio.chat_conversations ADD COLUMN IF NOT EXISTS time_to_first_token DECIMAL(6,2);
+ALTER TABLE bravo_ohio.chat_conversations ADD COLUMN IF NOT EXISTS requested_tier VARCHAR(20);
+ALTER TABLE bravo_ohio.chat_conversations ADD COLUMN IF NOT EXISTS total_duration BIGINT;
+ALTER TABLE bravo_ohio.chat_conversations ADD COLUMN IF NOT EXISTS load_duration BIGINT;
+ALTER TABLE bravo_ohio.chat_conversations ADD COLUMN IF NOT EXISTS prompt_eval_count INTEGER;
+ALTER TABLE bravo_ohio.chat_conversations ADD COLUMN IF NOT EXISTS prompt_eval_duration BIGINT;
+ALTER TABLE bravo_ohio.chat_conversations ADD COLUMN IF NOT EXISTS eval_count INTEGER;
+ALTER TABLE bravo_ohio.chat_conversations ADD COLUMN IF NOT EXISTS eval_duration BIGINT;
+ALTER TABLE lodex_inc.chat_conversations ADD COLUMN IF NOT EXISTS time_to_first_token DECIMAL(6,2);
+ALTER TABLE lodex_inc.chat_conversations ADD COLUMN IF NOT EXISTS requested_tier VARCHAR(20);
+ALTER TABLE lodex_inc.chat_conversations ADD COLUMN IF NOT EXISTS total_duration BIGINT;
+ALTER TABLE lodex_inc.chat_conversations ADD COLUMN IF NOT EXISTS load_duration BIGINT;
+ALTER TABLE lodex_inc.chat_conversations ADD COLUMN IF NOT EXISTS prompt_eval_count INTEGER;
+ALTER TABLE lodex_inc.chat_conversations ADD COLUMN IF NOT EXISTS prompt_eval_duration BIGINT;
+ALTER TABLE lodex_inc.chat_conversations ADD COLUMN IF NOT EXISTS eval_count INTEGER;
+ALTER TABLE lodex_inc.chat_conversations ADD COLUMN IF NOT EXISTS eval_duration BIGINT;
+ALTER TABLE lz_custom.prospects ADD COLUMN IF NOT EXISTS priority_score SMALLINT GENERATED ALWAYS AS (CASE priority WHEN 'high' THEN 3 WHEN 'normal' THEN 2 WHEN 'low' THEN 1 ELSE 0 END) STORED;
+ALTER TABLE gs_consulting.prospects ADD COLUMN IF NOT EXISTS priority_score SMALLINT GENERATED ALWAYS AS (CASE priority WHEN 'high' THEN 3 WHEN 'normal' THEN 2 WHEN 'low' THEN 1 ELSE 0 END) STORED;
+ALTER TABLE bravo_ohio.prospects ADD COLUMN IF NOT EXISTS priority_score SMALLINT GENERATED ALWAYS AS (CASE priority WHEN 'high' THEN 3 WHEN 'normal' THEN 2 WHEN 'low' THEN 1 ELSE 0 END) STORED;
+ALTER TABLE lodex_inc.prospects ADD COLUMN IF NOT EXISTS priority_score SMALLINT GENERATED ALWAYS AS (CASE priority WHEN 'high' THEN 3 WHEN 'normal' THEN 2 WHEN 'low' THEN 1 ELSE 0 END) STORED;
+
 -- Analytics and tracking tables
 CREATE TABLE IF NOT EXISTS shared.page_views (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -212,6 +286,24 @@ CREATE TABLE IF NOT EXISTS shared.events (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Durable email outbox, delivered by the backend's OutboxSender
+-- status: pending -> sending -> sent | failed (pending again on retry)
+CREATE TABLE IF NOT EXISTS shared.email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    domain VARCHAR(100),
+    kind VARCHAR(50),
+    to_email VARCHAR(255) NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    is_html BOOLEAN DEFAULT true,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP WITH TIME ZONE
+);
+
 -- Content Management System tables (for dynamic content)
 CREATE TABLE IF NOT EXISTS shared.content_pages (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -231,30 +323,50 @@ CREATE TABLE IF NOT EXISTS shared.content_pages (
 CREATE INDEX IF NOT EXISTS idx_prospects_email_lz ON lz_custom.prospects(email);
 CREATE INDEX IF NOT EXISTS idx_prospects_created_lz ON lz_custom.prospects(created_at);
 CREATE INDEX IF NOT EXISTS idx_prospects_status_lz ON lz_custom.prospects(status);
+-- Keyset pagination: ORDER BY priority_score DESC, created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_prospects_keyset_lz ON lz_custom.prospects(priority_score, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_prospects_status_keyset_lz ON lz_custom.prospects(status, priority_score, created_at, id);
 
 CREATE INDEX IF NOT EXISTS idx_prospects_email_gs ON gs_consulting.prospects(email);
 CREATE INDEX IF NOT EXISTS idx_prospects_created_gs ON gs_consulting.prospects(created_at);
 CREATE INDEX IF NOT EXISTS idx_prospects_status_gs ON gs_consulting.prospects(status);
+-- Keyset pagination: ORDER BY priority_score DESC, created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_prospects_keyset_gs ON gs_consulting.prospects(priority_score, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_prospects_status_keyset_gs ON gs_consulting.prospects(status, priority_score, created_at, id);
 
 CREATE INDEX IF NOT EXISTS idx_prospects_email_bo ON bravo_ohio.prospects(email);
 CREATE INDEX IF NOT EXISTS idx_prospects_created_bo ON bravo_ohio.prospects(created_at);
 CREATE INDEX IF NOT EXISTS idx_prospects_status_bo ON bravo_ohio.prospects(status);
+-- Keyset pagination: ORDER BY priority_score DESC, created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_prospects_keyset_bo ON bravo_ohio.prospects(priority_score, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_prospects_status_keyset_bo ON bravo_ohio.prospects(status, priority_score, created_at, id);
 
 CREATE INDEX IF NOT EXISTS idx_prospects_email_li ON lodex_inc.prospects(email);
 CREATE INDEX IF NOT EXISTS idx_prospects_created_li ON lodex_inc.prospects(created_at);
 CREATE INDEX IF NOT EXISTS idx_prospects_status_li ON lodex_inc.prospects(status);
+-- Keyset pagination: ORDER BY priority_score DESC, created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_prospects_keyset_li ON lodex_inc.prospects(priority_score, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_prospects_status_keyset_li ON lodex_inc.prospects(status, priority_score, created_at, id);
 
 CREATE INDEX IF NOT EXISTS idx_chat_session_lz ON lz_custom.chat_conversations(session_id);
 CREATE INDEX IF NOT EXISTS idx_chat_created_lz ON lz_custom.chat_conversations(created_at);
+CREATE INDEX IF NOT EXISTS idx_chat_keyset_lz ON lz_custom.chat_conversations(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_chat_session_keyset_lz ON lz_custom.chat_conversations(session_id, created_at, id);
 
 CREATE INDEX IF NOT EXISTS idx_chat_session_gs ON gs_consulting.chat_conversations(session_id);
 CREATE INDEX IF NOT EXISTS idx_chat_created_gs ON gs_consulting.chat_conversations(created_at);
+CREATE INDEX IF NOT EXISTS idx_chat_keyset_gs ON gs_consulting.chat_conversations(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_chat_session_keyset_gs ON gs_consulting.chat_conversations(session_id, created_at, id);
 
 CREATE INDEX IF NOT EXISTS idx_chat_session_bo ON bravo_ohio.chat_conversations(session_id);
 CREATE INDEX IF NOT EXISTS idx_chat_created_bo ON bravo_ohio.chat_conversations(created_at);
+CREATE INDEX IF NOT EXISTS idx_chat_keyset_bo ON bravo_ohio.chat_conversations(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_chat_session_keyset_bo ON bravo_ohio.chat_conversations(session_id, created_at, id);
 
 CREATE INDEX IF NOT EXISTS idx_chat_session_li ON lodex_inc.chat_conversations(session_id);
 CREATE INDEX IF NOT EXISTS idx_chat_created_li ON lodex_inc.chat_conversations(created_at);
+CREATE INDEX IF NOT EXISTS idx_chat_keyset_li ON lodex_inc.chat_conversations(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_chat_session_keyset_li ON lodex_inc.chat_conversations(session_id, created_at, id);
 
 CREATE INDEX IF NOT EXISTS idx_page_views_domain ON shared.page_views(domain);
 CREATE INDEX IF NOT EXISTS idx_page_views_created ON shared.page_views(created_at);
@@ -263,6 +375,8 @@ CREATE INDEX IF NOT EXISTS idx_events_domain ON shared.events(domain);
 CREATE INDEX IF NOT EXISTS idx_events_type ON shared.events(event_type);
 CREATE INDEX IF NOT EXISTS idx_events_created ON shared.events(created_at);
 
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON shared.email_outbox(status, next_attempt_at);
+
 CREATE INDEX IF NOT EXISTS idx_content_domain_slug ON shared.content_pages(domain, slug);
 CREATE INDEX IF NOT EXISTS idx_content_published ON shared.content_pages(is_published);
 
@@ -1,10 +1,28 @@
 import asyncio
 import aiohttp
+import json
 import time
 import os
 from enum import Enum
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from dataclasses import dataclass
+from response_cache import ResponseCache
+from request_coalescer import RequestCoalescer
+from inference_queue import InferenceLimiter, QueueFullError, QueueTimeoutError
+from model_warmup import ModelWarmupManager
+from ollama_pool import OllamaBackendPool, OllamaNodeError
+from conversation_memory import ConversationMemory
+from inference_metrics import InferenceMetrics, extract_metrics
+
+# Default system prompt; kept as one constant so it is byte-identical across
+# requests and Ollama can reuse the evaluated prompt prefix
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a helpful customer service representative for LZ Custom Fabrication, "
+    "a premier custom cabinet and stone fabrication company in Northeast Ohio with 30+ years of experience. "
+    "We specialize in custom cabinets, countertops (granite, quartz, marble), tile installation, "
+    "flooring, and commercial painting. We do in-house manufacturing and don't outsource. "
+    "Our phone number is 216-268-2990. Always be helpful and encourage customers to call for quotes."
+)
 
 class ModelTier(Enum):
     FAST = "fast"
@@ -17,6 +35,12 @@ class ModelConfig:
     model_name: str
     timeout: int
     max_tokens: int
+    # Admission control: Ollama only runs a generation or two at once per model
+    max_concurrency: int = int(os.environ.get('OLLAMA_MAX_CONCURRENCY', '1'))
+    max_queue: int = int(os.environ.get('OLLAMA_MAX_QUEUE', '8'))
+    max_queue_wait: float = float(os.environ.get('OLLAMA_MAX_QUEUE_WAIT', '10'))
+    # Token budget for conversation history fed back with each question
+    history_tokens: int = 512
 
 class QuestionClassifier:
     @staticmethod
@@ -42,22 +66,62 @@ class QuestionClassifier:
         else:
             return ModelTier.FAST
 
+class LoadAwareRouter:
+    """Downgrade to a cheaper tier when the preferred model is saturated"""
+
+    # Most to least expensive
+    TIER_ORDER = [ModelTier.EXPERT, ModelTier.ADVANCED, ModelTier.MEDIUM, ModelTier.FAST]
+
+    def __init__(self, models: Dict[ModelTier, ModelConfig], limiter: InferenceLimiter, queue_threshold: int = None):
+        self.models = models
+        self.limiter = limiter
+        # Waiting requests that mark a model as saturated
+        self.queue_threshold = queue_threshold or int(os.environ.get('ROUTER_QUEUE_THRESHOLD', '1'))
+        self.downgrades = 0
+
+    def select_tier(self, preferred: ModelTier) -> ModelTier:
+        """Pick the preferred tier or the next cheaper one whose model has capacity"""
+        candidates = self.TIER_ORDER[self.TIER_ORDER.index(preferred):]
+        for tier in candidates:
+            queue = self.limiter.get_queue(self.models[tier])
+            if not queue.is_saturated(self.queue_threshold):
+                if tier != preferred:
+                    self.downgrades += 1
+                    print(f"🔀 Routing {preferred.name} -> {tier.name}: {self.models[preferred].model_name} saturated")
+                return tier
+        # Everything is busy; stay on the preferred tier and let admission control decide
+        return preferred
+
 class LLaMAService:
     """Service for interacting with local LLaMA models via Ollama"""
     
-    def __init__(self, base_url: str = None):
-        # Use environment variable or default
-        self.base_url = base_url or os.environ.get('OLLAMA_HOST', 'http://localhost:11434')
+    def __init__(self, base_url: str = None, response_cache: ResponseCache = None, base_urls: List[str] = None,
+                 memory: ConversationMemory = None):
+        # Use explicit URLs or OLLAMA_HOSTS / OLLAMA_HOST from the environment
+        urls = base_urls or ([base_url] if base_url else OllamaBackendPool.urls_from_env())
+        self.pool = OllamaBackendPool(urls)
+        self.base_url = self.pool.nodes[0].url
         self.session = None
         self.classifier = QuestionClassifier()
+        self.response_cache = response_cache
+        self.memory = memory
+        self.coalescer = RequestCoalescer()
+        self.limiter = InferenceLimiter()
+        self.metrics = InferenceMetrics()
+        # Embedding model for semantic cache lookups (e.g. nomic-embed-text); disabled when unset
+        self.embed_model = os.environ.get('OLLAMA_EMBED_MODEL')
+        # How long Ollama keeps a model loaded after each request
+        self.keep_alive = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
         
         # Model configurations with increased timeouts for model loading
         self.models = {
-            ModelTier.FAST: ModelConfig("llama3.2:3b", 30, 200),
-            ModelTier.MEDIUM: ModelConfig("gemma2:2b", 45, 400),
-            ModelTier.ADVANCED: ModelConfig("qwen2.5:7b-instruct-q4_k_m", 60, 600),
-            ModelTier.EXPERT: ModelConfig("qwen2.5:7b-instruct-q4_k_m", 75, 800)
+            ModelTier.FAST: ModelConfig("llama3.2:3b", 30, 200, history_tokens=300),
+            ModelTier.MEDIUM: ModelConfig("gemma2:2b", 45, 400, history_tokens=600),
+            ModelTier.ADVANCED: ModelConfig("qwen2.5:7b-instruct-q4_k_m", 60, 600, history_tokens=1200),
+            ModelTier.EXPERT: ModelConfig("qwen2.5:7b-instruct-q4_k_m", 75, 800, history_tokens=1600)
         }
+        self.router = LoadAwareRouter(self.models, self.limiter)
+        self.warmup = ModelWarmupManager(self)
 
     async def __aenter__(self):
         """Async context manager entry"""
@@ -65,104 +129,361 @@ class LLaMAService:
         # Increased timeouts for LLM model loading and processing
         timeout = aiohttp.ClientTimeout(total=120, connect=30, sock_read=90)
         self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        await self.pool.start(self.session)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
+        await self.warmup.stop()
+        await self.pool.stop()
         if self.session:
             await self.session.close()
 
     async def chat(self, question: str, session_id: str) -> Dict:
         """Main chat interface"""
-        return await self.generate_response(question)
+        return await self.generate_response(question, session_id=session_id)
 
-    async def generate_response(self, question: str, tier: ModelTier = None, domain_context: str = None) -> Dict:
+    async def generate_response(self, question: str, tier: ModelTier = None, domain_context: str = None,
+                                brand: str = "default", session_id: str = None) -> Dict:
         """Generate response using Ollama with intelligent model routing"""
         start_time = time.time()
         
         try:
-            # Classify question if tier not specified
-            if tier is None:
-                tier = self.classifier.classify_question(question)
-            
+            requested_tier, tier = self._route(question, tier)
             config = self.models.get(tier, self.models[ModelTier.FAST])
+            history = await self._get_history(session_id, config)
+
+            # Serve repeated questions from the response cache (first turns only)
+            if self.response_cache and not history:
+                cached = await self.response_cache.get(brand, question, requested_tier.name)
+                if cached:
+                    return {**cached, "requested_tier": requested_tier.name,
+                            "response_time": round(time.time() - start_time, 2), "cached": True}
             
-            # Generate response
-            response = await self._call_ollama(question, config, domain_context)
+            # Generate response; identical concurrent prompts share one generation
+            key = self.coalescer.make_key(self._build_payload(question, config, domain_context, history=history))
+            response, metrics = await self.coalescer.run(
+                key, lambda: self._call_ollama_admitted(question, config, domain_context, history)
+            )
             response_time = time.time() - start_time
             
-            return {
+            result = {
                 "response": response,
                 "model_used": config.model_name,
                 "tier": tier.name,
+                "requested_tier": requested_tier.name,
                 "response_time": round(response_time, 2),
                 "success": True
             }
+
+            # Cache under the requested tier, and only full-tier answers: a downgraded
+            # reply must not be served for the whole TTL once the load has passed
+            if self.response_cache and not history and tier == requested_tier:
+                await self.response_cache.set(brand, question, requested_tier.name, result)
+            if self.memory:
+                await self.memory.remember(session_id, question, response)
+
+            return {**result, "metrics": metrics}
+
+        except (QueueFullError, QueueTimeoutError) as e:
+            # Shed load fast instead of piling up behind the model timeout
+            print(f"🚦 LLaMA overloaded: {e}")
+            return {**self._fallback_response(question), "error": str(e)}
             
         except Exception as e:
             # Simplified exception handling - catch everything
             print(f"❌ LLaMA Error: {e}")
             return self._error_response(str(e))
 
-    async def _call_ollama(self, question: str, config: ModelConfig, domain_context: str = None) -> str:
-        """Make API call to Ollama"""
-        if not self.session:
-            raise Exception("Session not initialized")
-            
+    async def stream_response(self, question: str, tier: ModelTier = None, domain_context: str = None,
+                              brand: str = "default", session_id: str = None) -> AsyncIterator[Dict]:
+        """Stream response tokens from Ollama as they are generated.
+
+        Yields ``{"type": "token", "content": ...}`` events followed by a single
+        ``{"type": "done", ...}`` event carrying the same fields as
+        ``generate_response`` plus ``time_to_first_token``.
+        """
+        start_time = time.time()
+        first_token_time = None
+        chunks = []
+
         try:
-            # Use domain-specific context or fallback to default
-            if domain_context:
-                context = domain_context
+            requested_tier, tier = self._route(question, tier)
+            config = self.models.get(tier, self.models[ModelTier.FAST])
+            history = await self._get_history(session_id, config)
+
+            # A cached answer is sent as a single chunk
+            if self.response_cache and not history:
+                cached = await self.response_cache.get(brand, question, requested_tier.name)
+                if cached:
+                    yield {"type": "token", "content": cached["response"]}
+                    elapsed = round(time.time() - start_time, 2)
+                    yield {"type": "done", **cached, "requested_tier": requested_tier.name,
+                           "response_time": elapsed, "time_to_first_token": elapsed, "cached": True}
+                    return
+
+            queue = self.limiter.get_queue(config)
+            async with queue.slot():
+                cold = not self.warmup.is_warm(config.model_name)
+                generation_start = time.time()
+                metrics = {}
+                async for token in self._stream_ollama(question, config, domain_context, history, metrics):
+                    if first_token_time is None:
+                        first_token_time = time.time() - start_time
+                    chunks.append(token)
+                    yield {"type": "token", "content": token}
+                latency = time.time() - generation_start
+                queue.record_latency(latency)
+                self.warmup.record_request(tier.name, config.model_name, latency, cold)
+                self.metrics.record(config.model_name, metrics)
+
+            response = "".join(chunks).strip()
+            if not response:
+                raise Exception("Empty response from Ollama")
+
+            response_time = time.time() - start_time
+            print(f"✅ Ollama stream finished: ttft={first_token_time:.2f}s total={response_time:.2f}s")
+
+            result = {
+                "response": response,
+                "model_used": config.model_name,
+                "tier": tier.name,
+                "requested_tier": requested_tier.name,
+                "response_time": round(response_time, 2),
+                "success": True
+            }
+
+            # Cache under the requested tier, and only full-tier answers: a downgraded
+            # reply must not be served for the whole TTL once the load has passed
+            if self.response_cache and not history and tier == requested_tier:
+                await self.response_cache.set(brand, question, requested_tier.name, result)
+            if self.memory:
+                await self.memory.remember(session_id, question, response)
+
+            yield {"type": "done", **result, "time_to_first_token": round(first_token_time, 2), "metrics": metrics}
+
+        except (QueueFullError, QueueTimeoutError) as e:
+            print(f"🚦 LLaMA overloaded: {e}")
+            yield {"type": "done", **self._fallback_response(question), "error": str(e),
+                   "time_to_first_token": None}
+
+        except Exception as e:
+            print(f"❌ LLaMA Stream Error: {e}")
+            result = self._error_response(str(e))
+            if chunks:
+                # Keep whatever the visitor already saw so the log matches the screen
+                result["response"] = "".join(chunks).strip()
+            result["response_time"] = round(time.time() - start_time, 2)
+            result["time_to_first_token"] = round(first_token_time, 2) if first_token_time is not None else None
+            yield {"type": "done", **result}
+
+    def _build_payload(self, question: str, config: ModelConfig, domain_context: str = None, stream: bool = False,
+                       history: List[Dict] = None) -> Dict:
+        """Build the Ollama chat payload.
+
+        The system message comes first and is identical for every request of a
+        brand, followed by earlier turns, so Ollama can reuse the KV cache for
+        the shared prefix instead of re-evaluating the brand prompt each time.
+        """
+        messages = [{"role": "system", "content": domain_context or DEFAULT_SYSTEM_PROMPT}]
+        for turn in history or []:
+            if "summary" in turn:
+                messages.append({"role": "system", "content": turn["summary"]})
             else:
-                context = """You are a helpful customer service representative for LZ Custom Fabrication, 
-                a premier custom cabinet and stone fabrication company in Northeast Ohio with 30+ years of experience. 
-                We specialize in custom cabinets, countertops (granite, quartz, marble), tile installation, 
-                flooring, and commercial painting. We do in-house manufacturing and don't outsource. 
-                Our phone number is 216-268-2990. Always be helpful and encourage customers to call for quotes."""
-            
-            payload = {
-                "model": config.model_name,
-                "prompt": f"{context}\n\nCustomer question: {question}\n\nResponse:",
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "max_tokens": config.max_tokens
-                }
+                messages.append({"role": "user", "content": turn["question"]})
+                messages.append({"role": "assistant", "content": turn["answer"]})
+        messages.append({"role": "user", "content": question})
+
+        return {
+            "model": config.model_name,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "max_tokens": config.max_tokens
             }
-            
-            # Create timeout for this specific request
-            timeout = aiohttp.ClientTimeout(total=config.timeout)
-            
-            async with self.session.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=timeout
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    content = data.get('response', '').strip()
-                    
-                    if content:
-                        print(f"✅ Ollama response: {content[:100]}...")
-                        return content
-                    else:
-                        raise Exception("Empty response from Ollama")
-                else:
-                    error_text = await response.text()
-                    print(f"❌ Ollama API error {response.status}: {error_text}")
-                    raise Exception(f"Ollama API error: {response.status}")
-                    
-        except asyncio.TimeoutError:
-            print(f"⏰ Ollama timeout after {config.timeout}s")
-            raise Exception(f"Ollama timeout: {config.timeout}s")
-        except aiohttp.ClientError as e:
-            print(f"🔌 Ollama connection error: {e}")
-            raise Exception(f"Ollama connection error: {e}")
+        }
+
+    def _tier_for(self, config: ModelConfig) -> str:
+        for tier, tier_config in self.models.items():
+            if tier_config is config:
+                return tier.name
+        return config.model_name
+
+    def _route(self, question: str, tier: ModelTier = None):
+        """Return (requested_tier, actual_tier) for a question.
+
+        Forced tiers are used as-is; classified tiers may be downgraded when
+        the preferred model is saturated.
+        """
+        if tier is not None:
+            return tier, tier
+        requested_tier = self.classifier.classify_question(question)
+        return requested_tier, self.router.select_tier(requested_tier)
+
+    async def _get_history(self, session_id: str, config: ModelConfig) -> List[Dict]:
+        """Previous turns for the session that fit the tier's history budget"""
+        if not self.memory or not session_id:
+            return []
+        try:
+            return await self.memory.get_context(session_id, config.history_tokens)
         except Exception as e:
-            print(f"❌ Failed to call Ollama: {type(e).__name__}: {e}")
-            raise Exception(f"Failed to call Ollama: {type(e).__name__}: {e}")
+            print(f"⚠️  Could not load conversation history: {e}")
+            return []
+
+    async def _call_ollama_admitted(self, question: str, config: ModelConfig, domain_context: str = None,
+                                    history: List[Dict] = None) -> Tuple[str, Dict]:
+        """Call Ollama once a slot in the model's queue is free"""
+        queue = self.limiter.get_queue(config)
+        async with queue.slot():
+            cold = not self.warmup.is_warm(config.model_name)
+            start_time = time.time()
+            response, metrics = await self._call_ollama(question, config, domain_context, history)
+            latency = time.time() - start_time
+            queue.record_latency(latency)
+            self.warmup.record_request(self._tier_for(config), config.model_name, latency, cold)
+            self.metrics.record(config.model_name, metrics)
+            return response, metrics
+
+    async def _call_ollama(self, question: str, config: ModelConfig, domain_context: str = None,
+                           history: List[Dict] = None) -> Tuple[str, Dict]:
+        """Make API call to Ollama, failing over to the next node on errors"""
+        if not self.session:
+            raise Exception("Session not initialized")
+
+        payload = self._build_payload(question, config, domain_context, history=history)
+        deadline = time.time() + config.timeout
+        last_error = None
+
+        for node in self.pool.candidates(config.model_name):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                with self.pool.track(node):
+                    async with self.session.post(
+                        f"{node.url}/api/chat",
+                        json=payload,
+                        timeout=aiohttp.ClientTimeout(total=remaining)
+                    ) as response:
+                        if response.status != 200:
+                            error_text = await response.text()
+                            print(f"❌ Ollama API error {response.status} from {node.url}: {error_text}")
+                            raise OllamaNodeError(f"Ollama API error: {response.status}")
+                        data = await response.json()
+            except asyncio.TimeoutError:
+                print(f"⏰ Ollama timeout on {node.url} after {remaining:.0f}s")
+                last_error = f"Ollama timeout: {config.timeout}s"
+                continue
+            except (aiohttp.ClientError, OllamaNodeError) as e:
+                print(f"🔌 Ollama node {node.url} failed: {e}")
+                last_error = f"Ollama connection error: {e}"
+                continue
+
+            content = data.get('message', {}).get('content', '').strip()
+            if not content:
+                raise Exception("Empty response from Ollama")
+            metrics = extract_metrics(data)
+            print(f"✅ Ollama response: {content[:100]}... "
+                  f"(prompt_eval={metrics.get('prompt_eval_count')} eval={metrics.get('eval_count')})")
+            return content, metrics
+
+        raise Exception(last_error or f"No Ollama node available for {config.model_name}")
+
+    async def _stream_ollama(self, question: str, config: ModelConfig, domain_context: str = None,
+                             history: List[Dict] = None, metrics: Dict = None) -> AsyncIterator[str]:
+        """Make streaming API call to Ollama, yielding tokens as they arrive.
+
+        Fails over to the next node only until the first token has been sent.
+        Ollama's final chunk carries the token counts; they are copied into
+        ``metrics`` when a dict is given.
+        """
+        if not self.session:
+            raise Exception("Session not initialized")
+
+        payload = self._build_payload(question, config, domain_context, stream=True, history=history)
+        deadline = time.time() + config.timeout
+        last_error = None
+
+        for node in self.pool.candidates(config.model_name):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            started = False
+            try:
+                with self.pool.track(node):
+                    # The total budget still applies; sock_read guards against a stalled stream
+                    async with self.session.post(
+                        f"{node.url}/api/chat",
+                        json=payload,
+                        timeout=aiohttp.ClientTimeout(total=remaining, sock_read=remaining)
+                    ) as response:
+                        if response.status != 200:
+                            error_text = await response.text()
+                            print(f"❌ Ollama API error {response.status} from {node.url}: {error_text}")
+                            raise OllamaNodeError(f"Ollama API error: {response.status}")
+
+                        # Ollama streams newline-delimited JSON objects
+                        async for line in response.content:
+                            line = line.strip()
+                            if not line:
+                                continue
+                            data = json.loads(line)
+                            if data.get('error'):
+                                raise Exception(f"Ollama stream error: {data['error']}")
+                            token = data.get('message', {}).get('content', '')
+                            if token:
+                                started = True
+                                yield token
+                            if data.get('done'):
+                                if metrics is not None:
+                                    metrics.update(extract_metrics(data))
+                                break
+                return
+            except asyncio.TimeoutError:
+                print(f"⏰ Ollama stream timeout on {node.url}")
+                last_error = f"Ollama timeout: {config.timeout}s"
+                if started:
+                    raise Exception(last_error)
+            except (aiohttp.ClientError, OllamaNodeError) as e:
+                print(f"🔌 Ollama node {node.url} failed: {e}")
+                last_error = f"Ollama connection error: {e}"
+                if started:
+                    raise Exception(last_error)
+
+        raise Exception(last_error or f"No Ollama node available for {config.model_name}")
     
+    async def embed(self, text: str) -> List[float]:
+        """Get an embedding vector for text from Ollama"""
+        if not self.session:
+            raise Exception("Session not initialized")
+
+        node = self.pool.candidates(self.embed_model)[0]
+        with self.pool.track(node):
+            async with self.session.post(
+                f"{node.url}/api/embeddings",
+                json={"model": self.embed_model, "prompt": text},
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                if response.status != 200:
+                    raise OllamaNodeError(f"Ollama embeddings error: {response.status}")
+                data = await response.json()
+                return data["embedding"]
+
+    def get_stats(self) -> Dict:
+        """Runtime statistics for monitoring endpoints"""
+        return {
+            "response_cache": self.response_cache.get_stats() if self.response_cache else None,
+            "coalescing": self.coalescer.get_stats(),
+            "queues": self.limiter.get_stats(),
+            "routing": {"downgrades": self.router.downgrades},
+            "warmup": self.warmup.get_stats(),
+            "nodes": self.pool.get_stats(),
+            "throughput": self.metrics.get_stats()
+        }
+
     def _fallback_response(self, question: str) -> Dict:
         """Fallback response when AI is unavailable"""
         return {
@@ -1,19 +1,29 @@
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-import sqlite3
+from typing import Dict, List, Optional
 import json
-from datetime import datetime
 import uvicorn
 import asyncio
 import uuid
-import smtplib
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from llama_service import LLaMAService, QuestionClassifier
+import time
+from llama_service import LLaMAService, QuestionClassifier, ModelTier
+from response_cache import ResponseCache
+from conversation_memory import ConversationMemory, InMemoryHistoryStore
+from inference_metrics import OLLAMA_METRIC_FIELDS
+from sqlite_store import SQLiteStore
+from sqlite_migrations import migrate
+from analytics_rollups import read_dashboard
+from pagination import (
+    PRIORITY_SCORES, InvalidCursorError, clamp_page_size, decode_cursor, priority_score, split_page
+)
+from batch_writer import BatchWriter
+from email_templates import EmailTemplates
+import contact_notifications
+from email_outbox import OutboxMessage, OutboxSender, SMTPConnectionPool, SQLiteOutboxStore
 
 # Domain-specific branding configurations
 DOMAIN_CONFIGS = {
@@ -51,15 +61,21 @@ DOMAIN_CONFIGS = {
     }
 }
 
-def get_domain_context(domain_brand: str) -> str:
-    """Get domain-specific context for LLM"""
-    config = DOMAIN_CONFIGS.get(domain_brand, DOMAIN_CONFIGS["giorgiy"])
-    
+def build_domain_context(config: Dict) -> str:
+    """System prompt for one brand"""
     return f"""You are a helpful customer service representative for {config['company_name']}, 
     {config['tagline']}. We specialize in {config['specialty']} and are located in {config['location']} 
     with 30+ years of experience. Our phone number is {config['phone']}. 
     Always be helpful and encourage customers to call for quotes and consultations."""
 
+# Built once so each brand's system prompt is byte-identical on every request,
+# which lets Ollama reuse the evaluated prompt prefix
+DOMAIN_CONTEXTS = {brand: build_domain_context(config) for brand, config in DOMAIN_CONFIGS.items()}
+
+def get_domain_context(domain_brand: str) -> str:
+    """Get domain-specific context for LLM; unknown brands get the default brand's"""
+    return DOMAIN_CONTEXTS.get(domain_brand, DOMAIN_CONTEXTS["giorgiy"])
+
 # Email configuration
 EMAIL_CONFIG = {
     "smtp_server": os.environ.get("SMTP_SERVER", "localhost"),
@@ -70,91 +86,8 @@ EMAIL_CONFIG = {
     "to_email": os.environ.get("TO_EMAIL", "george@giorgiy.org")
 }
 
-async def send_email(to_email: str, subject: str, body: str, is_html: bool = False) -> bool:
-    """Send email using SMTP"""
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_CONFIG["from_email"]
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(body, 'html' if is_html else 'plain'))
-        
-        # Use local mail server for now (docker mailserver)
-        with smtplib.SMTP(EMAIL_CONFIG["smtp_server"], EMAIL_CONFIG["smtp_port"]) as server:
-            if EMAIL_CONFIG["smtp_password"]:
-                server.starttls()
-                server.login(EMAIL_CONFIG["smtp_username"], EMAIL_CONFIG["smtp_password"])
-            server.send_message(msg)
-        
-        print(f"✅ Email sent successfully to {to_email}")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to send email to {to_email}: {e}")
-        return False
-
-def get_prospect_email_template(prospect_data: dict, domain_brand: str) -> tuple:
-    """Generate email templates for prospect notification"""
-    config = DOMAIN_CONFIGS.get(domain_brand, DOMAIN_CONFIGS["giorgiy"])
-    
-    # Email to business owner
-    owner_subject = f"New Lead from {config['company_name']} Website - {prospect_data['name']}"
-    owner_body = f"""
-    <h2>New Prospect Inquiry</h2>
-    
-    <p><strong>Company:</strong> {config['company_name']}</p>
-    <p><strong>Domain:</strong> {domain_brand}</p>
-    <p><strong>Time:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-    
-    <h3>Contact Information:</h3>
-    <ul>
-        <li><strong>Name:</strong> {prospect_data['name']}</li>
-        <li><strong>Email:</strong> {prospect_data['email']}</li>
-        <li><strong>Phone:</strong> {prospect_data.get('phone', 'Not provided')}</li>
-    </ul>
-    
-    <h3>Project Details:</h3>
-    <ul>
-        <li><strong>Project Type:</strong> {prospect_data.get('project', 'Not specified')}</li>
-        <li><strong>Budget:</strong> {prospect_data.get('budget', 'Not specified')}</li>
-        <li><strong>Timeline:</strong> {prospect_data.get('timeline', 'Not specified')}</li>
-    </ul>
-    
-    <h3>Message:</h3>
-    <p>{prospect_data.get('message', 'No message provided')}</p>
-    
-    <p><em>Follow up with this lead as soon as possible!</em></p>
-    """
-    
-    # Email to prospect (auto-reply)
-    prospect_subject = f"Thank you for contacting {config['company_name']}"
-    prospect_body = f"""
-    <h2>Thank you for your inquiry!</h2>
-    
-    <p>Dear {prospect_data['name']},</p>
-    
-    <p>Thank you for contacting <strong>{config['company_name']}</strong>. We have received your inquiry about {prospect_data.get('project', 'your project')} and will get back to you within 24 hours.</p>
-    
-    <h3>Your submission details:</h3>
-    <ul>
-        <li><strong>Project:</strong> {prospect_data.get('project', 'Not specified')}</li>
-        <li><strong>Budget:</strong> {prospect_data.get('budget', 'Not specified')}</li>
-        <li><strong>Timeline:</strong> {prospect_data.get('timeline', 'Not specified')}</li>
-    </ul>
-    
-    <p>In the meantime, feel free to call us directly at <strong>{config['phone']}</strong> if you have any urgent questions.</p>
-    
-    <p>We specialize in {config['specialty']} and look forward to helping you with your project.</p>
-    
-    <p>Best regards,<br>
-    {config['company_name']} Team<br>
-    {config['phone']}</p>
-    
-    <hr>
-    <p><small>This is an automated response. Please do not reply directly to this email.</small></p>
-    """
-    
-    return (owner_subject, owner_body), (prospect_subject, prospect_body)
+# Owner notification and auto-reply templates, compiled per brand at startup
+email_templates = EmailTemplates(DOMAIN_CONFIGS)
 
 app = FastAPI(title="LZ Custom API", version="1.0.0")
 
@@ -164,95 +97,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-def init_db():
-    conn = sqlite3.connect('lz_custom.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS prospects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            email TEXT,
-            phone TEXT,
-            project_type TEXT,
-            budget_range TEXT,
-            timeline TEXT,
-            message TEXT,
-            room_dimensions TEXT,
-            measurements TEXT,
-            wood_species TEXT,
-            cabinet_style TEXT,
-            material_type TEXT,
-            square_footage INTEGER,
-            project_details TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status TEXT DEFAULT 'new',
-            priority TEXT DEFAULT 'normal',
-            follow_up_date DATE,
-            notes TEXT
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS project_images (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            prospect_id INTEGER,
-            image_path TEXT,
-            image_type TEXT,
-            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (prospect_id) REFERENCES prospects (id)
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS quotes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            prospect_id INTEGER,
-            quote_amount DECIMAL(10,2),
-            quote_details TEXT,
-            valid_until DATE,
-            status TEXT DEFAULT 'draft',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (prospect_id) REFERENCES prospects (id)
-        )
-    ''')
-
-    # Chat conversations table for logging all AI interactions
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS chat_conversations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT,
-            user_message TEXT NOT NULL,
-            ai_response TEXT NOT NULL,
-            model_used TEXT NOT NULL,
-            tier TEXT NOT NULL,
-            response_time REAL,
-            success BOOLEAN DEFAULT 1,
-            error_message TEXT,
-            user_ip TEXT,
-            user_agent TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Chat sessions table for tracking conversation sessions
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS chat_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT UNIQUE NOT NULL,
-            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            message_count INTEGER DEFAULT 0,
-            user_ip TEXT,
-            user_agent TEXT,
-            status TEXT DEFAULT 'active'
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
+# Shared SQLite connections (WAL, one writer + pooled readers, off the event loop)
+db = SQLiteStore()
 
 class ProspectCreate(BaseModel):
     name: Optional[str] = ""
@@ -269,6 +118,16 @@ class ProspectCreate(BaseModel):
     materialType: Optional[str] = None
     squareFootage: Optional[int] = None
 
+class ContactCreate(BaseModel):
+    name: Optional[str] = ""
+    email: Optional[str] = ""
+    phone: Optional[str] = ""
+    project_type: Optional[str] = ""
+    contact_methods: Optional[str] = ""
+    message: Optional[str] = ""
+    callback_requested: bool = False
+    text_requested: bool = False
+
 class ChatMessage(BaseModel):
     message: str
     context: Optional[str] = None
@@ -279,64 +138,102 @@ class ChatResponse(BaseModel):
     response: str
     model_used: str
     tier: str
+    requested_tier: Optional[str] = None  # Tier picked by the classifier before load-aware routing
     response_time: float
     success: bool
     error: Optional[str] = None
     session_id: str  # Return session ID for frontend tracking
+    metrics: Optional[dict] = None  # Ollama token counts and durations (nanoseconds)
+
+def resolve_force_tier(force_tier: Optional[str]) -> Optional[ModelTier]:
+    """Map a force_tier request value to a ModelTier (for testing specific models)"""
+    if not force_tier:
+        return None
+    return ModelTier.__members__.get(force_tier.upper())
+
+def disconnected_result(chunks: List[str], started: float) -> Dict:
+    """Log record for a streamed reply the client stopped reading before it finished"""
+    return {
+        "response": "".join(chunks).strip(),
+        "model_used": "unknown",
+        "tier": "INCOMPLETE",
+        "response_time": round(time.time() - started, 2),
+        "time_to_first_token": None,
+        "success": False,
+        "error": "client disconnected before the reply finished"
+    }
 
 # Helper functions for chat logging
-def create_or_update_session(session_id: str, user_ip: str = None, user_agent: str = None):
+# Chat log rows are written behind the request by log_writer, batched per table
+LOG_STATEMENTS = {
+    "chat_sessions": '''
+        INSERT INTO chat_sessions (session_id, user_ip, user_agent, message_count)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT(session_id) DO UPDATE SET
+            last_activity = CURRENT_TIMESTAMP,
+            message_count = message_count + 1
+    ''',
+    "chat_conversations": '''
+        INSERT INTO chat_conversations (
+            session_id, user_message, ai_response, model_used, tier,
+            response_time, success, error_message, user_ip, user_agent,
+            time_to_first_token, requested_tier,
+            total_duration, load_duration, prompt_eval_count,
+            prompt_eval_duration, eval_count, eval_duration, domain_brand
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+}
+
+async def write_log_batch(table: str, rows: list):
+    """Flush queued chat log rows for one table in a single transaction"""
+    await db.write(lambda conn: conn.executemany(LOG_STATEMENTS[table], rows))
+
+log_writer = BatchWriter(write_log_batch, name="chat log")
+
+# Notification emails are written to the email_outbox table with the prospect
+# and delivered by email_sender in the background
+email_sender = OutboxSender(SQLiteOutboxStore(db), SMTPConnectionPool(EMAIL_CONFIG), EMAIL_CONFIG["from_email"])
+
+# Contact callback/text requests are delivered by contact_notifications worker processes
+phone_workers = []
+
+async def create_or_update_session(session_id: str, user_ip: str = None, user_agent: str = None):
     """Create or update a chat session"""
-    conn = sqlite3.connect('lz_custom.db')
-    cursor = conn.cursor()
-
-    # Check if session exists
-    cursor.execute('SELECT id FROM chat_sessions WHERE session_id = ?', (session_id,))
-    if cursor.fetchone():
-        # Update existing session
-        cursor.execute('''
-            UPDATE chat_sessions
-            SET last_activity = CURRENT_TIMESTAMP, message_count = message_count + 1
-            WHERE session_id = ?
-        ''', (session_id,))
-    else:
-        # Create new session
-        cursor.execute('''
-            INSERT INTO chat_sessions (session_id, user_ip, user_agent, message_count)
-            VALUES (?, ?, ?, 1)
-        ''', (session_id, user_ip, user_agent))
-
-    conn.commit()
-    conn.close()
-
-def log_chat_conversation(session_id: str, user_message: str, ai_response: str,
+    await log_writer.submit("chat_sessions", (session_id, user_ip, user_agent))
+
+async def log_chat_conversation(session_id: str, user_message: str, ai_response: str,
                          model_used: str, tier: str, response_time: float,
                          success: bool, error_message: str = None,
-                         user_ip: str = None, user_agent: str = None):
+                         user_ip: str = None, user_agent: str = None,
+                         time_to_first_token: float = None, requested_tier: str = None,
+                         metrics: dict = None, domain_brand: str = None):
     """Log a complete chat interaction"""
-    conn = sqlite3.connect('lz_custom.db')
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        INSERT INTO chat_conversations (
-            session_id, user_message, ai_response, model_used, tier,
-            response_time, success, error_message, user_ip, user_agent
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+    metrics = metrics or {}
+    await log_writer.submit("chat_conversations", (
         session_id, user_message, ai_response, model_used, tier,
-        response_time, success, error_message, user_ip, user_agent
+        response_time, success, error_message, user_ip, user_agent,
+        time_to_first_token, requested_tier,
+        *(metrics.get(field) for field in OLLAMA_METRIC_FIELDS),
+        domain_brand
     ))
 
-    conn.commit()
-    conn.close()
-
 # Global LLaMA service instance
 llama_service = None
 
 @app.on_event("startup")
 async def startup_event():
-    global llama_service
-    init_db()
+    global llama_service, phone_workers
+    db.open()
+    schema_version = await db.write(migrate)
+    print(f"🗄️  SQLite schema at version {schema_version}")
+    log_writer.start()
+    email_sender.start()
+    print(f"📧 Compiled {email_templates.load()} email templates from {email_templates.template_dir}")
+    if os.environ.get("NOTIFY_WORKERS_IN_APP", "1") != "0":
+        # Only the first uvicorn worker to take the database's lock starts them
+        phone_workers = contact_notifications.start_workers(
+            db.path, fake=contact_notifications.fake_providers_enabled()
+        )
     # Initialize LLaMA service with retry logic
     max_retries = 3
     retry_delay = 5
@@ -345,15 +242,25 @@ async def startup_event():
         try:
             print(f"🔄 Attempting to initialize LLaMA service (attempt {attempt + 1}/{max_retries})...")
             llama_service = LLaMAService()
+            llama_service.response_cache = ResponseCache(
+                ttl=int(os.environ.get("RESPONSE_CACHE_TTL", "3600")),
+                max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", "1000")),
+                embed_fn=llama_service.embed if llama_service.embed_model else None
+            )
+            llama_service.memory = ConversationMemory(InMemoryHistoryStore(
+                max_sessions=int(os.environ.get("CHAT_MEMORY_SESSIONS", "1000"))
+            ))
             await llama_service.__aenter__()
 
-            # Test the service with a simple query
-            test_response = await llama_service.chat("Hello", "test-session")
-            if test_response and test_response.get('response'):
-                print("✅ LLaMA service initialized and tested successfully")
+            # Ready once an Ollama node answers its health probe; models are
+            # preloaded in the background so a cold host does not hold up startup
+            if llama_service.pool.available_nodes():
+                llama_service.warmup.start_background()
+                print("✅ LLaMA service initialized, preloading models in the background")
                 break
             else:
-                raise Exception("Service initialized but test query failed")
+                await llama_service.__aexit__(None, None, None)
+                raise Exception("Service initialized but no Ollama node is reachable")
 
         except Exception as e:
             print(f"⚠️  LLaMA service initialization attempt {attempt + 1} failed: {e}")
@@ -370,13 +277,14 @@ async def shutdown_event():
     global llama_service
     if llama_service:
         await llama_service.__aexit__(None, None, None)
+    await log_writer.stop()
+    await email_sender.stop()
+    contact_notifications.stop_workers(phone_workers)
+    db.close()
 
 @app.post("/api/prospects")
 async def create_prospect(prospect: ProspectCreate, request: Request):
     try:
-        conn = sqlite3.connect('lz_custom.db')
-        cursor = conn.cursor()
-
         # Clean and prepare data - convert empty strings to None for better database handling
         name = prospect.name.strip() if prospect.name else None
         email = prospect.email.strip() if prospect.email else None
@@ -393,42 +301,12 @@ async def create_prospect(prospect: ProspectCreate, request: Request):
 
         # Log the submission attempt for comprehensive tracking
         user_ip = request.client.host if request.client else None
+        domain_brand = request.headers.get("x-domain-brand", "giorgiy")
 
         print(f"Form submission from {user_ip}: name={name}, email={email}, phone={phone}, project={project}")
 
-        cursor.execute('''
-            INSERT INTO prospects (
-                name, email, phone, project_type, budget_range, timeline,
-                message, room_dimensions, measurements, wood_species,
-                cabinet_style, material_type, square_footage, priority
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            name,
-            email,
-            phone,
-            project,
-            prospect.budget,
-            prospect.timeline,
-            message,
-            prospect.roomDimensions,
-            prospect.measurements,
-            prospect.woodSpecies,
-            prospect.cabinetStyle,
-            prospect.materialType,
-            prospect.squareFootage,
-            priority
-        ))
-
-        prospect_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-
-        # Log successful submission
-        print(f"Successfully saved prospect {prospect_id} with priority {priority}")
-
-        # Send email notifications
+        # Queue email notifications; delivery happens after the response
         try:
-            domain_brand = request.headers.get("x-domain-brand", "giorgiy")
             prospect_data = {
                 "name": name,
                 "email": email,
@@ -438,22 +316,54 @@ async def create_prospect(prospect: ProspectCreate, request: Request):
                 "budget": prospect.budget,
                 "timeline": prospect.timeline
             }
-            
+
             # Get email templates for this domain
-            (owner_subject, owner_body), (prospect_subject, prospect_body) = get_prospect_email_template(prospect_data, domain_brand)
-            
-            # Send email to business owner
-            owner_email_sent = await send_email(EMAIL_CONFIG["to_email"], owner_subject, owner_body, is_html=True)
-            
-            # Send auto-reply to prospect if email provided
-            prospect_email_sent = False
+            (owner_subject, owner_body), (prospect_subject, prospect_body) = email_templates.render_prospect_emails(prospect_data, domain_brand)
+
+            # Business owner notification, plus an auto-reply if the prospect gave an email
+            emails = [OutboxMessage(EMAIL_CONFIG["to_email"], owner_subject, owner_body,
+                                    kind="owner_notification", domain_brand=domain_brand)]
             if email:
-                prospect_email_sent = await send_email(email, prospect_subject, prospect_body, is_html=True)
-            
-            print(f"Email notifications - Owner: {'✅' if owner_email_sent else '❌'}, Prospect: {'✅' if prospect_email_sent else '❌'}")
-            
+                emails.append(OutboxMessage(email, prospect_subject, prospect_body,
+                                            kind="prospect_autoreply", domain_brand=domain_brand))
         except Exception as email_error:
-            print(f"⚠️  Email sending failed (prospect still saved): {email_error}")
+            print(f"⚠️  Email preparation failed (prospect still saved): {email_error}")
+            emails = []
+
+        def insert_prospect(conn):
+            cursor = conn.execute('''
+                INSERT INTO prospects (
+                    name, email, phone, project_type, budget_range, timeline,
+                    message, room_dimensions, measurements, wood_species,
+                    cabinet_style, material_type, square_footage, priority,
+                    domain_brand
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                name,
+                email,
+                phone,
+                project,
+                prospect.budget,
+                prospect.timeline,
+                message,
+                prospect.roomDimensions,
+                prospect.measurements,
+                prospect.woodSpecies,
+                prospect.cabinetStyle,
+                prospect.materialType,
+                prospect.squareFootage,
+                priority,
+                domain_brand
+            ))
+            # Same transaction: the notifications exist if and only if the prospect does
+            SQLiteOutboxStore.enqueue_in(conn, emails)
+            return cursor.lastrowid
+
+        prospect_id = await db.write(insert_prospect)
+        email_sender.wake()
+
+        # Log successful submission
+        print(f"Successfully saved prospect {prospect_id} with priority {priority}, {len(emails)} emails queued")
 
         return {
             "message": "Quote request submitted successfully",
@@ -474,65 +384,163 @@ async def create_prospect(prospect: ProspectCreate, request: Request):
             "note": "Please call to confirm your request was received"
         }
 
+@app.post("/api/contact")
+async def create_contact(contact: ContactCreate, request: Request):
+    """Contact form: store the contact and queue its notifications.
+
+    The owner email goes through the email outbox; callback and text requests
+    become call/SMS jobs for the contact_notifications workers.
+    """
+    name = contact.name.strip() if contact.name else None
+    message = contact.message.strip() if contact.message else None
+    if not name or not message:
+        raise HTTPException(status_code=400, detail="Name and message are required")
+
+    domain_brand = request.headers.get("x-domain-brand", "giorgiy")
+    config = DOMAIN_CONFIGS.get(domain_brand, DOMAIN_CONFIGS["giorgiy"])
+    forwarded_for = request.headers.get("x-forwarded-for")
+    contact_data = {
+        "name": name,
+        "email": contact.email.strip() if contact.email else None,
+        "phone": contact.phone.strip() if contact.phone else None,
+        "project_type": contact.project_type.strip() if contact.project_type else None,
+        "contact_methods": contact.contact_methods,
+        "message": message,
+        "ip_address": forwarded_for.split(",")[0].strip() if forwarded_for else (request.client.host if request.client else None),
+        "user_agent": request.headers.get("user-agent", ""),
+        "callback_requested": contact.callback_requested,
+        "text_requested": contact.text_requested
+    }
+    callback_queued = bool(contact.callback_requested and contact_data["phone"])
+    text_queued = bool(contact.text_requested and contact_data["phone"])
+
+    try:
+        subject, body = email_templates.render("contact_notification", domain_brand, contact=contact_data)
+        emails = [OutboxMessage(EMAIL_CONFIG["to_email"], subject, body,
+                                kind="contact_notification", domain_brand=domain_brand)]
+    except Exception as email_error:
+        print(f"⚠️  Email preparation failed (contact still saved): {email_error}")
+        emails = []
+
+    project = contact_data["project_type"] or "project"
+
+    def insert_contact(conn):
+        cursor = conn.execute('''
+            INSERT INTO contacts (
+                name, email, phone, project_type, contact_methods, message,
+                ip_address, user_agent, callback_requested, text_requested, domain_brand
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            contact_data["name"],
+            contact_data["email"],
+            contact_data["phone"],
+            contact_data["project_type"],
+            contact_data["contact_methods"],
+            contact_data["message"],
+            contact_data["ip_address"],
+            contact_data["user_agent"],
+            contact_data["callback_requested"],
+            contact_data["text_requested"],
+            domain_brand
+        ))
+        contact_id = cursor.lastrowid
+        SQLiteOutboxStore.enqueue_in(conn, emails)
+        if callback_queued:
+            contact_notifications.enqueue(conn, contact_id, "call", contact_data["phone"], message=(
+                f"Hello {name}, this is {config['company_name']}. You requested a callback regarding "
+                f"your {project}. We'll call you back shortly!"
+            ))
+        if text_queued:
+            contact_notifications.enqueue(conn, contact_id, "sms", contact_data["phone"], body=(
+                f"Hi {name}! Thanks for contacting {config['company_name']}. We received your message about "
+                f"{contact_data['project_type'] or 'your project'} and will get back to you soon. "
+                f"Call us at {config['phone']} for immediate assistance."
+            ))
+        return contact_id
+
+    contact_id = await db.write(insert_contact)
+    email_sender.wake()
+    print(f"New contact saved: ID {contact_id}, Name: {name}")
+
+    return {
+        "message": "Contact form submitted successfully!",
+        "id": contact_id,
+        # *_sent are the keys existing callers read; delivery itself is now asynchronous
+        "notification_sent": bool(emails),
+        "callback_sent": callback_queued,
+        "text_sent": text_queued,
+        "notification_queued": bool(emails),
+        "callback_queued": callback_queued,
+        "text_queued": text_queued
+    }
+
 @app.get("/api/prospects")
-async def get_prospects():
+async def get_prospects(response: Response, limit: int = 100, cursor: Optional[str] = None,
+                        status: Optional[str] = None, priority: Optional[str] = None,
+                        brand: Optional[str] = None, created_from: Optional[str] = None,
+                        created_to: Optional[str] = None):
+    """
+    List prospects by priority, newest first, one keyset page at a time.
+
+    The body stays a plain list; when more rows exist the cursor for the next
+    page is returned in the X-Next-Cursor header. created_from is inclusive and
+    created_to exclusive (dates or timestamps).
+    """
+    limit = clamp_page_size(limit)
+    conditions, params = [], []
+    if status:
+        conditions.append('status = ?')
+        params.append(status)
+    if priority:
+        conditions.append('priority_score = ?')
+        params.append(PRIORITY_SCORES.get(priority, -1))
+    if brand:
+        conditions.append('domain_brand = ?')
+        params.append(brand)
+    if created_from:
+        conditions.append('created_at >= ?')
+        params.append(created_from)
+    if created_to:
+        conditions.append('created_at < ?')
+        params.append(created_to)
+    if cursor:
+        try:
+            conditions.append('(priority_score, created_at, id) < (?, ?, ?)')
+            params.extend(decode_cursor(cursor, 3))
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
     try:
-        conn = sqlite3.connect('lz_custom.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        rows = await db.fetch_all(f'''
             SELECT id, name, email, phone, project_type, budget_range, 
                    timeline, created_at, status, priority
             FROM prospects 
-            ORDER BY 
-                CASE priority 
-                    WHEN 'high' THEN 1 
-                    WHEN 'normal' THEN 2 
-                    WHEN 'low' THEN 3 
-                END,
-                created_at DESC
-        ''')
-        
-        prospects = []
-        for row in cursor.fetchall():
-            prospects.append({
-                "id": row[0],
-                "name": row[1],
-                "email": row[2],
-                "phone": row[3],
-                "project_type": row[4],
-                "budget_range": row[5],
-                "timeline": row[6],
-                "created_at": row[7],
-                "status": row[8],
-                "priority": row[9]
-            })
-        
-        conn.close()
-        return prospects
+            {where}
+            ORDER BY priority_score DESC, created_at DESC, id DESC
+            LIMIT ?
+        ''', (*params, limit + 1))
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    prospects, next_cursor = split_page(
+        rows, limit, lambda row: (priority_score(row["priority"]), row["created_at"], row["id"])
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return prospects
+
 @app.get("/api/prospects/{prospect_id}")
 async def get_prospect_details(prospect_id: int):
     try:
-        conn = sqlite3.connect('lz_custom.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        prospect = await db.fetch_one('''
             SELECT * FROM prospects WHERE id = ?
         ''', (prospect_id,))
         
-        row = cursor.fetchone()
-        if not row:
+        if not prospect:
             raise HTTPException(status_code=404, detail="Prospect not found")
         
-        # Get column names
-        columns = [description[0] for description in cursor.description]
-        prospect = dict(zip(columns, row))
-        
-        conn.close()
         return prospect
     
     except Exception as e:
@@ -541,18 +549,12 @@ async def get_prospect_details(prospect_id: int):
 @app.put("/api/prospects/{prospect_id}/status")
 async def update_prospect_status(prospect_id: int, status: dict):
     try:
-        conn = sqlite3.connect('lz_custom.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        await db.execute('''
             UPDATE prospects 
             SET status = ?, notes = ?
             WHERE id = ?
         ''', (status.get('status'), status.get('notes', ''), prospect_id))
         
-        conn.commit()
-        conn.close()
-        
         return {"message": "Status updated successfully"}
     
     except Exception as e:
@@ -572,7 +574,7 @@ async def chat_with_ai(message: ChatMessage, request: Request):
     domain_brand = request.headers.get("x-domain-brand", "giorgiy")
 
     # Create or update session
-    create_or_update_session(session_id, user_ip, user_agent)
+    await create_or_update_session(session_id, user_ip, user_agent)
 
     if not llama_service:
         fallback_response = ChatResponse(
@@ -586,7 +588,7 @@ async def chat_with_ai(message: ChatMessage, request: Request):
         )
 
         # Log the fallback response
-        log_chat_conversation(
+        await log_chat_conversation(
             session_id=session_id,
             user_message=message.message,
             ai_response=fallback_response.response,
@@ -596,36 +598,31 @@ async def chat_with_ai(message: ChatMessage, request: Request):
             success=False,
             error_message="LLaMA service not initialized",
             user_ip=user_ip,
-            user_agent=user_agent
+            user_agent=user_agent,
+            domain_brand=domain_brand
         )
 
         return fallback_response
 
     try:
         # Force specific tier if requested (for testing)
-        force_tier = None
-        if message.force_tier:
-            tier_map = {
-                "FAST": QuestionClassifier.ModelTier.FAST,
-                "MEDIUM": QuestionClassifier.ModelTier.MEDIUM,
-                "ADVANCED": QuestionClassifier.ModelTier.ADVANCED,
-                "EXPERT": QuestionClassifier.ModelTier.EXPERT
-            }
-            force_tier = tier_map.get(message.force_tier.upper())
+        force_tier = resolve_force_tier(message.force_tier)
 
         # Generate response with domain-specific context
         domain_context = get_domain_context(domain_brand)
         result = await llama_service.generate_response(
             message.message,
             tier=force_tier,
-            domain_context=domain_context
+            domain_context=domain_context,
+            brand=domain_brand,
+            session_id=session_id
         )
 
         # Add session_id to response
         result["session_id"] = session_id
 
         # Log successful conversation
-        log_chat_conversation(
+        await log_chat_conversation(
             session_id=session_id,
             user_message=message.message,
             ai_response=result["response"],
@@ -635,7 +632,10 @@ async def chat_with_ai(message: ChatMessage, request: Request):
             success=result["success"],
             error_message=None,
             user_ip=user_ip,
-            user_agent=user_agent
+            user_agent=user_agent,
+            requested_tier=result.get("requested_tier"),
+            metrics=result.get("metrics"),
+            domain_brand=domain_brand
         )
 
         return ChatResponse(**result)
@@ -652,7 +652,7 @@ async def chat_with_ai(message: ChatMessage, request: Request):
         )
 
         # Log error conversation
-        log_chat_conversation(
+        await log_chat_conversation(
             session_id=session_id,
             user_message=message.message,
             ai_response=error_response.response,
@@ -662,11 +662,90 @@ async def chat_with_ai(message: ChatMessage, request: Request):
             success=False,
             error_message=str(e),
             user_ip=user_ip,
-            user_agent=user_agent
+            user_agent=user_agent,
+            domain_brand=domain_brand
         )
 
         return error_response
 
+@app.post("/api/chat/stream")
+async def chat_with_ai_stream(message: ChatMessage, request: Request):
+    """
+    Stream a chat reply as newline-delimited JSON.
+
+    Emits ``{"type": "token", "content": ...}`` lines while the model generates,
+    then one ``{"type": "done", ...}`` line with the same fields as /api/chat plus
+    ``time_to_first_token``. The conversation is logged once the stream finishes.
+    """
+    global llama_service
+
+    session_id = message.session_id or str(uuid.uuid4())
+    user_ip = request.client.host if request.client else None
+    user_agent = request.headers.get("user-agent", "")
+    domain_brand = request.headers.get("x-domain-brand", "giorgiy")
+
+    await create_or_update_session(session_id, user_ip, user_agent)
+
+    async def event_stream():
+        started = time.time()
+        result = None
+        chunks = []
+        stream = None
+        try:
+            if not llama_service:
+                result = {
+                    "type": "done",
+                    "response": "AI assistant is currently unavailable. Please call us at 216-268-2990 for immediate assistance!",
+                    "model_used": "fallback",
+                    "tier": "FALLBACK",
+                    "response_time": 0,
+                    "time_to_first_token": None,
+                    "success": False,
+                    "error": "LLaMA service not initialized"
+                }
+            else:
+                stream = llama_service.stream_response(
+                    message.message,
+                    tier=resolve_force_tier(message.force_tier),
+                    domain_context=get_domain_context(domain_brand),
+                    brand=domain_brand,
+                    session_id=session_id
+                )
+                async for event in stream:
+                    if event["type"] == "done":
+                        result = event
+                    else:
+                        chunks.append(event["content"])
+                        yield json.dumps(event) + "\n"
+
+            result["session_id"] = session_id
+            yield json.dumps(result) + "\n"
+        finally:
+            # Also runs when the client disconnects mid-reply: stop generating
+            # and log what was sent so far
+            if stream is not None:
+                await stream.aclose()
+            if result is None:
+                result = disconnected_result(chunks, started)
+            await log_chat_conversation(
+                session_id=session_id,
+                user_message=message.message,
+                ai_response=result["response"],
+                model_used=result["model_used"],
+                tier=result["tier"],
+                response_time=result["response_time"],
+                success=result["success"],
+                error_message=result.get("error"),
+                user_ip=user_ip,
+                user_agent=user_agent,
+                time_to_first_token=result.get("time_to_first_token"),
+                requested_tier=result.get("requested_tier"),
+                metrics=result.get("metrics"),
+                domain_brand=domain_brand
+            )
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @app.get("/api/chat/test")
 async def test_models():
     """
@@ -706,34 +785,81 @@ async def test_models():
 
     return {"test_results": results}
 
+@app.get("/api/chat/stats")
+async def get_chat_stats():
+    """Get LLaMA service runtime statistics (response cache hit rates etc.)"""
+    if not llama_service:
+        raise HTTPException(status_code=503, detail="LLaMA service not available")
+    return {**llama_service.get_stats(), "log_writer": log_writer.get_stats()}
+
+@app.get("/api/email/stats")
+async def get_email_stats():
+    """Outbox delivery status counts and sender counters"""
+    return {**await email_sender.get_stats(), "templates": email_templates.get_stats()}
+
+@app.get("/api/contact/notifications/stats")
+async def get_contact_notification_stats():
+    """Call/SMS job counts per channel and status"""
+    return {
+        "fake_providers": contact_notifications.fake_providers_enabled(),
+        "workers": sum(worker.is_alive() for worker in phone_workers),
+        "jobs": await db.read(contact_notifications.queue_stats)
+    }
+
+@app.get("/api/health")
+async def health_check():
+    """Service health, including the phone notification queue (as served by the old contact API)"""
+    try:
+        queue = await db.read(contact_notifications.queue_stats)
+        status = "healthy"
+    except Exception as e:
+        queue = {"error": str(e)}
+        status = "degraded"
+    return {
+        "status": status,
+        "service": "LZ Custom API",
+        "llama_service": llama_service is not None,
+        "fake_providers": contact_notifications.fake_providers_enabled(),
+        "notification_queue": queue
+    }
+
 @app.get("/api/chat/conversations")
-async def get_chat_conversations(limit: int = 50, session_id: str = None):
-    """Get chat conversation history"""
+async def get_chat_conversations(limit: int = 50, session_id: str = None, cursor: Optional[str] = None,
+                                 brand: Optional[str] = None, created_from: Optional[str] = None,
+                                 created_to: Optional[str] = None):
+    """Get chat conversation history, newest first, one keyset page at a time"""
+    limit = clamp_page_size(limit)
+    conditions, params = [], []
+    if session_id:
+        conditions.append('session_id = ?')
+        params.append(session_id)
+    if brand:
+        conditions.append('domain_brand = ?')
+        params.append(brand)
+    if created_from:
+        conditions.append('created_at >= ?')
+        params.append(created_from)
+    if created_to:
+        conditions.append('created_at < ?')
+        params.append(created_to)
+    if cursor:
+        try:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(decode_cursor(cursor, 2))
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
     try:
-        conn = sqlite3.connect('lz_custom.db')
-        cursor = conn.cursor()
-
-        if session_id:
-            cursor.execute('''
-                SELECT * FROM chat_conversations
-                WHERE session_id = ?
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (session_id, limit))
-        else:
-            cursor.execute('''
-                SELECT * FROM chat_conversations
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (limit,))
-
-        conversations = []
-        columns = [description[0] for description in cursor.description]
-        for row in cursor.fetchall():
-            conversations.append(dict(zip(columns, row)))
-
-        conn.close()
-        return {"conversations": conversations}
+        rows = await db.fetch_all(f'''
+            SELECT * FROM chat_conversations
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', (*params, limit + 1))
+
+        conversations, next_cursor = split_page(rows, limit, lambda row: (row["created_at"], row["id"]))
+        return {"conversations": conversations, "next_cursor": next_cursor}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -742,10 +868,7 @@ async def get_chat_conversations(limit: int = 50, session_id: str = None):
 async def get_chat_sessions(limit: int = 50):
     """Get chat session summary"""
     try:
-        conn = sqlite3.connect('lz_custom.db')
-        cursor = conn.cursor()
-
-        cursor.execute('''
+        sessions = await db.fetch_all('''
             SELECT cs.*,
                    COUNT(cc.id) as total_messages,
                    MAX(cc.created_at) as last_message_at
@@ -756,12 +879,6 @@ async def get_chat_sessions(limit: int = 50):
             LIMIT ?
         ''', (limit,))
 
-        sessions = []
-        columns = [description[0] for description in cursor.description]
-        for row in cursor.fetchall():
-            sessions.append(dict(zip(columns, row)))
-
-        conn.close()
         return {"sessions": sessions}
 
     except Exception as e:
@@ -769,76 +886,9 @@ async def get_chat_sessions(limit: int = 50):
 
 @app.get("/api/analytics/dashboard")
 async def get_analytics_dashboard():
-    """Get analytics dashboard data"""
+    """Get analytics dashboard data (read from the rollup tables)"""
     try:
-        conn = sqlite3.connect('lz_custom.db')
-        cursor = conn.cursor()
-
-        # Prospect statistics
-        cursor.execute('SELECT COUNT(*) FROM prospects')
-        total_prospects = cursor.fetchone()[0]
-
-        cursor.execute('SELECT COUNT(*) FROM prospects WHERE created_at >= date("now", "-7 days")')
-        prospects_this_week = cursor.fetchone()[0]
-
-        cursor.execute('SELECT COUNT(*) FROM prospects WHERE status = "new"')
-        new_prospects = cursor.fetchone()[0]
-
-        # Chat statistics
-        cursor.execute('SELECT COUNT(*) FROM chat_conversations')
-        total_chats = cursor.fetchone()[0]
-
-        cursor.execute('SELECT COUNT(*) FROM chat_conversations WHERE created_at >= date("now", "-7 days")')
-        chats_this_week = cursor.fetchone()[0]
-
-        cursor.execute('SELECT COUNT(DISTINCT session_id) FROM chat_conversations')
-        unique_sessions = cursor.fetchone()[0]
-
-        # Model usage statistics
-        cursor.execute('''
-            SELECT model_used, COUNT(*) as usage_count
-            FROM chat_conversations
-            GROUP BY model_used
-            ORDER BY usage_count DESC
-        ''')
-        model_usage = [{"model": row[0], "count": row[1]} for row in cursor.fetchall()]
-
-        # Recent activity
-        cursor.execute('''
-            SELECT 'prospect' as type, name as title, created_at
-            FROM prospects
-            UNION ALL
-            SELECT 'chat' as type,
-                   SUBSTR(user_message, 1, 50) || '...' as title,
-                   created_at
-            FROM chat_conversations
-            ORDER BY created_at DESC
-            LIMIT 10
-        ''')
-        recent_activity = []
-        for row in cursor.fetchall():
-            recent_activity.append({
-                "type": row[0],
-                "title": row[1],
-                "created_at": row[2]
-            })
-
-        conn.close()
-
-        return {
-            "prospects": {
-                "total": total_prospects,
-                "this_week": prospects_this_week,
-                "new": new_prospects
-            },
-            "chats": {
-                "total": total_chats,
-                "this_week": chats_this_week,
-                "unique_sessions": unique_sessions
-            },
-            "model_usage": model_usage,
-            "recent_activity": recent_activity
-        }
+        return await db.read(read_dashboard)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -3,25 +3,34 @@
 
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uuid
+import json
 import asyncio
-import smtplib
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import time
 from datetime import datetime
+from dataclasses import dataclass
 
 # Import enterprise database components
 from database_enterprise import (
     DatabaseManager, 
+    DomainBasedRepository,
+    AnalyticsRepository,
     ProspectsRepository, 
     ChatRepository, 
+    EmailOutboxRepository,
     SessionManager, 
     CacheManager
 )
-from llama_service import LLaMAService, QuestionClassifier
+from email_templates import EmailTemplates
+from email_outbox import OutboxMessage, OutboxSender, SMTPConnectionPool
+from llama_service import LLaMAService, QuestionClassifier, ModelTier
+from pagination import InvalidCursorError, clamp_page_size
+from response_cache import ResponseCache
+from conversation_memory import ConversationMemory
 
 # Domain-specific branding configurations
 DOMAIN_CONFIGS = {
@@ -63,15 +72,21 @@ DOMAIN_CONFIGS = {
     }
 }
 
-def get_domain_context(domain_brand: str) -> str:
-    """Get domain-specific context for LLM"""
-    config = DOMAIN_CONFIGS.get(domain_brand, DOMAIN_CONFIGS["giorgiy"])
-    
+def build_domain_context(config: Dict) -> str:
+    """System prompt for one brand"""
     return f"""You are a helpful customer service representative for {config['company_name']}, 
     {config['tagline']}. We specialize in {config['specialty']} and are located in {config['location']} 
     with 30+ years of experience. Our phone number is {config['phone']}. 
     Always be helpful and encourage customers to call for quotes and consultations."""
 
+# Built once so each brand's system prompt is byte-identical on every request,
+# which lets Ollama reuse the evaluated prompt prefix
+DOMAIN_CONTEXTS = {brand: build_domain_context(config) for brand, config in DOMAIN_CONFIGS.items()}
+
+def get_domain_context(domain_brand: str) -> str:
+    """Get domain-specific context for LLM; unknown brands get the default brand's"""
+    return DOMAIN_CONTEXTS.get(domain_brand, DOMAIN_CONTEXTS["giorgiy"])
+
 def detect_domain_from_request(request: Request) -> str:
     """Detect domain brand from request headers or host"""
     # Try X-Domain-Brand header first (set by nginx)
@@ -99,90 +114,8 @@ EMAIL_CONFIG = {
     "from_email": os.environ.get("FROM_EMAIL", "noreply@giorgiy.org")
 }
 
-async def send_email(to_email: str, subject: str, body: str, is_html: bool = False) -> bool:
-    """Send email using SMTP"""
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_CONFIG["from_email"]
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(body, 'html' if is_html else 'plain'))
-        
-        with smtplib.SMTP(EMAIL_CONFIG["smtp_server"], EMAIL_CONFIG["smtp_port"]) as server:
-            if EMAIL_CONFIG["smtp_password"]:
-                server.starttls()
-                server.login(EMAIL_CONFIG["smtp_username"], EMAIL_CONFIG["smtp_password"])
-            server.send_message(msg)
-        
-        print(f"✅ Email sent successfully to {to_email}")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to send email to {to_email}: {e}")
-        return False
-
-def get_prospect_email_template(prospect_data: dict, domain_brand: str) -> tuple:
-    """Generate email templates for prospect notification"""
-    config = DOMAIN_CONFIGS.get(domain_brand, DOMAIN_CONFIGS["giorgiy"])
-    
-    # Email to business owner
-    owner_subject = f"New Lead from {config['company_name']} Website - {prospect_data['name']}"
-    owner_body = f"""
-    <h2>New Prospect Inquiry</h2>
-    
-    <p><strong>Company:</strong> {config['company_name']}</p>
-    <p><strong>Domain:</strong> {domain_brand}</p>
-    <p><strong>Time:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-    
-    <h3>Contact Information:</h3>
-    <ul>
-        <li><strong>Name:</strong> {prospect_data['name']}</li>
-        <li><strong>Email:</strong> {prospect_data['email']}</li>
-        <li><strong>Phone:</strong> {prospect_data.get('phone', 'Not provided')}</li>
-    </ul>
-    
-    <h3>Project Details:</h3>
-    <ul>
-        <li><strong>Project Type:</strong> {prospect_data.get('project', 'Not specified')}</li>
-        <li><strong>Budget:</strong> {prospect_data.get('budget', 'Not specified')}</li>
-        <li><strong>Timeline:</strong> {prospect_data.get('timeline', 'Not specified')}</li>
-    </ul>
-    
-    <h3>Message:</h3>
-    <p>{prospect_data.get('message', 'No message provided')}</p>
-    
-    <p><em>Follow up with this lead as soon as possible!</em></p>
-    """
-    
-    # Email to prospect (auto-reply)
-    prospect_subject = f"Thank you for contacting {config['company_name']}"
-    prospect_body = f"""
-    <h2>Thank you for your inquiry!</h2>
-    
-    <p>Dear {prospect_data['name']},</p>
-    
-    <p>Thank you for contacting <strong>{config['company_name']}</strong>. We have received your inquiry about {prospect_data.get('project', 'your project')} and will get back to you within 24 hours.</p>
-    
-    <h3>Your submission details:</h3>
-    <ul>
-        <li><strong>Project:</strong> {prospect_data.get('project', 'Not specified')}</li>
-        <li><strong>Budget:</strong> {prospect_data.get('budget', 'Not specified')}</li>
-        <li><strong>Timeline:</strong> {prospect_data.get('timeline', 'Not specified')}</li>
-    </ul>
-    
-    <p>In the meantime, feel free to call us directly at <strong>{config['phone']}</strong> if you have any urgent questions.</p>
-    
-    <p>We specialize in {config['specialty']} and look forward to helping you with your project.</p>
-    
-    <p>Best regards,<br>
-    {config['company_name']} Team<br>
-    {config['phone']}</p>
-    
-    <hr>
-    <p><small>This is an automated response. Please do not reply directly to this email.</small></p>
-    """
-    
-    return (owner_subject, owner_body), (prospect_subject, prospect_body)
+# Owner notification and auto-reply templates, compiled per brand at startup
+email_templates = EmailTemplates(DOMAIN_CONFIGS)
 
 # Initialize FastAPI app
 app = FastAPI(title="LZCustom Enterprise API", version="2.0.0")
@@ -198,28 +131,50 @@ app.add_middleware(
 # Global instances
 db_manager = DatabaseManager()
 prospects_repo = None
+analytics_repo = None
 chat_repo = None
+email_sender = None
 session_manager = None
 cache_manager = None
 llama_service = None
 
 @app.on_event("startup")
 async def startup_event():
-    global prospects_repo, chat_repo, session_manager, cache_manager, llama_service
+    global prospects_repo, analytics_repo, chat_repo, email_sender, session_manager, cache_manager, llama_service
     
     try:
         # Initialize database connections
         await db_manager.initialize()
+        if os.environ.get("PG_VALIDATE_SCHEMAS", "1").lower() not in ("0", "false", "no"):
+            await DomainBasedRepository.validate_schemas(db_manager)
         
         # Initialize repositories
         prospects_repo = ProspectsRepository(db_manager)
         chat_repo = ChatRepository(db_manager)
+        analytics_repo = AnalyticsRepository(db_manager)
+        chat_repo.writer.start()
+        # Prospect notifications are queued in shared.email_outbox and sent in the background
+        email_sender = OutboxSender(EmailOutboxRepository(db_manager), SMTPConnectionPool(EMAIL_CONFIG),
+                                    EMAIL_CONFIG["from_email"])
+        email_sender.start()
+        print(f"📧 Compiled {email_templates.load()} email templates from {email_templates.template_dir}")
         session_manager = SessionManager(db_manager)
+        session_manager.mirror.start()
         cache_manager = CacheManager(db_manager)
         
         # Initialize LLaMA service
         llama_service = LLaMAService()
+        llama_service.response_cache = ResponseCache(
+            redis_client=db_manager.get_redis(),
+            ttl=int(os.environ.get("RESPONSE_CACHE_TTL", "3600")),
+            embed_fn=llama_service.embed if llama_service.embed_model else None
+        )
+        # Conversation history lives next to the session in Redis
+        llama_service.memory = ConversationMemory(session_manager)
         await llama_service.__aenter__()
+
+        # Preload models in the background so startup is not blocked on Ollama
+        llama_service.warmup.start_background()
         
         print("✅ Enterprise backend initialized successfully")
         
@@ -232,6 +187,12 @@ async def shutdown_event():
     global llama_service
     if llama_service:
         await llama_service.__aexit__(None, None, None)
+    if chat_repo:
+        await chat_repo.writer.stop()
+    if session_manager:
+        await session_manager.mirror.stop()
+    if email_sender:
+        await email_sender.stop()
     await db_manager.close()
 
 # Pydantic models
@@ -260,10 +221,44 @@ class ChatResponse(BaseModel):
     response: str
     model_used: str
     tier: str
+    requested_tier: Optional[str] = None
     response_time: float
     success: bool
     error: Optional[str] = None
     session_id: str
+    metrics: Optional[dict] = None
+
+@dataclass
+class ProspectQuery:
+    """Prospect listing query parameters (created_from inclusive, created_to exclusive)"""
+    limit: int = 100
+    cursor: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+class ProspectStatusUpdate(BaseModel):
+    status: str
+    notes: Optional[str] = ""
+
+def resolve_force_tier(force_tier: Optional[str]) -> Optional[ModelTier]:
+    """Map a force_tier request value to a ModelTier"""
+    if not force_tier:
+        return None
+    return ModelTier.__members__.get(force_tier.upper())
+
+def disconnected_result(chunks: List[str], started: float) -> Dict:
+    """Log record for a streamed reply the client stopped reading before it finished"""
+    return {
+        "response": "".join(chunks).strip(),
+        "model_used": "unknown",
+        "tier": "INCOMPLETE",
+        "response_time": round(time.time() - started, 2),
+        "time_to_first_token": None,
+        "success": False,
+        "error": "client disconnected before the reply finished"
+    }
 
 # DOMAIN-SPECIFIC ENDPOINTS
 
@@ -274,15 +269,25 @@ async def create_lz_custom_prospect(prospect: ProspectCreate, request: Request):
     return await create_prospect_for_domain(prospect, request, "giorgiy")
 
 @app.get("/api/lz-custom/prospects", tags=["LZ Custom"])
-async def get_lz_custom_prospects():
+async def get_lz_custom_prospects(query: ProspectQuery = Depends()):
     """Get prospects for LZ Custom Fabrication"""
-    return await get_prospects_for_domain("giorgiy")
+    return await get_prospects_for_domain("giorgiy", query)
+
+@app.put("/api/lz-custom/prospects/{prospect_id}/status", tags=["LZ Custom"])
+async def update_lz_custom_prospect_status(prospect_id: uuid.UUID, update: ProspectStatusUpdate):
+    """Update prospect status for LZ Custom Fabrication"""
+    return await update_prospect_status_for_domain(prospect_id, update, "giorgiy")
 
 @app.post("/api/lz-custom/chat", response_model=ChatResponse, tags=["LZ Custom"])
 async def chat_lz_custom(message: ChatMessage, request: Request):
     """Chat with LZ Custom AI assistant"""
     return await chat_for_domain(message, request, "giorgiy")
 
+@app.post("/api/lz-custom/chat/stream", tags=["LZ Custom"])
+async def chat_lz_custom_stream(message: ChatMessage, request: Request):
+    """Stream a reply from the LZ Custom AI assistant"""
+    return chat_stream_for_domain(message, request, "giorgiy")
+
 # Giorgiy Shepov Consulting (giorgiy-shepov.com) - Business Consulting  
 @app.post("/api/gs-consulting/prospects", tags=["GS Consulting"])
 async def create_gs_consulting_prospect(prospect: ProspectCreate, request: Request):
@@ -290,15 +295,25 @@ async def create_gs_consulting_prospect(prospect: ProspectCreate, request: Reque
     return await create_prospect_for_domain(prospect, request, "giorgiy-shepov")
 
 @app.get("/api/gs-consulting/prospects", tags=["GS Consulting"])
-async def get_gs_consulting_prospects():
+async def get_gs_consulting_prospects(query: ProspectQuery = Depends()):
     """Get prospects for Giorgiy Shepov Consulting"""
-    return await get_prospects_for_domain("giorgiy-shepov")
+    return await get_prospects_for_domain("giorgiy-shepov", query)
+
+@app.put("/api/gs-consulting/prospects/{prospect_id}/status", tags=["GS Consulting"])
+async def update_gs_consulting_prospect_status(prospect_id: uuid.UUID, update: ProspectStatusUpdate):
+    """Update prospect status for Giorgiy Shepov Consulting"""
+    return await update_prospect_status_for_domain(prospect_id, update, "giorgiy-shepov")
 
 @app.post("/api/gs-consulting/chat", response_model=ChatResponse, tags=["GS Consulting"])
 async def chat_gs_consulting(message: ChatMessage, request: Request):
     """Chat with GS Consulting AI assistant"""
     return await chat_for_domain(message, request, "giorgiy-shepov")
 
+@app.post("/api/gs-consulting/chat/stream", tags=["GS Consulting"])
+async def chat_gs_consulting_stream(message: ChatMessage, request: Request):
+    """Stream a reply from the GS Consulting AI assistant"""
+    return chat_stream_for_domain(message, request, "giorgiy-shepov")
+
 # Bravo Ohio (bravoohio.org) - Business Growth Solutions
 @app.post("/api/bravo-ohio/prospects", tags=["Bravo Ohio"])
 async def create_bravo_ohio_prospect(prospect: ProspectCreate, request: Request):
@@ -306,15 +321,25 @@ async def create_bravo_ohio_prospect(prospect: ProspectCreate, request: Request)
     return await create_prospect_for_domain(prospect, request, "bravoohio")
 
 @app.get("/api/bravo-ohio/prospects", tags=["Bravo Ohio"]) 
-async def get_bravo_ohio_prospects():
+async def get_bravo_ohio_prospects(query: ProspectQuery = Depends()):
     """Get prospects for Bravo Ohio"""
-    return await get_prospects_for_domain("bravoohio")
+    return await get_prospects_for_domain("bravoohio", query)
+
+@app.put("/api/bravo-ohio/prospects/{prospect_id}/status", tags=["Bravo Ohio"])
+async def update_bravo_ohio_prospect_status(prospect_id: uuid.UUID, update: ProspectStatusUpdate):
+    """Update prospect status for Bravo Ohio"""
+    return await update_prospect_status_for_domain(prospect_id, update, "bravoohio")
 
 @app.post("/api/bravo-ohio/chat", response_model=ChatResponse, tags=["Bravo Ohio"])
 async def chat_bravo_ohio(message: ChatMessage, request: Request):
     """Chat with Bravo Ohio AI assistant"""
     return await chat_for_domain(message, request, "bravoohio")
 
+@app.post("/api/bravo-ohio/chat/stream", tags=["Bravo Ohio"])
+async def chat_bravo_ohio_stream(message: ChatMessage, request: Request):
+    """Stream a reply from the Bravo Ohio AI assistant"""
+    return chat_stream_for_domain(message, request, "bravoohio")
+
 # Lodex Inc (lodexinc.com) - Corporate Development
 @app.post("/api/lodex-inc/prospects", tags=["Lodex Inc"])
 async def create_lodex_inc_prospect(prospect: ProspectCreate, request: Request):
@@ -322,15 +347,25 @@ async def create_lodex_inc_prospect(prospect: ProspectCreate, request: Request):
     return await create_prospect_for_domain(prospect, request, "lodexinc")
 
 @app.get("/api/lodex-inc/prospects", tags=["Lodex Inc"])
-async def get_lodex_inc_prospects():
+async def get_lodex_inc_prospects(query: ProspectQuery = Depends()):
     """Get prospects for Lodex Inc"""
-    return await get_prospects_for_domain("lodexinc")
+    return await get_prospects_for_domain("lodexinc", query)
+
+@app.put("/api/lodex-inc/prospects/{prospect_id}/status", tags=["Lodex Inc"])
+async def update_lodex_inc_prospect_status(prospect_id: uuid.UUID, update: ProspectStatusUpdate):
+    """Update prospect status for Lodex Inc"""
+    return await update_prospect_status_for_domain(prospect_id, update, "lodexinc")
 
 @app.post("/api/lodex-inc/chat", response_model=ChatResponse, tags=["Lodex Inc"])
 async def chat_lodex_inc(message: ChatMessage, request: Request):
     """Chat with Lodex Inc AI assistant"""
     return await chat_for_domain(message, request, "lodexinc")
 
+@app.post("/api/lodex-inc/chat/stream", tags=["Lodex Inc"])
+async def chat_lodex_inc_stream(message: ChatMessage, request: Request):
+    """Stream a reply from the Lodex Inc AI assistant"""
+    return chat_stream_for_domain(message, request, "lodexinc")
+
 # LEGACY UNIFIED ENDPOINTS (for backward compatibility)
 @app.post("/api/prospects")
 async def create_prospect_legacy(prospect: ProspectCreate, request: Request):
@@ -344,6 +379,12 @@ async def chat_legacy(message: ChatMessage, request: Request):
     domain_brand = detect_domain_from_request(request)
     return await chat_for_domain(message, request, domain_brand)
 
+@app.post("/api/chat/stream")
+async def chat_stream_legacy(message: ChatMessage, request: Request):
+    """Legacy unified streaming chat endpoint - detects domain automatically"""
+    domain_brand = detect_domain_from_request(request)
+    return chat_stream_for_domain(message, request, domain_brand)
+
 # SHARED IMPLEMENTATION FUNCTIONS
 async def create_prospect_for_domain(prospect: ProspectCreate, request: Request, domain_brand: str):
     """Create prospect for specific domain"""
@@ -366,10 +407,8 @@ async def create_prospect_for_domain(prospect: ProspectCreate, request: Request,
             'priority': 'high' if prospect.budget in ['30k-50k', 'over-50k'] or prospect.timeline == 'asap' else 'normal'
         }
         
-        # Save to domain-specific PostgreSQL schema
-        prospect_id = await prospects_repo.create_prospect(prospect_data, domain_brand)
-        
-        # Send email notifications
+        # Queue email notifications; delivery happens after the response
+        notifications = []
         try:
             config = DOMAIN_CONFIGS.get(domain_brand, DOMAIN_CONFIGS["giorgiy"])
             
@@ -383,17 +422,24 @@ async def create_prospect_for_domain(prospect: ProspectCreate, request: Request,
                 "timeline": prospect.timeline
             }
             
-            (owner_subject, owner_body), (prospect_subject, prospect_body) = get_prospect_email_template(email_data, domain_brand)
+            (owner_subject, owner_body), (prospect_subject, prospect_body) = email_templates.render_prospect_emails(email_data, domain_brand)
             
-            # Send to business owner
-            await send_email(config["email"], owner_subject, owner_body, is_html=True)
+            # Business owner notification
+            notifications.append(OutboxMessage(config["email"], owner_subject, owner_body,
+                                               kind="owner_notification", domain_brand=domain_brand))
             
-            # Send auto-reply to prospect
+            # Auto-reply to prospect
             if prospect_data['email']:
-                await send_email(prospect_data['email'], prospect_subject, prospect_body, is_html=True)
+                notifications.append(OutboxMessage(prospect_data['email'], prospect_subject, prospect_body,
+                                                   kind="prospect_autoreply", domain_brand=domain_brand))
                 
         except Exception as email_error:
-            print(f"⚠️  Email sending failed: {email_error}")
+            print(f"⚠️  Email preparation failed: {email_error}")
+        
+        # Save to domain-specific PostgreSQL schema, with the notifications in the same transaction
+        prospect_id = await prospects_repo.create_prospect(prospect_data, domain_brand, notifications)
+        email_sender.wake()
+        await invalidate_prospect_cache(domain_brand)
         
         return {
             "message": "Quote request submitted successfully",
@@ -412,27 +458,59 @@ async def create_prospect_for_domain(prospect: ProspectCreate, request: Request,
             "note": "Please call to confirm your request was received"
         }
 
-async def get_prospects_for_domain(domain_brand: str):
-    """Get prospects for specific domain"""
+async def get_prospects_for_domain(domain_brand: str, query: ProspectQuery = None):
+    """Get one page of prospects for specific domain"""
+    query = query or ProspectQuery()
+    # Clamp before building the cache key so each brand has at most MAX_PAGE_SIZE page entries
+    limit = clamp_page_size(query.limit)
+    # Only the unfiltered first page is cached
+    cacheable = query == ProspectQuery(limit=query.limit)
     try:
-        # Try cache first
-        cache_key = f"prospects:{domain_brand}"
-        cached_prospects = await cache_manager.get(cache_key)
+        async def fetch_page():
+            prospects, next_cursor = await prospects_repo.get_prospects(
+                domain_brand,
+                limit=limit,
+                cursor=query.cursor,
+                status=query.status,
+                priority=query.priority,
+                created_from=query.created_from,
+                created_to=query.created_to
+            )
+            return {"prospects": prospects, "next_cursor": next_cursor}
         
-        if cached_prospects:
-            return {"prospects": cached_prospects, "cached": True}
+        if not cacheable:
+            return {**await fetch_page(), "cached": False}
         
-        # Fetch from database
-        prospects = await prospects_repo.get_prospects(domain_brand)
-        
-        # Cache for 5 minutes
-        await cache_manager.set(cache_key, prospects, ttl=300)
-        
-        return {"prospects": prospects, "cached": False}
+        # In-process L1, then Redis; cached for 5 minutes or until the next prospect write for this brand
+        page, cached = await cache_manager.get_or_compute_for_domain(
+            domain_brand, f"prospects:{domain_brand}:{limit}", fetch_page, ttl=300
+        )
+        return {**page, "cached": cached}
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch prospects: {str(e)}")
 
+async def update_prospect_status_for_domain(prospect_id: uuid.UUID, update: ProspectStatusUpdate, domain_brand: str):
+    """Update a prospect's status and notes for specific domain"""
+    try:
+        updated = await prospects_repo.update_prospect_status(prospect_id, update.status, update.notes, domain_brand)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=404, detail="Prospect not found")
+    await invalidate_prospect_cache(domain_brand)
+    return {"message": "Status updated successfully", "domain": domain_brand}
+
+async def invalidate_prospect_cache(domain_brand: str):
+    """Drop cached prospect lists for a brand after a write"""
+    try:
+        await cache_manager.invalidate_domain(domain_brand)
+    except Exception as e:
+        # Entries still expire by TTL
+        print(f"⚠️  Cache invalidation failed for {domain_brand}: {e}")
+
 async def chat_for_domain(message: ChatMessage, request: Request, domain_brand: str):
     """Chat implementation for specific domain"""
     global llama_service
@@ -441,14 +519,11 @@ async def chat_for_domain(message: ChatMessage, request: Request, domain_brand:
     session_id = message.session_id or str(uuid.uuid4())
     user_ip = request.client.host if request.client else None
     user_agent = request.headers.get("user-agent", "")
-    
-    # Create or update session in Redis
-    await session_manager.create_session(session_id, domain_brand, {
-        "user_ip": user_ip,
-        "user_agent": user_agent
-    })
+    # The session is created or refreshed in a single Redis call once the reply is known
+    session_data = {"user_ip": user_ip, "user_agent": user_agent}
     
     if not llama_service:
+        await session_manager.touch_session(session_id, domain_brand, session_data)
         fallback_response = ChatResponse(
             response=f"AI assistant is currently unavailable. Please call us at {DOMAIN_CONFIGS[domain_brand]['phone']} for immediate assistance!",
             model_used="fallback",
@@ -476,28 +551,22 @@ async def chat_for_domain(message: ChatMessage, request: Request, domain_brand:
     
     try:
         # Force specific tier if requested
-        force_tier = None
-        if message.force_tier:
-            tier_map = {
-                "FAST": QuestionClassifier.ModelTier.FAST,
-                "MEDIUM": QuestionClassifier.ModelTier.MEDIUM,
-                "ADVANCED": QuestionClassifier.ModelTier.ADVANCED,
-                "EXPERT": QuestionClassifier.ModelTier.EXPERT
-            }
-            force_tier = tier_map.get(message.force_tier.upper())
+        force_tier = resolve_force_tier(message.force_tier)
         
         # Generate response with domain-specific context
         domain_context = get_domain_context(domain_brand)
         result = await llama_service.generate_response(
             message.message,
             tier=force_tier,
-            domain_context=domain_context
+            domain_context=domain_context,
+            brand=domain_brand,
+            session_id=session_id
         )
         
         result["session_id"] = session_id
         
-        # Increment message count in session
-        await session_manager.increment_message_count(session_id)
+        # Refresh the session and count the message
+        await session_manager.touch_session(session_id, domain_brand, session_data, messages=1)
         
         # Log conversation to domain-specific schema
         await chat_repo.log_conversation({
@@ -506,16 +575,19 @@ async def chat_for_domain(message: ChatMessage, request: Request, domain_brand:
             "ai_response": result["response"],
             "model_used": result["model_used"],
             "tier": result["tier"],
+            "requested_tier": result.get("requested_tier"),
             "response_time": result["response_time"],
             "success": result["success"],
             "error_message": None,
             "user_ip": user_ip,
-            "user_agent": user_agent
+            "user_agent": user_agent,
+            "metrics": result.get("metrics")
         }, domain_brand)
         
         return ChatResponse(**result)
         
     except Exception as e:
+        await session_manager.touch_session(session_id, domain_brand, session_data)
         error_response = ChatResponse(
             response=f"I'm experiencing technical difficulties. Please call {DOMAIN_CONFIGS[domain_brand]['phone']} for immediate assistance.",
             model_used="error",
@@ -541,31 +613,145 @@ async def chat_for_domain(message: ChatMessage, request: Request, domain_brand:
         
         return error_response
 
+def chat_stream_for_domain(message: ChatMessage, request: Request, domain_brand: str) -> StreamingResponse:
+    """Streaming chat implementation for specific domain (newline-delimited JSON)"""
+    session_id = message.session_id or str(uuid.uuid4())
+    user_ip = request.client.host if request.client else None
+    user_agent = request.headers.get("user-agent", "")
+
+    async def event_stream():
+        started = time.time()
+        result = None
+        chunks = []
+        stream = None
+        try:
+            if not llama_service:
+                result = {
+                    "type": "done",
+                    "response": f"AI assistant is currently unavailable. Please call us at {DOMAIN_CONFIGS[domain_brand]['phone']} for immediate assistance!",
+                    "model_used": "fallback",
+                    "tier": "FALLBACK",
+                    "response_time": 0,
+                    "time_to_first_token": None,
+                    "success": False,
+                    "error": "LLaMA service not initialized"
+                }
+            else:
+                stream = llama_service.stream_response(
+                    message.message,
+                    tier=resolve_force_tier(message.force_tier),
+                    domain_context=get_domain_context(domain_brand),
+                    brand=domain_brand,
+                    session_id=session_id
+                )
+                async for event in stream:
+                    if event["type"] == "done":
+                        result = event
+                    else:
+                        chunks.append(event["content"])
+                        yield json.dumps(event) + "\n"
+
+            result["session_id"] = session_id
+            yield json.dumps(result) + "\n"
+        finally:
+            # Also runs when the client disconnects mid-reply: stop generating
+            # and log what was sent so far
+            if stream is not None:
+                await stream.aclose()
+            completed = result is not None and llama_service is not None
+            if result is None:
+                result = disconnected_result(chunks, started)
+
+            # One Redis call per message: create or refresh the session and count the reply
+            await session_manager.touch_session(session_id, domain_brand, {
+                "user_ip": user_ip,
+                "user_agent": user_agent
+            }, messages=1 if completed else 0)
+
+            await chat_repo.log_conversation({
+                "session_id": session_id,
+                "user_message": message.message,
+                "ai_response": result["response"],
+                "model_used": result["model_used"],
+                "tier": result["tier"],
+                "requested_tier": result.get("requested_tier"),
+                "response_time": result["response_time"],
+                "time_to_first_token": result.get("time_to_first_token"),
+                "success": result["success"],
+                "error_message": result.get("error"),
+                "user_ip": user_ip,
+                "user_agent": user_agent,
+                "metrics": result.get("metrics")
+            }, domain_brand)
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 # ANALYTICS AND MONITORING ENDPOINTS
 @app.get("/api/analytics/overview", tags=["Analytics"])
-async def get_analytics_overview():
-    """Get cross-domain analytics overview"""
+async def get_analytics_overview(created_from: Optional[datetime] = None, created_to: Optional[datetime] = None):
+    """Get cross-domain analytics overview (created_from inclusive, created_to exclusive)"""
+    if created_from and created_to and created_from >= created_to:
+        raise HTTPException(status_code=400, detail="created_from must be before created_to")
     try:
-        analytics = {}
-        
-        for domain_brand in DOMAIN_CONFIGS.keys():
-            # Get prospect count
-            prospects = await prospects_repo.get_prospects(domain_brand, limit=1000)
-            
-            # Get recent chat activity
-            conversations = await chat_repo.get_conversations(domain_brand, limit=100)
-            
-            analytics[domain_brand] = {
-                "prospects_count": len(prospects),
-                "conversations_count": len(conversations),
-                "config": DOMAIN_CONFIGS[domain_brand]
+        async def compute():
+            return {
+                "analytics": await analytics_repo.get_overview(created_from, created_to),
+                "generated_at": datetime.now()
             }
         
-        return {"analytics": analytics, "generated_at": datetime.now()}
+        # One UNION ALL query over every brand schema, cached briefly
+        key = f"analytics:overview:{created_from.isoformat() if created_from else ''}:{created_to.isoformat() if created_to else ''}"
+        overview, cached = await cache_manager.get_or_compute_for_domain(
+            "all", key, compute, ttl=int(os.environ.get("ANALYTICS_CACHE_TTL", "60"))
+        )
+        return {
+            "analytics": {
+                domain_brand: {**stats, "config": DOMAIN_CONFIGS.get(domain_brand)}
+                for domain_brand, stats in overview["analytics"].items()
+            },
+            "generated_at": overview["generated_at"],
+            "range": {"created_from": created_from, "created_to": created_to},
+            "cached": cached
+        }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/chat/stats", tags=["System"])
+async def get_chat_stats():
+    """LLaMA service runtime statistics (response cache hit rates etc.)"""
+    if not llama_service:
+        raise HTTPException(status_code=503, detail="LLaMA service not available")
+    return {
+        **llama_service.get_stats(),
+        "log_writer": chat_repo.writer.get_stats(),
+        "sessions": session_manager.get_stats()
+    }
+
+@app.get("/api/cache/stats", tags=["System"])
+async def get_cache_stats():
+    """API cache hit ratios and lookup latency per key family"""
+    if not cache_manager:
+        raise HTTPException(status_code=503, detail="Cache not available")
+    return cache_manager.get_stats()
+
+@app.get("/api/email/stats", tags=["System"])
+async def get_email_stats():
+    """Outbox delivery status counts and sender counters"""
+    if not email_sender:
+        raise HTTPException(status_code=503, detail="Email outbox not available")
+    return {**await email_sender.get_stats(), "templates": email_templates.get_stats()}
+
+@app.get("/api/db/stats", tags=["System"])
+async def get_db_stats():
+    """PostgreSQL pool usage and per-brand SQL template and execution counts"""
+    if not db_manager.pg_pool:
+        raise HTTPException(status_code=503, detail="Database not available")
+    return {
+        "pool": {"size": db_manager.pg_pool.get_size(), "idle": db_manager.pg_pool.get_idle_size()},
+        "statements": DomainBasedRepository.statements.get_stats()
+    }
+
 @app.get("/api/health", tags=["System"])
 async def health_check():
     """System health check for all databases"""
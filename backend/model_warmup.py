@@ -0,0 +1,179 @@
+"""
+Model warm-up and keep-alive management for Ollama
+Preloads models at startup, keeps hot ones resident and unloads idle ones
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict
+
+import aiohttp
+
+
+class ModelWarmupManager:
+    """Keep frequently used Ollama models loaded.
+
+    Every model in ``service.models`` is preloaded at startup. A background loop
+    re-sends ``keep_alive`` for models whose tiers saw traffic within
+    ``idle_eviction`` seconds and unloads the rest (``keep_alive: 0``).
+    Latency is recorded separately for cold (model not resident) and warm calls.
+    """
+
+    def __init__(self, service, refresh_interval: int = None, idle_eviction: int = None):
+        self.service = service
+        self.refresh_interval = refresh_interval or int(os.environ.get('OLLAMA_KEEPALIVE_REFRESH', '240'))
+        self.idle_eviction = idle_eviction or int(os.environ.get('OLLAMA_IDLE_EVICTION', '1800'))
+        self._task = None
+        self._preload = None
+
+        self.resident = set()
+        self.loaded_at: Dict[str, float] = {}
+        self.last_used: Dict[str, float] = {}
+        self.tier_requests: Dict[str, int] = {}
+        self.latency = {}  # model -> {"cold": [count, total], "warm": [count, total]}
+
+    def model_names(self):
+        """Distinct model names served by the service"""
+        return sorted({config.model_name for config in self.service.models.values()})
+
+    async def start(self) -> Dict[str, bool]:
+        """Preload every model and start the keep-alive loop"""
+        results = {}
+        for model_name in self.model_names():
+            results[model_name] = await self.load(model_name)
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return results
+
+    def start_background(self):
+        """Run ``start`` as a background task so startup does not wait for model loads"""
+        if self._preload is None:
+            self._preload = asyncio.create_task(self._preload_models())
+
+    async def stop(self):
+        """Stop the background preload and the keep-alive loop"""
+        for task in (self._preload, self._task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._preload = None
+        self._task = None
+
+    async def _preload_models(self):
+        try:
+            loaded = await self.start()
+            print(f"🔥 Model preload finished: {loaded}")
+        except Exception as e:
+            print(f"⚠️  Model preload failed: {e}")
+
+    async def load(self, model_name: str) -> bool:
+        """Load a model (or refresh its keep_alive)"""
+        start_time = time.time()
+        ok = await self._send_keep_alive(model_name, self.service.keep_alive)
+        if ok:
+            self.resident.add(model_name)
+            self.loaded_at[model_name] = time.time()
+            print(f"🔥 Model {model_name} resident ({time.time() - start_time:.1f}s)")
+        return ok
+
+    async def unload(self, model_name: str) -> bool:
+        """Unload a model from Ollama memory"""
+        ok = await self._send_keep_alive(model_name, 0)
+        if ok:
+            self.resident.discard(model_name)
+            print(f"🧊 Model {model_name} unloaded after {self.idle_eviction}s idle")
+        return ok
+
+    def is_warm(self, model_name: str) -> bool:
+        """Whether the model is believed to be loaded"""
+        return model_name in self.resident
+
+    def record_request(self, tier_name: str, model_name: str, latency: float, cold: bool):
+        """Record traffic and latency for a completed generation"""
+        self.tier_requests[tier_name] = self.tier_requests.get(tier_name, 0) + 1
+        self.last_used[model_name] = time.time()
+        self.resident.add(model_name)
+
+        buckets = self.latency.setdefault(model_name, {"cold": [0, 0.0], "warm": [0, 0.0]})
+        bucket = buckets["cold" if cold else "warm"]
+        bucket[0] += 1
+        bucket[1] += latency
+
+    def get_stats(self) -> Dict:
+        """Residency, traffic and cold/warm latency per model"""
+        now = time.time()
+        models = {}
+        for model_name in self.model_names():
+            buckets = self.latency.get(model_name, {"cold": [0, 0.0], "warm": [0, 0.0]})
+            last_used = self.last_used.get(model_name)
+            models[model_name] = {
+                "resident": model_name in self.resident,
+                "idle_seconds": round(now - last_used) if last_used else None,
+                "cold_requests": buckets["cold"][0],
+                "cold_avg_latency": round(buckets["cold"][1] / buckets["cold"][0], 2) if buckets["cold"][0] else None,
+                "warm_requests": buckets["warm"][0],
+                "warm_avg_latency": round(buckets["warm"][1] / buckets["warm"][0], 2) if buckets["warm"][0] else None
+            }
+        return {"models": models, "tier_requests": dict(self.tier_requests)}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self._refresh()
+            except Exception as e:
+                print(f"⚠️  Model keep-alive refresh failed: {e}")
+
+    async def _refresh(self):
+        await self._sync_resident()
+        now = time.time()
+        for model_name in self.model_names():
+            last_used = self.last_used.get(model_name)
+            if last_used is not None and now - last_used < self.idle_eviction:
+                # Hot: extend residency before Ollama's keep_alive runs out
+                await self.load(model_name)
+            elif model_name in self.resident:
+                last_activity = max(last_used or 0, self.loaded_at.get(model_name, 0))
+                if now - last_activity >= self.idle_eviction:
+                    await self.unload(model_name)
+
+    async def _sync_resident(self):
+        """Refresh residency from every available node's /api/ps"""
+        if not self.service.session:
+            return
+        resident = set()
+        for node in self.service.pool.available_nodes():
+            try:
+                async with self.service.session.get(
+                    f"{node.url}/api/ps",
+                    timeout=aiohttp.ClientTimeout(total=5)
+                ) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        resident.update(model.get("name") for model in data.get("models", []))
+            except Exception as e:
+                print(f"⚠️  Could not list loaded models on {node.url}: {e}")
+        self.resident = resident
+
+    async def _send_keep_alive(self, model_name: str, keep_alive) -> bool:
+        """Send keep_alive to every node hosting the model; True if any accepted"""
+        if not self.service.session:
+            return False
+        ok = False
+        for node in self.service.pool.nodes_for(model_name):
+            try:
+                # A generate request without a prompt only loads/unloads the model
+                async with self.service.session.post(
+                    f"{node.url}/api/generate",
+                    json={"model": model_name, "keep_alive": keep_alive},
+                    timeout=aiohttp.ClientTimeout(total=120)
+                ) as response:
+                    ok = response.status == 200 or ok
+            except Exception as e:
+                print(f"⚠️  Keep-alive for {model_name} on {node.url} failed: {e}")
+        return ok
@@ -0,0 +1,170 @@
+"""
+Multi-node Ollama backend pool
+Health probes, least-outstanding-requests balancing and node ejection
+"""
+
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import aiohttp
+
+
+class OllamaNodeError(Exception):
+    """Raised when a node answers with an error status"""
+
+
+@dataclass
+class OllamaNode:
+    url: str
+    models: Set[str] = field(default_factory=set)
+    outstanding: int = 0
+    healthy: bool = True
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    total_requests: int = 0
+    total_failures: int = 0
+    last_probe: Optional[float] = None
+
+    def hosts(self, model_name: str) -> bool:
+        """Whether the node serves the model (unknown until the first probe)"""
+        if not self.models:
+            return True
+        return model_name in self.models or f"{model_name}:latest" in self.models
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+
+class OllamaBackendPool:
+    """Pool of Ollama nodes.
+
+    Nodes are probed on ``/api/tags`` every ``probe_interval`` seconds to learn
+    which models they host. A node failing ``failure_threshold`` requests in a
+    row is ejected for ``eject_seconds`` and re-admitted by the next good probe.
+    """
+
+    def __init__(self, urls: List[str], probe_interval: int = None, failure_threshold: int = None,
+                 eject_seconds: int = None):
+        self.nodes = [OllamaNode(url.rstrip('/')) for url in urls]
+        self.probe_interval = probe_interval or int(os.environ.get('OLLAMA_PROBE_INTERVAL', '15'))
+        self.failure_threshold = failure_threshold or int(os.environ.get('OLLAMA_FAILURE_THRESHOLD', '3'))
+        self.eject_seconds = eject_seconds or int(os.environ.get('OLLAMA_EJECT_SECONDS', '30'))
+        self.session = None
+        self._task = None
+
+    @staticmethod
+    def urls_from_env() -> List[str]:
+        """Node URLs from OLLAMA_HOSTS (comma separated) or OLLAMA_HOST"""
+        hosts = os.environ.get('OLLAMA_HOSTS')
+        if hosts:
+            return [host.strip() for host in hosts.split(',') if host.strip()]
+        return [os.environ.get('OLLAMA_HOST', 'http://localhost:11434')]
+
+    async def start(self, session: aiohttp.ClientSession):
+        """Probe every node once and start the health-check loop"""
+        self.session = session
+        await asyncio.gather(*(self.probe(node) for node in self.nodes))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the health-check loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def candidates(self, model_name: str) -> List[OllamaNode]:
+        """Nodes to try for a model, least outstanding requests first.
+
+        When no node is currently available the ejected ones are returned so a
+        flapping single-node setup still gets a chance to answer.
+        """
+        now = time.time()
+        hosting = [node for node in self.nodes if node.hosts(model_name)] or list(self.nodes)
+        available = [node for node in hosting if node.available(now)]
+        if available:
+            return sorted(available, key=lambda node: node.outstanding)
+        return sorted(hosting, key=lambda node: node.ejected_until)
+
+    def available_nodes(self) -> List[OllamaNode]:
+        """Healthy, non-ejected nodes"""
+        now = time.time()
+        return [node for node in self.nodes if node.available(now)]
+
+    def nodes_for(self, model_name: str) -> List[OllamaNode]:
+        """Available nodes that host a model"""
+        now = time.time()
+        return [node for node in self.nodes if node.available(now) and node.hosts(model_name)]
+
+    @contextmanager
+    def track(self, node: OllamaNode):
+        """Count an outstanding request and record its outcome"""
+        node.outstanding += 1
+        node.total_requests += 1
+        try:
+            yield node
+        except (asyncio.TimeoutError, aiohttp.ClientError, OllamaNodeError):
+            self.mark_failure(node)
+            raise
+        else:
+            node.consecutive_failures = 0
+        finally:
+            node.outstanding -= 1
+
+    def mark_failure(self, node: OllamaNode):
+        """Record a failed request, ejecting the node past the threshold"""
+        node.total_failures += 1
+        node.consecutive_failures += 1
+        if node.consecutive_failures >= self.failure_threshold and node.healthy:
+            node.healthy = False
+            node.ejected_until = time.time() + self.eject_seconds
+            print(f"⛔ Ollama node {node.url} ejected after {node.consecutive_failures} failures")
+
+    async def probe(self, node: OllamaNode) -> bool:
+        """Check a node's /api/tags and refresh its model list"""
+        node.last_probe = time.time()
+        try:
+            async with self.session.get(f"{node.url}/api/tags", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status != 200:
+                    raise OllamaNodeError(f"status {response.status}")
+                data = await response.json()
+        except Exception as e:
+            if node.healthy:
+                print(f"⚠️  Ollama node {node.url} failed health probe: {e}")
+            node.healthy = False
+            node.ejected_until = max(node.ejected_until, time.time() + self.eject_seconds)
+            return False
+
+        node.models = {model.get("name") for model in data.get("models", [])}
+        if not node.healthy:
+            print(f"✅ Ollama node {node.url} re-admitted")
+        node.healthy = True
+        node.consecutive_failures = 0
+        node.ejected_until = 0.0
+        return True
+
+    def get_stats(self) -> List[Dict]:
+        """Per-node health and load"""
+        now = time.time()
+        return [{
+            "url": node.url,
+            "available": node.available(now),
+            "outstanding": node.outstanding,
+            "models": sorted(node.models),
+            "requests": node.total_requests,
+            "failures": node.total_failures,
+            "ejected_for": max(0, round(node.ejected_until - now)) if node.ejected_until else 0
+        } for node in self.nodes]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await asyncio.gather(*(self.probe(node) for node in self.nodes))
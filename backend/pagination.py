@@ -0,0 +1,69 @@
+"""
+Keyset pagination helpers
+Opaque cursors holding the sort key of the last row of a page
+"""
+
+import base64
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Prospect sort order: high > normal > low > unknown, then newest first.
+# Every sort column is descending so a single row-value comparison
+# ``(score, created_at, id) < (...)`` continues from a cursor via the index.
+# Stored as the prospects.priority_score generated column in SQLite and Postgres.
+PRIORITY_SCORE = "CASE priority WHEN 'high' THEN 3 WHEN 'normal' THEN 2 WHEN 'low' THEN 1 ELSE 0 END"
+PRIORITY_SCORES = {"high": 3, "normal": 2, "low": 1}
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor cannot be decoded"""
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    """Keep a requested page size within 1..MAX_PAGE_SIZE"""
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+
+def priority_score(priority: Optional[str]) -> int:
+    """Python equivalent of PRIORITY_SCORE"""
+    return PRIORITY_SCORES.get(priority, 0)
+
+
+def encode_cursor(*values: Any) -> str:
+    """Pack sort-key values into a URL-safe cursor"""
+    # Timestamps and UUIDs are stored as strings (str(datetime) is ISO 8601)
+    payload = json.dumps(values, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int,
+                  types: Optional[Sequence[Callable[[Any], Any]]] = None) -> List[Any]:
+    """Unpack a cursor made by encode_cursor with ``size`` values
+
+    ``types`` converts each value (e.g. ``int``, ``datetime.fromisoformat``,
+    ``uuid.UUID``) so a tampered cursor fails here, not in the database.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise InvalidCursorError("Malformed cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError("Malformed cursor")
+    if types:
+        try:
+            values = [convert(value) for convert, value in zip(types, values)]
+        except (TypeError, ValueError, AttributeError):
+            raise InvalidCursorError("Malformed cursor")
+    return values
+
+
+def split_page(rows: List[Dict], limit: int, key: Callable[[Dict], Tuple]) -> Tuple[List[Dict], Optional[str]]:
+    """Trim a ``limit + 1`` row fetch to one page and build the next cursor"""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(*key(page[-1]))
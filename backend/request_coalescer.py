@@ -0,0 +1,67 @@
+"""
+Request coalescing (single-flight) for LLaMAService
+Concurrent identical generations share one upstream Ollama call
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+
+class RequestCoalescer:
+    """Deduplicate concurrent identical calls.
+
+    The first caller for a key starts the work in its own task; callers that
+    arrive while it is running await the same task and receive the same result
+    or exception. A waiter disconnecting does not cancel the shared call.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._followers: Dict[str, int] = {}
+        self.stats = {
+            "leaders": 0,
+            "coalesced": 0,
+            "saved_seconds": 0.0
+        }
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """Stable key for a request payload (model, prompt, options)"""
+        encoded = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha1(encoded.encode()).hexdigest()
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn once per key among concurrent callers"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            self._followers[key] += 1
+            return await asyncio.shield(task)
+
+        self.stats["leaders"] += 1
+        self._followers[key] = 0
+        task = asyncio.ensure_future(self._run_leader(key, fn))
+        self._inflight[key] = task
+        # Retrieve the exception even if every waiter went away
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    async def _run_leader(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        start_time = time.time()
+        try:
+            return await fn()
+        finally:
+            followers = self._followers.pop(key, 0)
+            self._inflight.pop(key, None)
+            self.stats["saved_seconds"] += followers * (time.time() - start_time)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Coalescing counters"""
+        return {
+            **self.stats,
+            "saved_seconds": round(self.stats["saved_seconds"], 2),
+            "in_flight": len(self._inflight)
+        }
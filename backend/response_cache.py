@@ -0,0 +1,179 @@
+"""
+Response cache for LLaMAService
+Exact-match and optional embedding-similarity lookup of previous chat answers
+"""
+
+import hashlib
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+EmbedFn = Callable[[str], Awaitable[List[float]]]
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivial differences share a cache entry"""
+    question = question.lower()
+    question = re.sub(r"[^\w\s]", " ", question)
+    return " ".join(question.split())
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    """Cosine similarity between two vectors"""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+class ResponseCache:
+    """Cache of successful chat responses keyed on brand + normalized question + tier.
+
+    Exact matches are stored in Redis when a client is given (Redis applies the
+    TTL and its own maxmemory eviction policy) or in an in-process LRU otherwise.
+    When ``embed_fn`` is set, misses fall back to a similarity search over the
+    embeddings of recently cached questions for the same brand and tier.
+
+    The embedding index is per-process only, even with Redis: a worker finds
+    semantic matches only for answers it cached itself, and the index starts
+    empty after a restart (exact matches in Redis are shared and survive).
+    """
+
+    KEY_PREFIX = "chatcache"
+
+    def __init__(self, redis_client=None, ttl: int = 3600, max_entries: int = 1000,
+                 embed_fn: Optional[EmbedFn] = None, similarity_threshold: float = 0.92,
+                 max_embeddings: int = 500):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.max_embeddings = max_embeddings
+
+        # key -> (expires_at, value); used when Redis is not available
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        # key -> (brand, tier, vector, expires_at); per-process, never stored in Redis
+        self._embeddings: "OrderedDict[str, Tuple[str, str, List[float], float]]" = OrderedDict()
+
+        self.stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "errors": 0
+        }
+
+    def make_key(self, brand: str, question: str, tier: str) -> str:
+        """Build the cache key for a question"""
+        digest = hashlib.sha1(normalize_question(question).encode()).hexdigest()
+        return f"{self.KEY_PREFIX}:{brand}:{tier}:{digest}"
+
+    async def get(self, brand: str, question: str, tier: str) -> Optional[Dict]:
+        """Look up a cached response, trying exact then semantic match"""
+        try:
+            key = self.make_key(brand, question, tier)
+            value = await self._get_entry(key)
+            if value is not None:
+                self.stats["exact_hits"] += 1
+                return value
+
+            if self.embed_fn:
+                value = await self._get_similar(brand, question, tier)
+                if value is not None:
+                    self.stats["semantic_hits"] += 1
+                    return value
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️  Response cache lookup failed: {e}")
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, brand: str, question: str, tier: str, value: Dict, ttl: int = None):
+        """Store a response"""
+        ttl = ttl or self.ttl
+        try:
+            key = self.make_key(brand, question, tier)
+            await self._set_entry(key, value, ttl)
+            self.stats["stores"] += 1
+
+            if self.embed_fn:
+                vector = await self.embed_fn(normalize_question(question))
+                self._embeddings[key] = (brand, tier, vector, time.time() + ttl)
+                self._embeddings.move_to_end(key)
+                while len(self._embeddings) > self.max_embeddings:
+                    self._embeddings.popitem(last=False)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️  Response cache store failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "backend": "redis" if self.redis else "memory",
+            "entries": None if self.redis else len(self._entries),
+            "embeddings": len(self._embeddings)
+        }
+
+    async def _get_entry(self, key: str) -> Optional[Dict]:
+        if self.redis:
+            value = await self.redis.get(key)
+            return json.loads(value) if value else None
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            self.stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def _set_entry(self, key: str, value: Dict, ttl: int):
+        if self.redis:
+            await self.redis.setex(key, ttl, json.dumps(value, default=str))
+            return
+
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def _get_similar(self, brand: str, question: str, tier: str) -> Optional[Dict]:
+        if not self._embeddings:
+            return None
+
+        vector = await self.embed_fn(normalize_question(question))
+        now = time.time()
+        best_key, best_score = None, 0.0
+
+        for key, (entry_brand, entry_tier, entry_vector, expires_at) in list(self._embeddings.items()):
+            if expires_at < now:
+                del self._embeddings[key]
+                continue
+            if entry_brand != brand or entry_tier != tier:
+                continue
+            score = cosine_similarity(vector, entry_vector)
+            if score > best_score:
+                best_key, best_score = key, score
+
+        if best_key is None or best_score < self.similarity_threshold:
+            return None
+
+        self._embeddings.move_to_end(best_key)
+        return await self._get_entry(best_key)
@@ -0,0 +1,87 @@
+"""
+Per-brand SQL for the schema-per-brand PostgreSQL layout
+Queries written against ``{schema}`` are rendered once for every brand schema, so each
+brand always sends asyncpg the same SQL text and its per-connection statement cache is reused
+"""
+
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, List
+
+# Unquoted PostgreSQL identifier; schema names are spliced into SQL, never bound
+SCHEMA_NAME = re.compile(r"^[a-z_][a-z0-9_]{0,62}$")
+
+
+class SchemaStatements:
+    """Rendered SQL per (template, schema).
+
+    ``render`` replaces ``{schema}`` for every brand schema the first time a
+    template is seen and keeps up to ``max_templates`` templates (LRU), so a
+    brand always sends asyncpg the same SQL text. asyncpg prepares each
+    distinct text once per connection and keeps up to ``cache_size`` of them
+    (the pool's ``statement_cache_size``).
+
+    ``get_stats`` reports only what is counted here: template cache hits and
+    renders, and statements executed per schema. asyncpg does not expose its
+    statement cache, so no prepared-statement hit rate is reported.
+    """
+
+    def __init__(self, schemas: Dict[str, str], default_brand: str = "giorgiy",
+                 cache_size: int = None, max_templates: int = None):
+        self.schemas = schemas
+        self.default_schema = schemas[default_brand]
+        self.cache_size = cache_size or int(os.getenv("PG_STATEMENT_CACHE_SIZE", "256"))
+        self.max_templates = max_templates or int(os.getenv("PG_SQL_TEMPLATE_CACHE", "512"))
+        self._rendered: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self.stats = {"template_hits": 0, "templates_rendered": 0, "template_evictions": 0}
+        self.executions: Dict[str, int] = {}
+
+    def schema_for(self, domain_brand: str) -> str:
+        """Schema for a brand; unknown brands use the default brand's schema"""
+        return self.schemas.get(domain_brand, self.default_schema)
+
+    def render(self, query: str, schema: str) -> str:
+        """SQL for ``query`` in ``schema``; every call is counted as one execution"""
+        rendered = self._rendered.get(query)
+        if rendered is None:
+            rendered = {name: query.replace("{schema}", name) for name in self.schemas.values()}
+            self._rendered[query] = rendered
+            self.stats["templates_rendered"] += 1
+            if len(self._rendered) > self.max_templates:
+                self._rendered.popitem(last=False)
+                self.stats["template_evictions"] += 1
+        else:
+            self._rendered.move_to_end(query)
+            self.stats["template_hits"] += 1
+        self.executions[schema] = self.executions.get(schema, 0) + 1
+        sql = rendered.get(schema)
+        if sql is None:
+            sql = rendered[schema] = query.replace("{schema}", schema)
+        return sql
+
+    def check_names(self) -> List[str]:
+        """Schema names that are not plain identifiers"""
+        return [name for name in self.schemas.values() if not SCHEMA_NAME.match(name)]
+
+    async def validate(self, conn):
+        """Fail startup if a brand schema name is malformed or the schema does not exist"""
+        invalid = self.check_names()
+        if invalid:
+            raise ValueError(f"Invalid schema names in DOMAIN_SCHEMAS: {', '.join(invalid)}")
+        rows = await conn.fetch(
+            "SELECT nspname FROM pg_namespace WHERE nspname = ANY($1::text[])",
+            list(self.schemas.values())
+        )
+        missing = set(self.schemas.values()) - {row["nspname"] for row in rows}
+        if missing:
+            raise ValueError(f"Brand schemas missing from the database: {', '.join(sorted(missing))}")
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            # Distinct SQL texts per schema, which must fit in asyncpg's per-connection cache
+            "cached_templates": len(self._rendered),
+            "statement_cache_size": self.cache_size,
+            "executions_per_schema": dict(self.executions)
+        }
@@ -0,0 +1,264 @@
+"""
+Versioned schema migrations for the SQLite backend
+Applied in order at startup; the highest applied version is kept in schema_version
+"""
+
+import sqlite3
+from typing import Callable, List, Tuple
+
+from inference_metrics import OLLAMA_METRIC_FIELDS
+from analytics_rollups import create_rollups, rebuild_rollups
+from pagination import PRIORITY_SCORE
+from contact_notifications import init_queue
+
+# Original prospect priority sort key (migration 3); listings now page on the
+# priority_score column added in migration 6
+PRIORITY_RANK = "CASE priority WHEN 'high' THEN 1 WHEN 'normal' THEN 2 WHEN 'low' THEN 3 END"
+
+
+def add_missing_columns(cursor, table: str, columns: dict):
+    """Add columns introduced after a table was first created"""
+    # table_xinfo also lists generated columns
+    cursor.execute(f'PRAGMA table_xinfo({table})')
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+
+def create_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prospects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            email TEXT,
+            phone TEXT,
+            project_type TEXT,
+            budget_range TEXT,
+            timeline TEXT,
+            message TEXT,
+            room_dimensions TEXT,
+            measurements TEXT,
+            wood_species TEXT,
+            cabinet_style TEXT,
+            material_type TEXT,
+            square_footage INTEGER,
+            project_details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'new',
+            priority TEXT DEFAULT 'normal',
+            follow_up_date DATE,
+            notes TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS project_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prospect_id INTEGER,
+            image_path TEXT,
+            image_type TEXT,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (prospect_id) REFERENCES prospects (id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quotes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prospect_id INTEGER,
+            quote_amount DECIMAL(10,2),
+            quote_details TEXT,
+            valid_until DATE,
+            status TEXT DEFAULT 'draft',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (prospect_id) REFERENCES prospects (id)
+        )
+    ''')
+
+    # Chat conversations table for logging all AI interactions
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            user_message TEXT NOT NULL,
+            ai_response TEXT NOT NULL,
+            model_used TEXT NOT NULL,
+            tier TEXT NOT NULL,
+            response_time REAL,
+            success BOOLEAN DEFAULT 1,
+            error_message TEXT,
+            user_ip TEXT,
+            user_agent TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Chat sessions table for tracking conversation sessions
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT UNIQUE NOT NULL,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            message_count INTEGER DEFAULT 0,
+            user_ip TEXT,
+            user_agent TEXT,
+            status TEXT DEFAULT 'active'
+        )
+    ''')
+
+
+def add_chat_metrics_columns(cursor):
+    add_missing_columns(cursor, 'chat_conversations', {
+        'time_to_first_token': 'REAL',
+        'requested_tier': 'TEXT',
+        **{field: 'INTEGER' for field in OLLAMA_METRIC_FIELDS}
+    })
+
+
+def create_indexes(cursor):
+    # /api/chat/conversations?session_id= and the sessions join
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_conversations_session '
+                   'ON chat_conversations (session_id, created_at)')
+    # Dashboard date-range counts and newest-first listings
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_conversations_created '
+                   'ON chat_conversations (created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_conversations_model '
+                   'ON chat_conversations (model_used)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prospects_created ON prospects (created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prospects_status ON prospects (status)')
+    # Priority-ordered prospect list (ORDER BY PRIORITY_RANK, created_at DESC)
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_prospects_priority_rank '
+                   f'ON prospects (({PRIORITY_RANK}), created_at DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_activity '
+                   'ON chat_sessions (last_activity)')
+
+
+def add_domain_brand_columns(cursor):
+    add_missing_columns(cursor, 'prospects', {'domain_brand': 'TEXT'})
+    add_missing_columns(cursor, 'chat_conversations', {'domain_brand': 'TEXT'})
+
+
+def create_analytics_rollups(cursor):
+    create_rollups(cursor)
+    # Backfill from rows written before the triggers existed
+    rebuild_rollups(cursor)
+
+
+def create_keyset_indexes(cursor):
+    add_missing_columns(cursor, 'prospects', {
+        'priority_score': f'INTEGER GENERATED ALWAYS AS ({PRIORITY_SCORE}) VIRTUAL'
+    })
+    # Keyset listing: ORDER BY priority_score DESC, created_at DESC, id DESC
+    cursor.execute('DROP INDEX IF EXISTS idx_prospects_priority_rank')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prospects_keyset '
+                   'ON prospects (priority_score, created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prospects_status_keyset '
+                   'ON prospects (status, priority_score, created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prospects_brand_keyset '
+                   'ON prospects (domain_brand, priority_score, created_at, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_conversations_brand '
+                   'ON chat_conversations (domain_brand, created_at)')
+
+
+def create_email_outbox(cursor):
+    # Durable outbox for email_outbox.OutboxSender
+    # status: pending -> sending -> sent | failed (pending again on retry)
+    # While 'sending', next_attempt_at holds the claim time (released after a 10 minute lease)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_email TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            is_html BOOLEAN DEFAULT 1,
+            kind TEXT,
+            domain_brand TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_due '
+                   'ON email_outbox (status, next_attempt_at)')
+
+
+def create_contacts(cursor):
+    # /api/contact submissions (formerly the separate Flask contact backend's contacts.db)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS contacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT,
+            phone TEXT,
+            project_type TEXT,
+            contact_methods TEXT,
+            message TEXT NOT NULL,
+            ip_address TEXT,
+            user_agent TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'new',
+            callback_requested BOOLEAN DEFAULT 0,
+            text_requested BOOLEAN DEFAULT 0,
+            domain_brand TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_contacts_created ON contacts (created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_contacts_status ON contacts (status, created_at)')
+    # Callback and text-request jobs for the contact_notifications workers
+    init_queue(cursor)
+
+
+# (version, description, step); append new steps, never edit applied ones
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "initial schema", create_tables),
+    (2, "chat timing, routing and inference metric columns", add_chat_metrics_columns),
+    (3, "secondary indexes", create_indexes),
+    (4, "domain_brand on prospects and chat conversations", add_domain_brand_columns),
+    (5, "analytics rollups", create_analytics_rollups),
+    (6, "prospect priority_score and keyset pagination indexes", create_keyset_indexes),
+    (7, "email outbox", create_email_outbox),
+    (8, "contacts and phone notification jobs", create_contacts),
+]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Highest applied migration version (0 for a new database)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations, each in its own transaction; returns the schema version.
+
+    Steps are written to be safe on databases created before versioning
+    existed (CREATE ... IF NOT EXISTS, add_missing_columns).
+    """
+    version = current_version(conn)
+    conn.commit()
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        try:
+            step(cursor)
+            cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                           (step_version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"🗄️  Applied SQLite migration {step_version}: {description}")
+        version = step_version
+    return version
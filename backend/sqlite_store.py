@@ -0,0 +1,110 @@
+"""
+Shared SQLite connection layer
+WAL journal, one writer connection and a pool of readers, all run off the event loop
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+def rows_as_dicts(cursor: sqlite3.Cursor) -> List[Dict]:
+    """Fetch the remaining rows of a cursor keyed by column name"""
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+class SQLiteStore:
+    """Persistent SQLite connections for the FastAPI handlers.
+
+    Writes go through a single thread that owns the only writer connection, so
+    they are serialized without lock contention. Reads run on ``readers``
+    threads, each with its own connection; under WAL they never block on the
+    writer. Callbacks receive the connection and run in the worker thread.
+    """
+
+    def __init__(self, path: str = None, readers: int = None, busy_timeout: int = None):
+        self.path = path or os.environ.get('SQLITE_PATH', 'lz_custom.db')
+        self.readers = readers or int(os.environ.get('SQLITE_READERS', '4'))
+        self.busy_timeout = busy_timeout or int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._writer = None
+        self._reader_pool = None
+
+    def open(self):
+        """Start the writer and reader threads"""
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-writer')
+            self._reader_pool = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix='sqlite-reader')
+
+    def close(self):
+        """Finish pending work and close every connection"""
+        if self._writer is None:
+            return
+        self._writer.shutdown(wait=True)
+        self._reader_pool.shutdown(wait=True)
+        self._writer = None
+        self._reader_pool = None
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection with the shared pragmas"""
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={self.busy_timeout}')
+        return conn
+
+    async def read(self, fn: Callable[..., Any], *args) -> Any:
+        """Run ``fn(conn, *args)`` on a reader connection"""
+        self.open()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._reader_pool, self._call, fn, args, False)
+
+    async def write(self, fn: Callable[..., Any], *args) -> Any:
+        """Run ``fn(conn, *args)`` on the writer connection and commit"""
+        self.open()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._call, fn, args, True)
+
+    async def execute(self, sql: str, params: tuple = ()) -> int:
+        """Run one write statement; returns the last inserted row id"""
+        return await self.write(lambda conn: conn.execute(sql, params).lastrowid)
+
+    async def fetch_all(self, sql: str, params: tuple = ()) -> List[Dict]:
+        """Run a query and return every row as a dict"""
+        return await self.read(lambda conn: rows_as_dicts(conn.execute(sql, params)))
+
+    async def fetch_one(self, sql: str, params: tuple = ()) -> Optional[Dict]:
+        """Run a query and return the first row as a dict (None when empty)"""
+        rows = await self.fetch_all(sql, params)
+        return rows[0] if rows else None
+
+    def _call(self, fn, args, commit: bool):
+        conn = self._thread_connection()
+        try:
+            result = fn(conn, *args)
+            if commit:
+                conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
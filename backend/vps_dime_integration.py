@@ -7,12 +7,14 @@ import os
 import asyncio
 import aiohttp
 import json
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from enum import Enum
 import hashlib
 import hmac
+import random
+import time
 
 class TrialStatus(Enum):
     PENDING = "pending"
@@ -39,19 +41,105 @@ class VPSDimeConfig:
     referral_code: str
     webhook_secret: str
     base_url: str = "https://api.vpsdime.com/v1"
+    # Per-call timeouts (seconds)
+    timeout: float = 15.0
+    connect_timeout: float = 5.0
+    # Pooled connections to the API host
+    max_connections: int = 10
+    # Extra attempts for idempotent GETs
+    max_retries: int = 2
+    retry_backoff: float = 0.5
+    # Consecutive failures before calls are short-circuited, and for how long
+    breaker_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+
+class VPSDimeError(Exception):
+    """VPS Dime API call failed"""
+
+class VPSDimeUnavailable(VPSDimeError):
+    """Circuit breaker is open; the API is not being called"""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Opens after ``threshold`` failures in a row; while open, calls fail fast.
+    After ``reset_timeout`` seconds one trial call is let through (half-open):
+    success closes the breaker, failure opens it again.
+    """
+    
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+    
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            raise VPSDimeUnavailable("VPS Dime API circuit open; skipping call")
+        if state == "half_open":
+            self._trial_in_flight = True
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+    
+    def release_trial(self):
+        """Free the half-open trial slot for a call that ended without an outcome"""
+        self._trial_in_flight = False
 
 class VPSDimeClient:
+    """Long-lived VPS Dime API client.
+
+    Holds one pooled aiohttp session for its lifetime: call ``start()`` at
+    application startup and ``close()`` at shutdown (``async with`` does both).
+    Every call has a timeout and goes through a circuit breaker; GETs are
+    retried with jittered backoff on connection errors, timeouts and 5xx.
+    """
+    
     def __init__(self, config: VPSDimeConfig):
         self.config = config
-        self.session = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.breaker = CircuitBreaker(config.breaker_threshold, config.breaker_reset_timeout)
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "short_circuited": 0}
     
-    async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+    async def start(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.config.max_connections, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.config.timeout, connect=self.config.connect_timeout)
+            )
         return self
     
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
+    async def close(self):
         if self.session:
             await self.session.close()
+            self.session = None
+    
+    async def __aenter__(self):
+        return await self.start()
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "circuit": self.breaker.state, "consecutive_failures": self.breaker.failures}
     
     def _sign_request(self, method: str, path: str, data: str = "") -> Dict[str, str]:
         """Create HMAC signature for API request"""
@@ -70,6 +158,59 @@ class VPSDimeClient:
             "Content-Type": "application/json"
         }
     
+    async def _request(self, method: str, path: str, data: str = None, timeout: float = None) -> Tuple[int, Any]:
+        """Send a signed request; returns (status, parsed JSON or text)"""
+        if self.session is None:
+            # Works, but the session then lives until someone calls close()
+            print("⚠️  VPSDimeClient used before start(); call start()/close() from the app lifecycle")
+            await self.start()
+        attempts = 1 + (self.config.max_retries if method == "GET" else 0)
+        # Session timeouts apply unless overridden (passing timeout=None would disable them)
+        extra = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        
+        for attempt in range(attempts):
+            try:
+                self.breaker.before_call()
+            except VPSDimeUnavailable:
+                self.stats["short_circuited"] += 1
+                raise
+            self.stats["requests"] += 1
+            try:
+                # Signed per attempt: the timestamp is part of the signature
+                async with self.session.request(
+                    method,
+                    f"{self.config.base_url}{path}",
+                    headers=self._sign_request(method, path, data or ""),
+                    data=data,
+                    **extra
+                ) as response:
+                    if response.status >= 500:
+                        raise VPSDimeError(f"VPS Dime API error: {response.status} - {await response.text()}")
+                    if response.content_type == "application/json":
+                        body = await response.json()
+                    else:
+                        body = await response.text()
+                    self.breaker.record_success()
+                    return response.status, body
+            except (aiohttp.ClientError, asyncio.TimeoutError, VPSDimeError) as e:
+                self.breaker.record_failure()
+                self.stats["failures"] += 1
+                if attempt + 1 >= attempts:
+                    if isinstance(e, VPSDimeError):
+                        raise
+                    raise VPSDimeError(f"VPS Dime API request failed: {type(e).__name__} {e}") from e
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.config.retry_backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+            except asyncio.CancelledError:
+                # The caller went away (e.g. client disconnect); says nothing about the API
+                self.breaker.release_trial()
+                raise
+            except Exception:
+                # Anything else, e.g. a malformed JSON body, counts as a failed call
+                self.breaker.record_failure()
+                self.stats["failures"] += 1
+                raise
+    
     async def create_trial_account(self, trial_request: TrialRequest) -> Dict[str, Any]:
         """Create a 3-day trial account on VPS Dime"""
         path = "/trials"
@@ -87,53 +228,48 @@ class VPSDimeClient:
             }
         }
         
-        json_data = json.dumps(data)
-        headers = self._sign_request("POST", path, json_data)
-        
-        async with self.session.post(
-            f"{self.config.base_url}{path}",
-            headers=headers,
-            data=json_data
-        ) as response:
-            if response.status == 201:
-                return await response.json()
-            else:
-                error_text = await response.text()
-                raise Exception(f"VPS Dime API error: {response.status} - {error_text}")
+        # Not retried: a repeated POST could create a second trial
+        status, body = await self._request("POST", path, json.dumps(data))
+        if status == 201:
+            return body
+        raise VPSDimeError(f"VPS Dime API error: {status} - {body}")
     
     async def get_trial_status(self, trial_id: str) -> Dict[str, Any]:
         """Get current status of a trial account"""
-        path = f"/trials/{trial_id}"
-        headers = self._sign_request("GET", path)
-        
-        async with self.session.get(
-            f"{self.config.base_url}{path}",
-            headers=headers
-        ) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                raise Exception(f"Failed to get trial status: {response.status}")
+        status, body = await self._request("GET", f"/trials/{trial_id}")
+        if status == 200:
+            return body
+        raise VPSDimeError(f"Failed to get trial status: {status}")
     
     async def get_referral_stats(self) -> Dict[str, Any]:
         """Get referral statistics and earnings"""
-        path = f"/referrals/{self.config.referral_code}/stats"
-        headers = self._sign_request("GET", path)
-        
-        async with self.session.get(
-            f"{self.config.base_url}{path}",
-            headers=headers
-        ) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                return {"error": "Failed to get referral stats"}
+        try:
+            status, body = await self._request("GET", f"/referrals/{self.config.referral_code}/stats")
+        except VPSDimeError:
+            return {"error": "Failed to get referral stats"}
+        if status == 200:
+            return body
+        return {"error": "Failed to get referral stats"}
 
 class TrialManager:
-    def __init__(self, vps_config: VPSDimeConfig, database_manager):
+    """Trial sign-up against the VPS Dime API.
+
+    No application serves trials yet. Whichever one does should create a single
+    TrialManager and call ``start()`` from its startup hook and ``close()``
+    from its shutdown hook, so all trials share one pooled client.
+    """
+    
+    def __init__(self, vps_config: VPSDimeConfig, database_manager, client: VPSDimeClient = None):
         self.vps_config = vps_config
         self.db = database_manager
-        self.client = None
+        # Shared for all trials; the owner starts and closes it (see class docstring)
+        self.client = client or VPSDimeClient(vps_config)
+    
+    async def start(self):
+        await self.client.start()
+    
+    async def close(self):
+        await self.client.close()
     
     async def initiate_trial(self, trial_data: Dict[str, Any]) -> Dict[str, Any]:
         """Start a 3-day trial process"""
@@ -154,8 +290,7 @@ class TrialManager:
             await self._log_trial_request(trial_request)
             
             # Create trial account with VPS Dime
-            async with VPSDimeClient(self.vps_config) as client:
-                vps_response = await client.create_trial_account(trial_request)
+            vps_response = await self.client.create_trial_account(trial_request)
             
             # Generate trial setup instructions
             setup_instructions = self._generate_setup_instructions(
@@ -390,5 +525,8 @@ def get_vps_dime_config() -> VPSDimeConfig:
         api_secret=os.getenv('VPS_DIME_API_SECRET', ''),
         referral_code=os.getenv('VPS_DIME_REFERRAL_CODE', 'lzcustom'),
         webhook_secret=os.getenv('VPS_DIME_WEBHOOK_SECRET', ''),
-        base_url=os.getenv('VPS_DIME_API_URL', 'https://api.vpsdime.com/v1')
+        base_url=os.getenv('VPS_DIME_API_URL', 'https://api.vpsdime.com/v1'),
+        timeout=float(os.getenv('VPS_DIME_TIMEOUT', '15')),
+        connect_timeout=float(os.getenv('VPS_DIME_CONNECT_TIMEOUT', '5')),
+        max_retries=int(os.getenv('VPS_DIME_MAX_RETRIES', '2'))
     )
\ No newline at end of file
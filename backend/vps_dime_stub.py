@@ -0,0 +1,121 @@
+"""
+Local stand-in for the VPS Dime API
+Serves the endpoints VPSDimeClient uses, with configurable latency and failures,
+so trial flows can be exercised and load-tested without the real upstream.
+
+Run standalone and point the client at it:
+    python vps_dime_stub.py --port 8089 [--latency 0.1] [--failure-rate 0.2]
+    VPS_DIME_API_URL=http://127.0.0.1:8089/v1
+
+Or start it in-process (e.g. as a test fixture):
+    stub = VPSDimeStub()
+    base_url = await stub.start()
+    ...
+    await stub.stop()
+"""
+
+import argparse
+import asyncio
+import random
+import uuid
+from typing import Dict, Optional
+
+from aiohttp import web
+
+
+class VPSDimeStub:
+    """In-memory VPS Dime API.
+
+    ``latency`` delays every response; ``failure_rate`` answers that share of
+    requests with a 503; ``hang`` never answers (for timeout tests). Requests
+    are counted per route in ``requests``.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, hang: bool = False):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.hang = hang
+        self.trials: Dict[str, Dict] = {}
+        self.requests: Dict[str, int] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._simulate])
+        app.router.add_post("/v1/trials", self.create_trial)
+        app.router.add_get("/v1/trials/{trial_id}", self.get_trial)
+        app.router.add_get("/v1/referrals/{code}/stats", self.referral_stats)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in the running event loop; returns the API base URL"""
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}/v1"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _simulate(self, request: web.Request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.requests[route] = self.requests.get(route, 0) + 1
+        if self.hang:
+            await asyncio.Event().wait()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            return web.json_response({"error": "stub failure"}, status=503)
+        if not request.headers.get("X-Signature"):
+            return web.json_response({"error": "missing signature"}, status=401)
+        return await handler(request)
+
+    async def create_trial(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        trial_id = f"trial_{uuid.uuid4().hex[:12]}"
+        trial = {
+            "trial_id": trial_id,
+            "status": "active",
+            "plan": data.get("plan"),
+            "email": data.get("email"),
+            "server_ip": "203.0.113.10",
+            "ssh_details": {"user": "root", "port": 22},
+            "server_details": {"ip": "203.0.113.10"}
+        }
+        self.trials[trial_id] = trial
+        return web.json_response(trial, status=201)
+
+    async def get_trial(self, request: web.Request) -> web.Response:
+        trial = self.trials.get(request.match_info["trial_id"])
+        if trial is None:
+            return web.json_response({"error": "not found"}, status=404)
+        return web.json_response(trial)
+
+    async def referral_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "referral_code": request.match_info["code"],
+            "trials": len(self.trials),
+            "conversions": 0,
+            "earnings": 0.0
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local VPS Dime API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args()
+
+    stub = VPSDimeStub(latency=args.latency, failure_rate=args.failure_rate)
+    print(f"VPS Dime stub on http://{args.host}:{args.port}/v1")
+    web.run_app(stub.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()